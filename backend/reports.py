@@ -0,0 +1,226 @@
+"""PDF / DOCX rendering of exam reports (reportlab, python-docx).
+
+``render_report`` runs in the worker pool on the dict built by
+``server._report_content``: title, labels, meta, sections, notes, footer and
+JPEG ``images``. Text is laid out with an embedded TrueType font so names and
+notes outside Latin-1 print as written.
+"""
+
+import io
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape as xml_escape
+
+# TrueType fonts embedded in PDFs; REPORT_FONT / REPORT_FONT_BOLD override the
+# search (pick a font covering the scripts your clinic writes in)
+REPORT_FONT_CANDIDATES = (
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/dejavu/DejaVuSans.ttf", "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/TTF/DejaVuSans.ttf", "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf", "/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", "/Library/Fonts/Arial Unicode.ttf"),
+    ("C:\\Windows\\Fonts\\arial.ttf", "C:\\Windows\\Fonts\\arialbd.ttf"),
+)
+PDF_MARGIN = 56.0
+PDF_FOOTER = 28.0
+DOCX_FONT = "Arial"
+# Previews are placed two per line at most this wide
+DOCX_IMAGE_INCHES = 3.1
+
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_pdf_fonts: Optional[Tuple[str, str]] = None
+
+
+def _clean(text: str) -> str:
+    return _XML_INVALID.sub("", text)
+
+
+def _image_size(data: bytes) -> Tuple[int, int]:
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        return img.width, img.height
+
+
+def _font_files() -> Tuple[str, str]:
+    regular = os.environ.get("REPORT_FONT")
+    if regular:
+        return regular, os.environ.get("REPORT_FONT_BOLD") or regular
+    for regular, bold in REPORT_FONT_CANDIDATES:
+        if os.path.isfile(regular):
+            return regular, bold if os.path.isfile(bold) else regular
+    # Bitstream Vera ships with reportlab but only covers Latin scripts
+    import reportlab
+
+    fonts = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+    return os.path.join(fonts, "Vera.ttf"), os.path.join(fonts, "VeraBd.ttf")
+
+
+def _register_pdf_fonts() -> Tuple[str, str]:
+    """Register the report fonts once per process; ``(regular, bold)`` names."""
+    global _pdf_fonts
+    if _pdf_fonts is None:
+        from reportlab.lib.fonts import addMapping
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        regular, bold = _font_files()
+        pdfmetrics.registerFont(TTFont("ReportSans", regular))
+        pdfmetrics.registerFont(TTFont("ReportSans-Bold", bold))
+        for italic in (0, 1):
+            addMapping("ReportSans", 0, italic, "ReportSans")
+            addMapping("ReportSans", 1, italic, "ReportSans-Bold")
+        _pdf_fonts = ("ReportSans", "ReportSans-Bold")
+    return _pdf_fonts
+
+
+def _pdf_canvas(footer: str, page_label: str, font: str):
+    """Canvas class stamping ``footer`` and "page n/total" once the page count is known."""
+    from reportlab.pdfgen import canvas
+
+    class ReportCanvas(canvas.Canvas):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            self._pages: List[Dict[str, Any]] = []
+
+        def showPage(self) -> None:
+            self._pages.append(dict(self.__dict__))
+            self._startPage()
+
+        def save(self) -> None:
+            total = len(self._pages)
+            for number, state in enumerate(self._pages, start=1):
+                self.__dict__.update(state)
+                width = self._pagesize[0]
+                self.setFont(font, 8)
+                self.drawString(PDF_MARGIN, PDF_MARGIN / 2, footer)
+                self.drawRightString(width - PDF_MARGIN, PDF_MARGIN / 2, f"{page_label} {number}/{total}")
+                super().showPage()
+            super().save()
+
+    return ReportCanvas
+
+
+def _report_pdf(report: Dict[str, Any]) -> bytes:
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import HRFlowable, Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    regular, bold = _register_pdf_fonts()
+
+    def style(name: str, size: float, font: str = regular, **kwargs: Any) -> ParagraphStyle:
+        return ParagraphStyle(name, fontName=font, fontSize=size, leading=size * 1.35, **kwargs)
+
+    title = style("title", 16, bold, alignment=TA_CENTER, spaceAfter=6)
+    meta = style("meta", 10, spaceAfter=1)
+    heading = style("heading", 11, bold, spaceBefore=6, spaceAfter=2, keepWithNext=1)
+    body = style("body", 10, spaceAfter=2)
+    measures = style("measures", 9, spaceAfter=2)
+
+    def para(text: str, paragraph_style: ParagraphStyle) -> Paragraph:
+        return Paragraph(xml_escape(_clean(text)).replace("\n", "<br/>"), paragraph_style)
+
+    def rule() -> HRFlowable:
+        return HRFlowable(width="100%", thickness=0.6, color="black", spaceBefore=4, spaceAfter=8)
+
+    labels = report["labels"]
+    story: List[Any] = [para(report["title"], title), rule()]
+    story += [para(f"{label}: {value}", meta) for label, value in report["meta"]]
+    story.append(rule())
+    for section in report["sections"]:
+        if section["heading"]:
+            story.append(para(section["heading"], heading))
+        if section["text"]:
+            story.append(para(section["text"], body))
+        if section["measures"]:
+            story.append(para(section["measures"], measures))
+    if report["notes"]:
+        story += [para(labels["notes"], heading), para(report["notes"], body)]
+    if report["images"]:
+        story.append(para(labels["images"], heading))
+        gap = 12.0
+        cell = (A4[0] - 2 * PDF_MARGIN - gap) / 2
+        pictures = []
+        for data in report["images"]:
+            width, height = _image_size(data)
+            scale = min(cell / width, cell * 0.9 / height)
+            pictures.append(Image(io.BytesIO(data), width * scale, height * scale))
+        rows = [pictures[pos : pos + 2] + [""] * (2 - len(pictures[pos : pos + 2])) for pos in range(0, len(pictures), 2)]
+        grid = Table(rows, colWidths=[cell + gap / 2] * 2)
+        grid.setStyle(TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER"), ("BOTTOMPADDING", (0, 0), (-1, -1), gap)]))
+        story.append(grid)
+
+    out = io.BytesIO()
+    doc = SimpleDocTemplate(
+        out,
+        pagesize=A4,
+        leftMargin=PDF_MARGIN,
+        rightMargin=PDF_MARGIN,
+        topMargin=PDF_MARGIN,
+        bottomMargin=PDF_MARGIN + PDF_FOOTER,
+        title=report["title"],
+    )
+    doc.build(story, canvasmaker=_pdf_canvas(_clean(report["footer"]), labels["page"], regular))
+    return out.getvalue()
+
+
+def _report_docx(report: Dict[str, Any]) -> bytes:
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Inches, Mm, Pt, Twips
+
+    document = Document()
+    normal = document.styles["Normal"]
+    normal.font.name = DOCX_FONT
+    normal.font.size = Pt(10)
+    section = document.sections[0]
+    section.page_width, section.page_height = Mm(210), Mm(297)
+    section.top_margin = section.bottom_margin = section.left_margin = section.right_margin = Twips(1134)
+
+    def paragraph(text: str, size: float = 10, bold: bool = False, after: float = 4, center: bool = False) -> None:
+        p = document.add_paragraph()
+        p.paragraph_format.space_after = Pt(after)
+        if center:
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = p.add_run(_clean(text))
+        run.bold = bold
+        run.font.size = Pt(size)
+
+    labels = report["labels"]
+    paragraph(report["title"], size=16, bold=True, after=10, center=True)
+    for label, value in report["meta"]:
+        paragraph(f"{label}: {value}", after=0)
+    paragraph("", after=6)
+    for item in report["sections"]:
+        if item["heading"]:
+            paragraph(item["heading"], size=11, bold=True, after=2)
+        if item["text"]:
+            paragraph(item["text"], after=2)
+        if item["measures"]:
+            paragraph(item["measures"], size=9, after=2)
+    if report["notes"]:
+        paragraph(labels["notes"], size=11, bold=True, after=2)
+        paragraph(report["notes"], after=8)
+    if report["images"]:
+        paragraph(labels["images"], size=11, bold=True, after=4)
+        for pos in range(0, len(report["images"]), 2):
+            p = document.add_paragraph()
+            p.paragraph_format.space_after = Pt(6)
+            for data in report["images"][pos : pos + 2]:
+                width, height = _image_size(data)
+                # Portrait previews are capped by height so rows stay level
+                size = {"width": Inches(DOCX_IMAGE_INCHES)} if width >= height else {"height": Inches(DOCX_IMAGE_INCHES)}
+                p.add_run().add_picture(io.BytesIO(data), **size)
+    footer = section.footer.paragraphs[0]
+    footer.add_run(_clean(report["footer"])).font.size = Pt(8)
+
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def render_report(report: Dict[str, Any], fmt: str) -> bytes:
+    """Worker: lay out a report built by ``_report_content`` as PDF or DOCX."""
+    return _report_pdf(report) if fmt == "pdf" else _report_docx(report)
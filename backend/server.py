@@ -1,27 +1,58 @@
+import asyncio
+import base64
+import contextlib
+import csv
+import bisect
+import functools
 import hashlib
+import heapq
+import io
+import itertools
+import json
+import math
+import mimetypes
+import multiprocessing
 import os
+import re
+import tarfile
+import tempfile
+import time
+import unicodedata
 import uuid
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Literal, Optional
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as date_type, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Literal, Optional, Set, Tuple, Union
 
 from dotenv import load_dotenv
 from fastapi import (
     Body,
     FastAPI,
     File,
+    Header,
     HTTPException,
     Query,
+    Request,
     UploadFile,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-from pydantic import BaseModel, Field
-from pymongo import ASCENDING
-from pymongo.errors import DuplicateKeyError
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.datastructures import Headers, MutableHeaders
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 # Async Mongo
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from bson import json_util
 from bson.binary import Binary
+from gridfs.errors import NoFile
+
+from reports import render_report
 
 
 load_dotenv()  # loads /app/backend/.env if present
@@ -38,6 +69,35 @@ def new_uuid(prefix: str) -> str:
 class Settings(BaseModel):
     mongo_url: str = Field(default_factory=lambda: os.environ.get("MONGO_URL") or "")
     app_url: str = Field(default_factory=lambda: os.environ.get("APP_URL") or "")
+    # Image bytes live in a blob store: "gridfs" (default) or "local" (filesystem)
+    blob_backend: str = Field(default_factory=lambda: os.environ.get("BLOB_BACKEND") or "gridfs")
+    blob_dir: str = Field(
+        default_factory=lambda: os.environ.get("BLOB_DIR")
+        or os.path.join(os.path.dirname(os.path.abspath(__file__)), "blobs")
+    )
+    # CPU-bound work (image decoding, thumbnails) runs in a bounded process pool
+    worker_processes: int = Field(default_factory=lambda: int(os.environ.get("WORKER_PROCESSES") or 2))
+    # Build thumbnails right after upload instead of on first request
+    derivatives_on_upload: bool = Field(
+        default_factory=lambda: (os.environ.get("DERIVATIVES_ON_UPLOAD") or "1") not in ("0", "false", "no")
+    )
+    # Patient search index: "mongo" (indexed prefix keys) or "memory" (in-process)
+    search_backend: str = Field(default_factory=lambda: os.environ.get("SEARCH_BACKEND") or "mongo")
+    # Responses smaller than this are sent uncompressed
+    compression_min_bytes: int = Field(default_factory=lambda: int(os.environ.get("COMPRESSION_MIN_BYTES") or 1024))
+    # Serialize trusted reads straight from Mongo documents with orjson
+    fast_json: bool = Field(
+        default_factory=lambda: (os.environ.get("FAST_JSON") or "0") not in ("0", "false", "no")
+    )
+    # Run each cascade-delete batch in a transaction (needs a replica set)
+    cascade_transactions: bool = Field(
+        default_factory=lambda: (os.environ.get("CASCADE_TRANSACTIONS") or "0") not in ("0", "false", "no")
+    )
+    # Backup archives written by POST /api/backups (and uploaded for restore)
+    backup_dir: str = Field(
+        default_factory=lambda: os.environ.get("BACKUP_DIR")
+        or os.path.join(os.path.dirname(os.path.abspath(__file__)), "backups")
+    )
 
 
 settings = Settings()
@@ -66,6 +126,225 @@ app.add_middleware(
 )
 
 
+# -----------------------------
+# Response encoding (gzip / brotli / MessagePack)
+# -----------------------------
+
+# Only these are compressed; images, DICOM, frames and zips are already dense
+# (and serve byte ranges that must not be re-encoded)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/msgpack",
+    "application/xml",
+    "application/javascript",
+    "text/",
+)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _optional_module(name: str):
+    try:
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Media types / codings of an Accept(-Encoding) header with their q-values."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+def _negotiate_encoding(header: str) -> Optional[str]:
+    accepted = _accepted(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if _optional_module("brotli") is not None else ["gzip"]
+    best = max(candidates, key=lambda c: accepted.get(c, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    # A re-encoded body is a different representation of the same resource
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+def _add_vary(headers: MutableHeaders, value: str) -> None:
+    vary = headers.get("vary")
+    headers["vary"] = f"{vary}, {value}" if vary else value
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            import brotli
+
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """gzip/brotli by Accept-Encoding for compressible bodies above ``minimum_size``.
+
+    Streaming bodies are compressed chunk by chunk once the threshold is
+    reached, so NDJSON exports stay streamed.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        pending = b""
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message) -> None:
+            nonlocal start, pending, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    message["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or "content-range" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                pending += body
+                if len(pending) < self.minimum_size:
+                    if more_body:
+                        return
+                    # Small response: send as is
+                    await send(start)
+                    await send({"type": "http.response.body", "body": pending})
+                    return
+                compressor = _Compressor(encoding)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["content-encoding"] = encoding
+                _add_vary(headers, "Accept-Encoding")
+                _weaken_etag(headers)
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressor.compress(pending), "more_body": True})
+                else:
+                    data = compressor.compress(pending) + compressor.finish()
+                    headers["content-length"] = str(len(data))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                pending = b""
+                return
+            if more_body:
+                if body:
+                    await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class MessagePackMiddleware:
+    """Re-encode JSON responses as MessagePack when the client asks for it in Accept."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted(Headers(scope=scope).get("accept", ""))
+        msgpack = _optional_module("msgpack")
+        if msgpack is None or not any(accepted.get(t, 0.0) > 0 for t in MSGPACK_TYPES):
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        chunks: List[bytes] = []
+
+        async def send_msgpack(message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if content_type.startswith("application/json"):
+                    start = message
+                else:
+                    await send(message)
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            data = msgpack.packb(json.loads(b"".join(chunks) or b"null"))
+            headers = MutableHeaders(raw=start["headers"])
+            headers["content-type"] = MSGPACK_TYPES[0]
+            headers["content-length"] = str(len(data))
+            _add_vary(headers, "Accept")
+            _weaken_etag(headers)
+            await send(start)
+            await send({"type": "http.response.body", "body": data})
+
+        await self.app(scope, receive, send_msgpack)
+
+
+# Outermost last: JSON -> MessagePack first, then compression
+app.add_middleware(MessagePackMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_bytes)
+
+
 # -----------------------------
 # Pydantic Models (API Contract)
 # -----------------------------
@@ -131,7 +410,10 @@ class ImageRef(BaseModel):
 class Exam(ExamBase):
     exam_id: str
     date: datetime
+    # Most recent refs only; the full list is paged from /api/exams/{exam_id}/images
     images: List[ImageRef] = Field(default_factory=list)
+    image_count: int = 0
+    cover_image_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -149,7 +431,68 @@ class ImageMeta(BaseModel):
     exam_id: Optional[str] = None
     kind: Literal["png", "jpg", "jpeg", "dicom", "other"] = "other"
     dicom_meta: Optional[Dict[str, Any]] = None
+    series_id: Optional[str] = None
+
+
+class DicomInstance(BaseModel):
+    image_id: str
+    instance_number: Optional[int] = None
+    sop_instance_uid: Optional[str] = None
+    frames: Optional[int] = None
+
+
+class Job(BaseModel):
+    job_id: str
+    kind: str
+    target_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    progress: Dict[str, int] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class DicomSeries(BaseModel):
+    series_id: str
+    series_instance_uid: str
+    study_instance_uid: Optional[str] = None
+    patient_id: Optional[str] = None
+    exam_id: Optional[str] = None
+    modality: Optional[str] = None
+    series_number: Optional[int] = None
+    description: Optional[str] = None
+    instance_count: int = 0
+    # Ordered by instance number
+    instances: List[DicomInstance] = Field(default_factory=list)
+    created_at: datetime
+    updated_at: datetime
+
+
+class BatchIngestError(BaseModel):
+    filename: str
+    detail: str
+
+
+class BatchIngestResult(BaseModel):
+    images: List[ImageMeta] = Field(default_factory=list)
+    series: List[DicomSeries] = Field(default_factory=list)
+    errors: List[BatchIngestError] = Field(default_factory=list)
+
 
+class BatchWriteItem(BaseModel):
+    # Position of the item in the submitted array / NDJSON stream (blank lines skipped)
+    index: int
+    status: Literal["created", "failed"]
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BatchWriteResult(BaseModel):
+    received: int = 0
+    created: int = 0
+    failed: int = 0
+    results: List[BatchWriteItem] = Field(default_factory=list)
 
 
 class TemplateBase(BaseModel):
@@ -164,6 +507,12 @@ class TemplateCreate(TemplateBase):
     pass
 
 
+class TemplateImportRow(TemplateCreate):
+    """One NDJSON import line; ids and creation time from an export are optional."""
+    template_id: Optional[str] = Field(default=None, min_length=1, max_length=120)
+    created_at: Optional[datetime] = None
+
+
 class TemplateUpdate(BaseModel):
     organ: Optional[str] = Field(default=None, max_length=120)
     title: Optional[str] = Field(default=None, min_length=1, max_length=120)
@@ -178,6 +527,74 @@ class Template(TemplateBase):
     updated_at: datetime
 
 
+class PatientSummary(BaseModel):
+    patient_id: str
+    name: str
+    species: Optional[str] = None
+    owner_name: Optional[str] = None
+    updated_at: datetime
+
+
+class ExamSummary(BaseModel):
+    exam_id: str
+    patient_id: str
+    exam_type: str
+    date: datetime
+    status: Literal["draft", "final"] = "draft"
+    image_count: int = 0
+    cover_image_id: Optional[str] = None
+    updated_at: datetime
+
+
+class PatientPage(BaseModel):
+    items: List[Patient]
+    next_cursor: Optional[str] = None
+
+
+class ExamPage(BaseModel):
+    items: List[Exam]
+    next_cursor: Optional[str] = None
+
+
+class ImageRefPage(BaseModel):
+    items: List[ImageRef]
+    next_cursor: Optional[str] = None
+
+
+class TemplatePage(BaseModel):
+    items: List[Template]
+    next_cursor: Optional[str] = None
+
+
+class TemplateImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class TemplateImportResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[TemplateImportError] = Field(default_factory=list)
+
+
+class TemplateCatalogOrgan(BaseModel):
+    organ: str
+    templates: List[Template]
+
+
+class TemplateCatalogGroup(BaseModel):
+    exam_type: Optional[str] = None
+    organs: List[TemplateCatalogOrgan]
+
+
+class TemplateCatalog(BaseModel):
+    version: int
+    lang: Optional[Literal["pt", "en"]] = None
+    total: int
+    groups: List[TemplateCatalogGroup]
+
 
 # -----------------------------
 # Mongo helpers
@@ -192,18 +609,67 @@ def _mongo_db(client: AsyncIOMotorClient):
 
 async def _ensure_indexes(db):
     await db.patients.create_index([("patient_id", ASCENDING)], unique=True)
+    # Edge n-gram search keys; name as second key so candidates come back pre-sorted
+    await db.patients.create_index([("search.prefixes", ASCENDING), ("name", ASCENDING)])
+    await db.patients.create_index([("search.name", ASCENDING), ("name", ASCENDING)])
+    await db.patients.create_index([("search.owner", ASCENDING), ("name", ASCENDING)])
     await db.exams.create_index([("exam_id", ASCENDING)], unique=True)
     await db.exams.create_index([("patient_id", ASCENDING)])
+    # Keyset pagination: one compound index per list sort (id as tiebreaker)
+    await db.patients.create_index([("name", ASCENDING), ("patient_id", ASCENDING)])
+    await db.exams.create_index([("date", DESCENDING), ("exam_id", DESCENDING)])
+    await db.exams.create_index([("patient_id", ASCENDING), ("date", DESCENDING), ("exam_id", DESCENDING)])
+    # Statistics: drafts by age, per-type ranges; rollups read by metric and day
+    await db.exams.create_index([("status", ASCENDING), ("date", ASCENDING)])
+    await db.exams.create_index([("exam_type", ASCENDING), ("date", ASCENDING)])
+    await _ensure_stats_indexes(db.stats_daily, db.stats_patients)
 
     await db.images.create_index([("image_id", ASCENDING)], unique=True)
     await db.images.create_index([("exam_id", ASCENDING)])
     await db.images.create_index([("patient_id", ASCENDING)])
     await db.images.create_index([("sha256", ASCENDING)])
+    # Content-addressed blob index: sha256 -> stored blob + reference count
+    await db.blob_refs.create_index([("sha256", ASCENDING)], unique=True)
+    await db.images.create_index([("series_id", ASCENDING)])
+    # Exam -> image links, paged in upload order
+    await db.exam_images.create_index([("image_id", ASCENDING)], unique=True)
+    await db.exam_images.create_index([("exam_id", ASCENDING), ("created_at", ASCENDING), ("image_id", ASCENDING)])
+    # DICOM series grouped per exam/patient, instances kept in order
+    await db.dicom_series.create_index([("series_id", ASCENDING)], unique=True)
+    await db.dicom_series.create_index(
+        [("series_instance_uid", ASCENDING), ("exam_id", ASCENDING), ("patient_id", ASCENDING)],
+        unique=True,
+    )
+    await db.dicom_series.create_index([("exam_id", ASCENDING)])
+    await db.dicom_series.create_index([("patient_id", ASCENDING)])
+    # Thumbnail/preview cache, evicted by last access
+    await db.image_derivatives.create_index([("sha256", ASCENDING), ("size", ASCENDING)], unique=True)
+    await db.image_derivatives.create_index([("last_access", ASCENDING)])
+    # Sync feed: changes ordered by (updated_at, id); deletions kept as tombstones
+    await db.patients.create_index([("updated_at", ASCENDING), ("patient_id", ASCENDING)])
+    await db.exams.create_index([("updated_at", ASCENDING), ("exam_id", ASCENDING)])
+    await db.templates.create_index([("updated_at", ASCENDING), ("template_id", ASCENDING)])
+    await db.images.create_index([("updated_at", ASCENDING), ("image_id", ASCENDING)])
+    await db.tombstones.create_index([("entity", ASCENDING), ("entity_id", ASCENDING)], unique=True)
+    await db.tombstones.create_index([("updated_at", ASCENDING), ("entity_id", ASCENDING)])
+    # Background jobs (cascade deletes, backups, restores), resumed on startup while unfinished
+    await db.jobs.create_index([("job_id", ASCENDING)], unique=True)
+    await db.jobs.create_index([("status", ASCENDING)])
 
     await db.templates.create_index([("template_id", ASCENDING)], unique=True)
     await db.templates.create_index([("lang", ASCENDING)])
     await db.templates.create_index([("exam_type", ASCENDING)])
     await db.templates.create_index([("organ", ASCENDING)])
+    await db.templates.create_index([("organ", ASCENDING), ("title", ASCENDING), ("template_id", ASCENDING)])
+    await db.templates.create_index(
+        [
+            ("lang", ASCENDING),
+            ("exam_type", ASCENDING),
+            ("organ", ASCENDING),
+            ("title", ASCENDING),
+            ("template_id", ASCENDING),
+        ]
+    )
     # Unique natural key for idempotent seeding
     await db.templates.create_index(
         [("lang", ASCENDING), ("exam_type", ASCENDING), ("organ", ASCENDING), ("title", ASCENDING)],
@@ -211,6 +677,284 @@ async def _ensure_indexes(db):
     )
 
 
+# -----------------------------
+# Blob storage (image bytes)
+# -----------------------------
+
+BLOB_CHUNK_SIZE = 256 * 1024
+
+
+class BlobWriter:
+    """Incremental writer returned by ``BlobStore.open_writer``."""
+
+    async def write(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        raise NotImplementedError
+
+    async def abort(self) -> None:
+        raise NotImplementedError
+
+
+class BlobStore:
+    """Pluggable storage for image bytes; metadata stays in ``images``."""
+
+    async def open_writer(self, blob_id: str) -> BlobWriter:
+        raise NotImplementedError
+
+    async def put(self, blob_id: str, content: bytes) -> None:
+        writer = await self.open_writer(blob_id)
+        try:
+            for pos in range(0, len(content), BLOB_CHUNK_SIZE):
+                await writer.write(content[pos : pos + BLOB_CHUNK_SIZE])
+        except BaseException:
+            await writer.abort()
+            raise
+        await writer.close()
+
+    def stream(
+        self,
+        blob_id: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = BLOB_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Yield ``length`` bytes (or everything) starting at offset ``start``."""
+        raise NotImplementedError
+
+    async def delete(self, blob_id: str) -> None:
+        raise NotImplementedError
+
+    def local_path(self, blob_id: str) -> Optional[str]:
+        """Filesystem path worker processes can open directly, if the store has one."""
+        return None
+
+
+class _GridFSWriter(BlobWriter):
+    def __init__(self, grid_in):
+        self._grid_in = grid_in
+
+    async def write(self, chunk: bytes) -> None:
+        await self._grid_in.write(chunk)
+
+    async def close(self) -> None:
+        await self._grid_in.close()
+
+    async def abort(self) -> None:
+        await self._grid_in.abort()
+
+
+class GridFSBlobStore(BlobStore):
+    def __init__(self, database, bucket_name: str = "blobs"):
+        self._bucket = AsyncIOMotorGridFSBucket(
+            database, bucket_name=bucket_name, chunk_size_bytes=BLOB_CHUNK_SIZE
+        )
+
+    async def open_writer(self, blob_id: str) -> BlobWriter:
+        return _GridFSWriter(self._bucket.open_upload_stream_with_id(blob_id, blob_id))
+
+    async def stream(
+        self,
+        blob_id: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = BLOB_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        grid_out = await self._bucket.open_download_stream(blob_id)
+        if start:
+            grid_out.seek(start)
+        remaining = grid_out.length - start if length is None else length
+        while remaining > 0:
+            chunk = await grid_out.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, blob_id: str) -> None:
+        try:
+            await self._bucket.delete(blob_id)
+        except NoFile:
+            pass
+
+
+class _LocalWriter(BlobWriter):
+    def __init__(self, path: str):
+        self._path = path
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        self._fh = open(self._tmp_path, "wb")
+
+    async def write(self, chunk: bytes) -> None:
+        await asyncio.to_thread(self._fh.write, chunk)
+
+    async def close(self) -> None:
+        self._fh.close()
+        os.replace(self._tmp_path, self._path)
+
+    async def abort(self) -> None:
+        self._fh.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalBlobStore(BlobStore):
+    """Filesystem stand-in for GridFS (dev/offline installs)."""
+
+    def __init__(self, root: str):
+        self._root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, blob_id: str) -> str:
+        safe = "".join(c for c in blob_id if c.isalnum() or c in "_-")
+        if not safe:
+            raise ValueError("Invalid blob id")
+        return os.path.join(self._root, safe[-2:], safe)
+
+    async def open_writer(self, blob_id: str) -> BlobWriter:
+        path = self._path(blob_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return _LocalWriter(path)
+
+    async def stream(
+        self,
+        blob_id: str,
+        start: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = BLOB_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        with open(self._path(blob_id), "rb") as fh:
+            if start:
+                fh.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(fh.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, blob_id: str) -> None:
+        try:
+            os.remove(self._path(blob_id))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, blob_id: str) -> Optional[str]:
+        return self._path(blob_id)
+
+
+def build_blob_store(backend: str, database) -> BlobStore:
+    if backend == "gridfs":
+        return GridFSBlobStore(database)
+    if backend == "local":
+        return LocalBlobStore(settings.blob_dir)
+    raise RuntimeError(f"Unknown BLOB_BACKEND: {backend!r} (expected 'gridfs' or 'local')")
+
+
+# -----------------------------
+# In-process caches & worker pool
+# -----------------------------
+
+class LRUCache:
+    """Small in-process LRU bounded by entry count, optionally total bytes and entry age."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len,
+        ttl: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._expires: Dict[Any, float] = {}
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        if self.ttl is not None and self._expires[key] <= time.monotonic():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = value
+        self._bytes += size
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+        while len(self._data) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            evicted_key, evicted = self._data.popitem(last=False)
+            self._expires.pop(evicted_key, None)
+            if self.max_bytes is not None:
+                self._bytes -= self._sizeof(evicted)
+
+    def pop(self, key: Any) -> Any:
+        value = self._data.pop(key, None)
+        self._expires.pop(key, None)
+        if value is not None and self.max_bytes is not None:
+            self._bytes -= self._sizeof(value)
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._expires.clear()
+        self._bytes = 0
+
+
+_worker_pool: Optional[ProcessPoolExecutor] = None
+_worker_slots: Optional[asyncio.Semaphore] = None
+
+
+async def run_in_worker(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a picklable, module-level function in the shared process pool.
+
+    Submissions are capped at a few jobs per worker so a burst of uploads
+    waits here instead of piling request payloads into the executor queue.
+    """
+    global _worker_pool, _worker_slots
+    if _worker_pool is None:
+        workers = max(1, settings.worker_processes)
+        # spawn: never fork a process that already runs the event loop and Mongo threads
+        _worker_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _worker_slots = asyncio.Semaphore(workers * 4)
+    async with _worker_slots:
+        return await asyncio.get_running_loop().run_in_executor(_worker_pool, fn, *args)
+
+
+_background_tasks: set = set()
+
+
+def spawn_background(coro) -> "asyncio.Task":
+    """Fire-and-forget task that is kept referenced until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 
 @app.on_event("startup")
 async def on_startup():
@@ -221,14 +965,32 @@ async def on_startup():
 
     app.state.mongo_client = AsyncIOMotorClient(settings.mongo_url)
     app.state.db = _mongo_db(app.state.mongo_client)
+    app.state.blob_store = build_blob_store(settings.blob_backend, app.state.db)
 
     # Verify connection
     await app.state.db.command("ping")
     await _ensure_indexes(app.state.db)
 
+    await _backfill_patient_search(app.state.db)
+    await _backfill_exam_images(app.state.db)
+    await _backfill_stats(app.state.db)
+    app.state.patient_search = build_patient_search(settings.search_backend, app.state.db)
+    await app.state.patient_search.load()
+    app.state.template_search = TemplateSearchIndex(app.state.db)
+    await app.state.template_search.load()
+
+    # Pick up cascade deletes, backups and restores interrupted by a restart
+    async for job in app.state.db.jobs.find({"status": {"$in": ["queued", "running"]}}, {"_id": 0}):
+        spawn_background(run_job(job["job_id"]))
+
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=False, cancel_futures=True)
+        _worker_pool = None
+
     client = getattr(app.state, "mongo_client", None)
     if client is not None:
         client.close()
@@ -238,6 +1000,18 @@ def db():
     return app.state.db
 
 
+def blob_store() -> BlobStore:
+    return app.state.blob_store
+
+
+def patient_search() -> "PatientSearchIndex":
+    return app.state.patient_search
+
+
+def template_search() -> "TemplateSearchIndex":
+    return app.state.template_search
+
+
 def clean(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     if not doc:
         return None
@@ -245,6 +1019,212 @@ def clean(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     return doc
 
 
+# -----------------------------
+# Keyset (cursor) pagination
+# -----------------------------
+
+SortSpec = List[Tuple[str, int]]
+
+PATIENT_SORT: SortSpec = [("name", ASCENDING), ("patient_id", ASCENDING)]
+EXAM_SORT: SortSpec = [("date", DESCENDING), ("exam_id", DESCENDING)]
+TEMPLATE_SORT: SortSpec = [("organ", ASCENDING), ("title", ASCENDING), ("template_id", ASCENDING)]
+
+
+def _cursor_value(value: Any) -> Any:
+    return {"$dt": value.isoformat()} if isinstance(value, datetime) else value
+
+
+def _from_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(kind: str, values: List[Any]) -> str:
+    """Opaque token for the last row of a page: its sort key values plus id."""
+    raw = json.dumps([kind, [_cursor_value(v) for v in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        token_kind, values = json.loads(raw)
+        if token_kind != kind or not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return [_from_cursor_value(v) for v in values]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """Rows strictly after ``values`` in ``sort`` order (lexicographic over the keys)."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def cursor_for(kind: str, sort: SortSpec, doc: Dict[str, Any]) -> str:
+    return encode_cursor(kind, [doc.get(field) for field, _ in sort])
+
+
+async def fetch_page(
+    collection,
+    selector: Dict[str, Any],
+    projection: Dict[str, Any],
+    sort: SortSpec,
+    kind: str,
+    limit: int,
+    offset: int,
+    page_cursor: Optional[str],
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of ``collection`` plus the cursor of the next one.
+
+    With ``page_cursor`` the page starts right after the encoded row (keyset,
+    constant cost on any page); otherwise ``offset`` is skipped as before.
+    """
+    if page_cursor:
+        after = keyset_filter(sort, decode_cursor(page_cursor, kind, len(sort)))
+        selector = {"$and": [selector, after]} if selector else after
+    cursor = collection.find(selector, projection).sort(sort)
+    if not page_cursor and offset:
+        cursor = cursor.skip(offset)
+    docs = await cursor.limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = cursor_for(kind, sort, docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def paged_response(
+    docs: List[Dict[str, Any]],
+    model,
+    next_cursor: Optional[str],
+    page_cursor: Optional[str],
+    response: Response,
+    page_model,
+):
+    """Plain list in offset mode, ``{items, next_cursor}`` once a cursor is passed.
+
+    ``X-Next-Cursor`` is always set so offset clients can switch over.
+    """
+    if fast_json_enabled():
+        items: List[Any] = [trusted_doc(model, d) for d in docs]
+        body: Any = items if page_cursor is None else {"items": items, "next_cursor": next_cursor}
+        return FastJSONResponse(body, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    items = [model(**d) for d in docs]
+    if page_cursor is None:
+        return items
+    return page_model(items=items, next_cursor=next_cursor)
+
+
+# -----------------------------
+# Fast JSON responses
+# -----------------------------
+
+_fast_json: Optional[bool] = None
+_model_fields: Dict[Any, Tuple[frozenset, Dict[str, Any]]] = {}
+
+
+def fast_json_enabled() -> bool:
+    """FAST_JSON is set and orjson is installed."""
+    global _fast_json
+    if _fast_json is None:
+        try:
+            import orjson  # noqa: F401
+
+            _fast_json = settings.fast_json
+        except ImportError:
+            _fast_json = False
+    return _fast_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON rendered by orjson (datetimes, UUIDs and numpy scalars natively)."""
+
+    def render(self, content: Any) -> bytes:
+        import orjson
+
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _fields_and_defaults(model) -> Tuple[frozenset, Dict[str, Any]]:
+    cached = _model_fields.get(model)
+    if cached is None:
+        defaults = {
+            name: field.get_default(call_default_factory=True)
+            for name, field in model.model_fields.items()
+            if not field.is_required()
+        }
+        cached = _model_fields[model] = (frozenset(model.model_fields), defaults)
+    return cached
+
+
+def trusted_doc(model, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """What ``model(**doc)`` would serialize to, without validating a document we wrote."""
+    fields, defaults = _fields_and_defaults(model)
+    return {**defaults, **{k: v for k, v in doc.items() if k in fields}}
+
+
+def model_response(model, doc: Dict[str, Any]):
+    if fast_json_enabled():
+        return FastJSONResponse(trusted_doc(model, doc))
+    return model(**doc)
+
+
+# -----------------------------
+# List views (summary / fields=)
+# -----------------------------
+
+ListView = Literal["full", "summary"]
+
+
+def view_fields(view: str, fields: Optional[str], model, summary_model, id_field: str) -> Optional[List[str]]:
+    """Fields a list should return, or ``None`` for the full model.
+
+    ``fields=a,b`` wins over ``view``; the id is always included.
+    """
+    if fields:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(names) - set(model.model_fields))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return list(dict.fromkeys([id_field, *names]))
+    if view == "summary":
+        return list(summary_model.model_fields)
+    return None
+
+
+def view_projection(names: List[str], sort: SortSpec) -> Dict[str, Any]:
+    # Sort keys are read too so the next cursor can be built
+    return {"_id": 0, **{name: 1 for name in names}, **{field: 1 for field, _ in sort}}
+
+
+def view_response(
+    docs: List[Dict[str, Any]],
+    names: List[str],
+    summary_model,
+    trusted_partial: bool,
+    next_cursor: Optional[str],
+    page_cursor: Optional[str],
+) -> Response:
+    """Serialize a projected list directly, bypassing the full response model."""
+    if trusted_partial:
+        items: List[Any] = [{k: d[k] for k in names if k in d} for d in docs]
+    elif fast_json_enabled():
+        items = [trusted_doc(summary_model, d) for d in docs]
+    else:
+        items = [summary_model(**d).model_dump() for d in docs]
+    body: Any = items if page_cursor is None else {"items": items, "next_cursor": next_cursor}
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    if fast_json_enabled():
+        return FastJSONResponse(body, headers=headers)
+    return JSONResponse(jsonable_encoder(body), headers=headers)
+
+
 # -----------------------------
 # Health
 # -----------------------------
@@ -263,6 +1243,256 @@ async def health_check():
         return {"status": "degraded", "db": "error", "detail": str(e)}
 
 
+# -----------------------------
+# Patient search
+# -----------------------------
+
+# Longest prefix stored per token; longer query tokens are matched on this prefix
+SEARCH_MAX_PREFIX = 20
+# Candidates fetched per query beyond the requested page (short prefixes can
+# match many patients); exact token matches are fetched separately
+SEARCH_MAX_CANDIDATES = 500
+# Patient fields that never leave the server
+PATIENT_PROJECTION = {"_id": 0, "search": 0}
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lower-case, accent-stripped text with punctuation folded to spaces ("José" -> "jose")."""
+    value = value or ""
+    if not value.isascii():
+        decomposed = unicodedata.normalize("NFKD", value)
+        value = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", value.casefold()).strip()
+
+
+def text_tokens(value: Optional[str]) -> List[str]:
+    return normalize_text(value).split()
+
+
+def search_document(name: Optional[str], owner_name: Optional[str]) -> Dict[str, List[str]]:
+    """Normalized tokens plus edge n-gram prefix keys stored on each patient."""
+    name_tokens = text_tokens(name)
+    owner_tokens = text_tokens(owner_name)
+    prefixes: Set[str] = set()
+    for token in name_tokens + owner_tokens:
+        for end in range(1, min(len(token), SEARCH_MAX_PREFIX) + 1):
+            prefixes.add(token[:end])
+    return {"name": name_tokens, "owner": owner_tokens, "prefixes": sorted(prefixes)}
+
+
+def _search_score(query: List[str], search: Dict[str, List[str]]) -> float:
+    """Rank: exact beats prefix, patient name beats owner, earlier name tokens win ties."""
+    score = 0.0
+    name_tokens, owner_tokens = search.get("name") or [], search.get("owner") or []
+    for q in query:
+        best = 0.0
+        for pos, token in enumerate(name_tokens):
+            if token == q:
+                best = max(best, 4.0 - 0.1 * pos)
+            elif token.startswith(q):
+                best = max(best, 3.0 - 0.1 * pos)
+        for token in owner_tokens:
+            if token == q:
+                best = max(best, 2.0)
+            elif token.startswith(q):
+                best = max(best, 1.0)
+        score += best
+    return score
+
+
+def _search_keys(q: str) -> List[str]:
+    return [t[:SEARCH_MAX_PREFIX] for t in text_tokens(q)]
+
+
+def _rank(query: List[str], candidates: Iterable[Tuple[str, str, Dict[str, List[str]]]]) -> List[str]:
+    """Order ``(patient_id, name, search)`` candidates by score, then name."""
+    scored = [(-_search_score(query, search), name or "", pid) for pid, name, search in candidates]
+    scored.sort()
+    return [pid for _, _, pid in scored]
+
+
+class PatientSearchIndex:
+    """Accent-insensitive prefix search over patient and owner names."""
+
+    async def load(self) -> None:
+        pass
+
+    def add(self, patient: Dict[str, Any]) -> None:
+        pass
+
+    def remove(self, patient_id: str) -> None:
+        pass
+
+    async def search(self, q: str, limit: int, offset: int = 0) -> List[str]:
+        """Return ranked patient ids."""
+        raise NotImplementedError
+
+
+class MongoPatientSearchIndex(PatientSearchIndex):
+    """Uses the ``search`` subdocument written with every patient (indexed prefixes)."""
+
+    def __init__(self, database):
+        self._db = database
+
+    async def search(self, q: str, limit: int, offset: int = 0) -> List[str]:
+        keys = _search_keys(q)
+        if not keys:
+            return []
+        # Exact token matches outrank prefix matches, so they are queried on
+        # their own: otherwise a run of alphabetically earlier prefix matches
+        # could push them past the candidate cap before _rank ever sees them
+        exact = {"$and": [{"$or": [{"search.name": k}, {"search.owner": k}]} for k in keys]}
+        prefix = {"search.prefixes": {"$all": keys}}
+        cap = offset + limit + SEARCH_MAX_CANDIDATES
+        candidates: Dict[str, Tuple[str, str, Dict[str, List[str]]]] = {}
+        for query in (exact, prefix):
+            cursor = (
+                self._db.patients.find(
+                    {**query, "deleted_at": None},
+                    {"_id": 0, "patient_id": 1, "name": 1, "search.name": 1, "search.owner": 1},
+                )
+                .sort("name", ASCENDING)
+                .limit(cap)
+            )
+            async for d in cursor:
+                candidates.setdefault(d["patient_id"], (d["patient_id"], d.get("name"), d.get("search") or {}))
+        return _rank(keys, candidates.values())[offset : offset + limit]
+
+
+class InMemoryPatientSearchIndex(PatientSearchIndex):
+    """Pure-Python inverted index (prefix -> patient ids); needs no Mongo to query."""
+
+    def __init__(self, database=None):
+        self._db = database
+        self._postings: Dict[str, Set[str]] = {}
+        self._entries: Dict[str, Tuple[str, Dict[str, List[str]]]] = {}
+
+    async def load(self) -> None:
+        if self._db is None:
+            return
+        cursor = self._db.patients.find(
+            {"deleted_at": None}, {"_id": 0, "patient_id": 1, "name": 1, "owner_name": 1}
+        )
+        async for doc in cursor:
+            self.add(doc)
+
+    def add(self, patient: Dict[str, Any]) -> None:
+        patient_id = patient["patient_id"]
+        self.remove(patient_id)
+        search = search_document(patient.get("name"), patient.get("owner_name"))
+        self._entries[patient_id] = (patient.get("name") or "", search)
+        for prefix in search["prefixes"]:
+            self._postings.setdefault(prefix, set()).add(patient_id)
+
+    def remove(self, patient_id: str) -> None:
+        entry = self._entries.pop(patient_id, None)
+        if entry is None:
+            return
+        for prefix in entry[1]["prefixes"]:
+            ids = self._postings.get(prefix)
+            if ids is not None:
+                ids.discard(patient_id)
+                if not ids:
+                    del self._postings[prefix]
+
+    async def search(self, q: str, limit: int, offset: int = 0) -> List[str]:
+        keys = _search_keys(q)
+        if not keys:
+            return []
+        postings = sorted((self._postings.get(k, set()) for k in keys), key=len)
+        matches = set(postings[0]).intersection(*postings[1:])
+        candidates = [(pid, *self._entries[pid]) for pid in matches]
+        return _rank(keys, candidates)[offset : offset + limit]
+
+
+def build_patient_search(backend: str, database) -> PatientSearchIndex:
+    if backend == "mongo":
+        return MongoPatientSearchIndex(database)
+    if backend == "memory":
+        return InMemoryPatientSearchIndex(database)
+    raise RuntimeError(f"Unknown SEARCH_BACKEND: {backend!r} (expected 'mongo' or 'memory')")
+
+
+async def _backfill_patient_search(database, batch_size: int = 500) -> None:
+    """Add search keys to patients created before the search index existed."""
+    cursor = database.patients.find(
+        {"search": {"$exists": False}}, {"_id": 0, "patient_id": 1, "name": 1, "owner_name": 1}
+    )
+    ops: List[UpdateOne] = []
+    async for doc in cursor:
+        ops.append(
+            UpdateOne(
+                {"patient_id": doc["patient_id"]},
+                {"$set": {"search": search_document(doc.get("name"), doc.get("owner_name"))}},
+            )
+        )
+        if len(ops) >= batch_size:
+            await database.patients.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        await database.patients.bulk_write(ops, ordered=False)
+
+
+# -----------------------------
+# Referential checks
+# -----------------------------
+
+# How long a confirmed patient/exam id is trusted without asking Mongo again.
+# Deletes in this process invalidate at once; other processes see them within the TTL.
+REF_CACHE_TTL = 10.0
+REF_CACHE_MAX_ENTRIES = 20_000
+
+# patient_id -> True / exam_id -> owning patient_id (live, not tombstoned)
+_known_patients = LRUCache(REF_CACHE_MAX_ENTRIES, ttl=REF_CACHE_TTL)
+_known_exams = LRUCache(REF_CACHE_MAX_ENTRIES, ttl=REF_CACHE_TTL)
+
+
+def remember_patient(patient_id: str) -> None:
+    _known_patients.set(patient_id, True)
+
+
+def remember_exam(exam_id: str, patient_id: str) -> None:
+    _known_exams.set(exam_id, patient_id)
+    remember_patient(patient_id)
+
+
+def forget_ref(*, patient_id: Optional[str] = None, exam_id: Optional[str] = None) -> None:
+    # Cached exams are only trusted while their patient is, so dropping the
+    # patient also invalidates its exams
+    if patient_id:
+        _known_patients.pop(patient_id)
+    if exam_id:
+        _known_exams.pop(exam_id)
+
+
+async def require_patient(patient_id: str) -> None:
+    if _known_patients.get(patient_id):
+        return
+    doc = await db().patients.find_one({"patient_id": patient_id, "deleted_at": None}, {"_id": 0, "patient_id": 1})
+    if not doc:
+        raise HTTPException(status_code=400, detail="Invalid patient_id")
+    remember_patient(patient_id)
+
+
+async def require_exam(exam_id: str) -> str:
+    """Owning patient_id of a live exam of a live patient."""
+    patient_id = _known_exams.get(exam_id)
+    if patient_id and _known_patients.get(patient_id):
+        return patient_id
+    doc = await db().exams.find_one({"exam_id": exam_id, "deleted_at": None}, {"_id": 0, "patient_id": 1})
+    if not doc:
+        raise HTTPException(status_code=400, detail="Invalid exam_id")
+    # A deleted patient's exams stay live until its purge job hides them
+    try:
+        await require_patient(doc["patient_id"])
+    except HTTPException:
+        raise HTTPException(status_code=400, detail="Invalid exam_id")
+    remember_exam(exam_id, doc["patient_id"])
+    return doc["patient_id"]
+
+
 # -----------------------------
 # Patients
 # -----------------------------
@@ -273,6 +1503,7 @@ async def create_patient(payload: PatientCreate = Body(...)):
     patient = {
         "patient_id": new_uuid("pat"),
         **payload.model_dump(),
+        "search": search_document(payload.name, payload.owner_name),
         "created_at": now,
         "updated_at": now,
     }
@@ -280,72 +1511,103 @@ async def create_patient(payload: PatientCreate = Body(...)):
         await db().patients.insert_one(patient)
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Duplicate patient_id")
+    patient_search().add(patient)
+    remember_patient(patient["patient_id"])
     return Patient(**clean(patient))
 
 
-@app.get("/api/patients", response_model=List[Patient])
+@app.get("/api/patients", response_model=Union[List[Patient], PatientPage])
 async def list_patients(
+    response: Response,
     q: Optional[str] = Query(default=None, description="Search by name/owner"),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    page_cursor: Optional[str] = Query(
+        default=None, alias="cursor", description="Opaque keyset cursor; pass it empty to start"
+    ),
+    view: ListView = Query(default="full", description="summary: id, name, species, owner, updated_at"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated Patient fields (overrides view)"),
 ):
-    selector: Dict[str, Any] = {}
-    if q:
-        selector = {
-            "$or": [
-                {"name": {"$regex": q, "$options": "i"}},
-                {"owner_name": {"$regex": q, "$options": "i"}},
-            ]
-        }
+    names = view_fields(view, fields, Patient, PatientSummary, "patient_id")
+    projection = PATIENT_PROJECTION if names is None else view_projection(names, PATIENT_SORT)
+
+    if q and q.strip():
+        # Ranked, accent-insensitive prefix search ("jos sil" finds "José da Silva")
+        start = decode_cursor(page_cursor, "patients:q", 1)[0] if page_cursor else offset
+        ids = await patient_search().search(q, limit=limit + 1, offset=start)
+        next_cursor = encode_cursor("patients:q", [start + limit]) if len(ids) > limit else None
+        ids = ids[:limit]
+        found = {}
+        if ids:
+            found = {
+                d["patient_id"]: d
+                async for d in db().patients.find({"patient_id": {"$in": ids}, "deleted_at": None}, projection)
+            }
+        docs = [found[pid] for pid in ids if pid in found]
+    else:
+        docs, next_cursor = await fetch_page(
+            db().patients, {"deleted_at": None}, projection, PATIENT_SORT, "patients", limit, offset, page_cursor
+        )
 
-    cursor = (
-        db()
-        .patients.find(selector, {"_id": 0})
-        .sort("name", ASCENDING)
-        .skip(offset)
-        .limit(limit)
-    )
-    docs = [Patient(**d) async for d in cursor]
-    return docs
+    if names is not None:
+        return view_response(docs, names, PatientSummary, bool(fields), next_cursor, page_cursor)
+    return paged_response(docs, Patient, next_cursor, page_cursor, response, PatientPage)
 
 
 @app.get("/api/patients/{patient_id}", response_model=Patient, responses={404: {"model": ApiError}})
 async def get_patient(patient_id: str):
-    doc = await db().patients.find_one({"patient_id": patient_id}, {"_id": 0})
+    doc = await db().patients.find_one({"patient_id": patient_id, "deleted_at": None}, PATIENT_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return Patient(**doc)
+    return model_response(Patient, doc)
 
 
 @app.patch("/api/patients/{patient_id}", response_model=Patient)
 async def update_patient(patient_id: str, payload: PatientUpdate = Body(...)):
     patch = {k: v for k, v in payload.model_dump().items() if v is not None}
     patch["updated_at"] = utc_now()
-
-    result = await db().patients.find_one_and_update(
-        {"patient_id": patient_id},
-        {"$set": patch},
-        projection={"_id": 0},
-        return_document=True,
-    )
+    renamed = "name" in patch or "owner_name" in patch
+
+    while True:
+        query: Dict[str, Any] = {"patient_id": patient_id, "deleted_at": None}
+        if renamed:
+            # Search keys cover both names: pin the one not being patched so a
+            # concurrent rename of it makes this write miss and retry
+            current = await db().patients.find_one(query, {"_id": 0, "name": 1, "owner_name": 1})
+            if not current:
+                raise HTTPException(status_code=404, detail="Patient not found")
+            names = {field: patch.get(field, current.get(field)) for field in ("name", "owner_name")}
+            query.update({field: current.get(field) for field in names if field not in patch})
+            patch["search"] = search_document(names["name"], names["owner_name"])
+
+        result = await db().patients.find_one_and_update(
+            query,
+            {"$set": patch},
+            projection=PATIENT_PROJECTION,
+            return_document=True,
+        )
+        if result or not renamed:
+            break
 
     if not result:
         raise HTTPException(status_code=404, detail="Patient not found")
 
+    if renamed:
+        patient_search().add(result)
+
     return Patient(**result)
 
 
 @app.delete("/api/patients/{patient_id}")
 async def delete_patient(patient_id: str):
-    # Cascade delete: exams + images
-    exams = db().exams.find({"patient_id": patient_id}, {"_id": 0, "exam_id": 1})
-    exam_ids = [e["exam_id"] async for e in exams]
-
-    await db().images.delete_many({"patient_id": patient_id})
-    await db().exams.delete_many({"patient_id": patient_id})
-    await db().patients.delete_one({"patient_id": patient_id})
+    """Tombstone the patient now; its exams are hidden and purged by a background job.
 
-    return {"deleted": True, "patient_id": patient_id, "exams_deleted": len(exam_ids)}
+    The job's ``progress`` counts the exams and images it removes.
+    """
+    job_id = await start_cascade_delete("patient", patient_id)
+    if job_id is not None:
+        patient_search().remove(patient_id)
+    return {"deleted": True, "patient_id": patient_id, "job_id": job_id}
 
 
 # -----------------------------
@@ -355,9 +1617,7 @@ async def delete_patient(patient_id: str):
 @app.post("/api/exams", response_model=Exam)
 async def create_exam(payload: ExamCreate = Body(...)):
     # Ensure patient exists
-    patient = await db().patients.find_one({"patient_id": payload.patient_id}, {"_id": 0})
-    if not patient:
-        raise HTTPException(status_code=400, detail="Invalid patient_id")
+    await require_patient(payload.patient_id)
 
     now = utc_now()
     exam = {
@@ -365,6 +1625,8 @@ async def create_exam(payload: ExamCreate = Body(...)):
         **payload.model_dump(),
         "date": payload.exam_date or now,
         "images": [],
+        "image_count": 0,
+        "cover_image_id": None,
         "created_at": now,
         "updated_at": now,
     }
@@ -373,37 +1635,46 @@ async def create_exam(payload: ExamCreate = Body(...)):
         await db().exams.insert_one(exam)
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Duplicate exam_id")
+    remember_exam(exam["exam_id"], exam["patient_id"])
+    await bump_exam_stats(_count_exams([exam]))
 
     return Exam(**clean(exam))
 
 
-@app.get("/api/exams", response_model=List[Exam])
+@app.get("/api/exams", response_model=Union[List[Exam], ExamPage])
 async def list_exams(
+    response: Response,
     patient_id: Optional[str] = Query(default=None),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    page_cursor: Optional[str] = Query(
+        default=None, alias="cursor", description="Opaque keyset cursor; pass it empty to start"
+    ),
+    view: ListView = Query(
+        default="full", description="summary: dates, type, status, image count and cover (no organs_data/notes/refs)"
+    ),
+    fields: Optional[str] = Query(default=None, description="Comma-separated Exam fields (overrides view)"),
 ):
-    selector: Dict[str, Any] = {}
+    selector: Dict[str, Any] = {"deleted_at": None}
     if patient_id:
         selector["patient_id"] = patient_id
 
-    cursor = (
-        db()
-        .exams.find(selector, {"_id": 0})
-        .sort("date", -1)
-        .skip(offset)
-        .limit(limit)
+    names = view_fields(view, fields, Exam, ExamSummary, "exam_id")
+    projection = {"_id": 0} if names is None else view_projection(names, EXAM_SORT)
+    docs, next_cursor = await fetch_page(
+        db().exams, selector, projection, EXAM_SORT, "exams", limit, offset, page_cursor
     )
-    docs = [Exam(**d) async for d in cursor]
-    return docs
+    if names is not None:
+        return view_response(docs, names, ExamSummary, bool(fields), next_cursor, page_cursor)
+    return paged_response(docs, Exam, next_cursor, page_cursor, response, ExamPage)
 
 
 @app.get("/api/exams/{exam_id}", response_model=Exam)
 async def get_exam(exam_id: str):
-    doc = await db().exams.find_one({"exam_id": exam_id}, {"_id": 0})
+    doc = await db().exams.find_one({"exam_id": exam_id, "deleted_at": None}, {"_id": 0})
     if not doc:
         raise HTTPException(status_code=404, detail="Exam not found")
-    return Exam(**doc)
+    return model_response(Exam, doc)
 
 
 @app.patch("/api/exams/{exam_id}", response_model=Exam)
@@ -413,78 +1684,1002 @@ async def update_exam(exam_id: str, payload: ExamUpdate = Body(...)):
         patch["date"] = patch.pop("exam_date")
     patch["updated_at"] = utc_now()
 
-    result = await db().exams.find_one_and_update(
-        {"exam_id": exam_id},
+    # The previous version tells which rollup bucket the exam leaves
+    before = await db().exams.find_one_and_update(
+        {"exam_id": exam_id, "deleted_at": None},
         {"$set": patch},
         projection={"_id": 0},
-        return_document=True,
+        return_document=ReturnDocument.BEFORE,
     )
 
-    if not result:
+    if not before:
         raise HTTPException(status_code=404, detail="Exam not found")
 
+    forget_report(exam_id)
+    result = {**before, **patch}
+    if exam_bucket(before) != exam_bucket(result):
+        await bump_exam_stats({exam_bucket(before): -1, exam_bucket(result): 1})
     return Exam(**result)
 
 
 @app.delete("/api/exams/{exam_id}")
 async def delete_exam(exam_id: str):
-    await db().images.delete_many({"exam_id": exam_id})
-    await db().exams.delete_one({"exam_id": exam_id})
-    return {"deleted": True, "exam_id": exam_id}
-
-
+    """Tombstone the exam now; its images and series are purged in a background job."""
+    job_id = await start_cascade_delete("exam", exam_id)
+    return {"deleted": True, "exam_id": exam_id, "job_id": job_id}
 
 
 # -----------------------------
-# Templates (Textos padrão)
+# Batch writes (patients / exams)
 # -----------------------------
 
-@app.post("/api/templates", response_model=Template)
-async def create_template(payload: TemplateCreate = Body(...)):
-    now = utc_now()
-    tpl = {
-        "template_id": new_uuid("tpl"),
-        **payload.model_dump(),
-        "created_at": now,
-        "updated_at": now,
-    }
-    try:
-        await db().templates.insert_one(tpl)
-    except DuplicateKeyError:
-        raise HTTPException(status_code=400, detail="Duplicate template_id")
-    return Template(**clean(tpl))
+# Documents sent per unordered insert_many
+BATCH_WRITE_SIZE = 1000
+# Upper bound on items per request (the rest are reported as failed)
+MAX_BATCH_ITEMS = 20_000
 
 
-@app.get("/api/templates", response_model=List[Template])
-async def list_templates(
-    lang: Optional[Literal["pt", "en"]] = Query(default=None),
-    exam_type: Optional[str] = Query(default=None),
-    organ: Optional[str] = Query(default=None),
-    q: Optional[str] = Query(default=None, description="Search in title/text"),
-    limit: int = Query(default=200, ge=1, le=500),
-    offset: int = Query(default=0, ge=0),
-):
-    selector: Dict[str, Any] = {}
-    if lang:
-        selector["lang"] = lang
-    if exam_type:
-        selector["exam_type"] = exam_type
-    if organ:
-        selector["organ"] = organ
-    if q:
-        selector["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"text": {"$regex": q, "$options": "i"}},
+async def _batch_items(request: Request) -> AsyncIterator[Any]:
+    """Items of a JSON array body, or raw lines of an NDJSON body (streamed)."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        async for raw in _ndjson_lines(request):
+            if raw.strip():
+                yield raw
+        return
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array (or NDJSON with Content-Type: application/x-ndjson)")
+    for item in items:
+        yield item
+
+
+def _batch_item(raw: Any, model: type, id_field: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Validated payload plus the client-supplied id, if any (raises ValueError)."""
+    data = json.loads(raw) if isinstance(raw, bytes) else raw
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    payload = model.model_validate(data).model_dump()
+    item_id = data.get(id_field)
+    if item_id is not None and (not isinstance(item_id, str) or not item_id.strip()):
+        raise ValueError(f"Invalid {id_field}")
+    return payload, item_id
+
+
+def _batch_error(exc: ValueError) -> str:
+    if isinstance(exc, ValidationError):
+        err = exc.errors()[0]
+        loc = ".".join(str(part) for part in err["loc"])
+        return f"{loc}: {err['msg']}" if loc else err["msg"]
+    return str(exc).splitlines()[0]
+
+
+async def _insert_batch(
+    collection, docs: List[Dict[str, Any]], id_field: str
+) -> Dict[int, str]:
+    """Unordered insert_many; returns ``{position: detail}`` for rejected documents."""
+    if not docs:
+        return {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+        return {}
+    except BulkWriteError as exc:
+        failed = {}
+        for err in exc.details.get("writeErrors", []):
+            duplicate = err.get("code") == 11000
+            failed[err["index"]] = f"Duplicate {id_field}" if duplicate else err.get("errmsg", "write error")
+        return failed
+
+
+async def _run_batch(
+    request: Request,
+    model: type,
+    id_field: str,
+    flush: Callable[[List[Tuple[int, Dict[str, Any]]], BatchWriteResult], Any],
+) -> BatchWriteResult:
+    result = BatchWriteResult()
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    index = -1
+    async for raw in _batch_items(request):
+        index += 1
+        result.received += 1
+        if index >= MAX_BATCH_ITEMS:
+            result.failed += 1
+            result.results.append(
+                BatchWriteItem(index=index, status="failed", detail=f"Batch limit reached (max {MAX_BATCH_ITEMS} items)")
+            )
+            continue
+        try:
+            payload, item_id = _batch_item(raw, model, id_field)
+        except ValueError as exc:
+            result.failed += 1
+            result.results.append(BatchWriteItem(index=index, status="failed", detail=_batch_error(exc)))
+            continue
+        payload[id_field] = item_id
+        pending.append((index, payload))
+        if len(pending) >= BATCH_WRITE_SIZE:
+            await flush(pending, result)
+            pending = []
+    if pending:
+        await flush(pending, result)
+    result.results.sort(key=lambda r: r.index)
+    return result
+
+
+def _record_batch(
+    result: BatchWriteResult,
+    items: List[Tuple[int, str]],
+    failed: Dict[int, str],
+) -> None:
+    """Append per-item outcomes; ``failed`` is keyed by position in ``items``."""
+    for pos, (index, item_id) in enumerate(items):
+        if pos in failed:
+            result.failed += 1
+            result.results.append(BatchWriteItem(index=index, status="failed", id=item_id, detail=failed[pos]))
+        else:
+            result.created += 1
+            result.results.append(BatchWriteItem(index=index, status="created", id=item_id))
+
+
+async def _flush_patients(pending: List[Tuple[int, Dict[str, Any]]], result: BatchWriteResult) -> None:
+    now = utc_now()
+    docs = []
+    for _, payload in pending:
+        patient_id = payload.pop("patient_id") or new_uuid("pat")
+        docs.append(
+            {
+                "patient_id": patient_id,
+                **payload,
+                "search": search_document(payload["name"], payload.get("owner_name")),
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    failed = await _insert_batch(db().patients, docs, "patient_id")
+    for pos, doc in enumerate(docs):
+        if pos not in failed:
+            patient_search().add(doc)
+            remember_patient(doc["patient_id"])
+    _record_batch(result, [(index, doc["patient_id"]) for (index, _), doc in zip(pending, docs)], failed)
+
+
+async def _flush_exams(pending: List[Tuple[int, Dict[str, Any]]], result: BatchWriteResult) -> None:
+    # One $in for every patient of the batch not already confirmed
+    wanted = {payload["patient_id"] for _, payload in pending if not _known_patients.get(payload["patient_id"])}
+    if wanted:
+        cursor = db().patients.find(
+            {"patient_id": {"$in": list(wanted)}, "deleted_at": None}, {"_id": 0, "patient_id": 1}
+        )
+        async for doc in cursor:
+            remember_patient(doc["patient_id"])
+            wanted.discard(doc["patient_id"])
+
+    now = utc_now()
+    items: List[Tuple[int, str]] = []
+    docs = []
+    for index, payload in pending:
+        exam_id = payload.pop("exam_id") or new_uuid("exam")
+        if payload["patient_id"] in wanted:
+            result.failed += 1
+            result.results.append(BatchWriteItem(index=index, status="failed", id=exam_id, detail="Invalid patient_id"))
+            continue
+        items.append((index, exam_id))
+        docs.append(
+            {
+                "exam_id": exam_id,
+                **payload,
+                "date": payload["exam_date"] or now,
+                "images": [],
+                "image_count": 0,
+                "cover_image_id": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    failed = await _insert_batch(db().exams, docs, "exam_id")
+    for pos, doc in enumerate(docs):
+        if pos not in failed:
+            remember_exam(doc["exam_id"], doc["patient_id"])
+    await bump_exam_stats(_count_exams(doc for pos, doc in enumerate(docs) if pos not in failed))
+    _record_batch(result, items, failed)
+
+
+@app.post("/api/patients:batch", response_model=BatchWriteResult)
+async def create_patients_batch(request: Request):
+    """Create many patients from a JSON array or an NDJSON stream of PatientCreate.
+
+    Items may carry their own ``patient_id`` (legacy migration / offline
+    clients); otherwise one is generated. Documents are written with unordered
+    ``insert_many`` in chunks, and every item gets a result in ``results``.
+    """
+    return await _run_batch(request, PatientCreate, "patient_id", _flush_patients)
+
+
+@app.post("/api/exams:batch", response_model=BatchWriteResult)
+async def create_exams_batch(request: Request):
+    """Create many exams from a JSON array or an NDJSON stream of ExamCreate.
+
+    Patient references are checked with one ``$in`` query per chunk; items
+    may carry their own ``exam_id``. Per-item outcomes are returned in ``results``.
+    """
+    return await _run_batch(request, ExamCreate, "exam_id", _flush_exams)
+
+
+# -----------------------------
+# Background jobs (cascade deletion)
+# -----------------------------
+
+# Exams purged per step of a patient delete
+CASCADE_EXAM_BATCH = 20
+# Images (and their blob references) released per step
+CASCADE_IMAGE_BATCH = 200
+
+
+async def create_job(kind: str, target_id: str, job_id: Optional[str] = None) -> str:
+    now = utc_now()
+    job_id = job_id or new_uuid("job")
+    await db().jobs.insert_one(
+        {
+            "job_id": job_id,
+            "kind": kind,
+            "target_id": target_id,
+            "status": "queued",
+            "progress": {},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+    )
+    return job_id
+
+
+async def _job_progress(job_id: str, **counts: int) -> None:
+    await db().jobs.update_one(
+        {"job_id": job_id},
+        {"$inc": {f"progress.{k}": v for k, v in counts.items()}, "$set": {"updated_at": utc_now()}},
+    )
+
+
+async def start_cascade_delete(kind: Literal["patient", "exam"], target_id: str) -> Optional[str]:
+    """Tombstone ``target_id`` and queue its purge; returns the job id.
+
+    Deleting something already being deleted returns the running job; an
+    unknown id returns ``None``. The tombstone is written first (carrying the
+    new job id) and the job row after it, so unknown ids never create jobs.
+    """
+    collection, key = (db().patients, "patient_id") if kind == "patient" else (db().exams, "exam_id")
+    forget_ref(**{key: target_id})
+    job_id = new_uuid("job")
+    now = utc_now()
+    before = await collection.find_one_and_update(
+        {key: target_id, "deleted_at": None},
+        {"$set": {"deleted_at": now, "job_id": job_id}},
+        projection={"_id": 0, key: 1, "date": 1, "exam_type": 1, "status": 1},
+    )
+    if before is None:
+        existing = await collection.find_one({key: target_id}, {"_id": 0, "job_id": 1})
+        job_id = existing.get("job_id") if existing else None
+        if job_id and await db().jobs.find_one({"job_id": job_id}, {"_id": 1}) is None:
+            # Tombstoned by a process that stopped before queueing the purge
+            try:
+                await create_job(f"delete_{kind}", target_id, job_id)
+            except DuplicateKeyError:
+                return job_id  # a concurrent delete queued it meanwhile
+            spawn_background(run_job(job_id))
+        return job_id
+    try:
+        await create_job(f"delete_{kind}", target_id, job_id)
+        queued = True
+    except DuplicateKeyError:
+        queued = False  # a concurrent delete of the same id saw the tombstone first and queued it
+    await record_tombstones(kind, [target_id])
+    if kind == "exam":
+        forget_report(target_id)
+        await bump_exam_stats(_count_exams([before], sign=-1))
+    else:
+        # The patient's exams are hidden by the job (see _hide_patient_exams)
+        await db().stats_patients.update_one({"_id": target_id}, {"$set": {"deleted": True}})
+    if queued:
+        spawn_background(run_job(job_id))
+    return job_id
+
+
+async def _in_transaction(fn: Callable[[Any], Any]) -> Any:
+    """Run ``fn(session)`` in a transaction when enabled, else with ``session=None``."""
+    if not settings.cascade_transactions:
+        return await fn(None)
+    async with await app.state.mongo_client.start_session() as session:
+        async with session.start_transaction():
+            return await fn(session)
+
+
+async def _purge_images(selector: Dict[str, Any], job_id: Optional[str] = None) -> int:
+    """Delete images matching ``selector`` in bounded batches, releasing their blobs."""
+    purged = 0
+    while True:
+        cursor = db().images.find(
+            selector,
+            {
+                "_id": 0,
+                "image_id": 1,
+                "patient_id": 1,
+                "sha256": 1,
+                "blob_id": 1,
+                "created_at": 1,
+                "kind": 1,
+                "size_bytes": 1,
+            },
+        )
+        batch = await cursor.limit(CASCADE_IMAGE_BATCH).to_list(length=CASCADE_IMAGE_BATCH)
+        if not batch:
+            return purged
+
+        async def delete(session):
+            ids = [d["image_id"] for d in batch]
+            await db().images.delete_many({"image_id": {"$in": ids}}, session=session)
+            await db().exam_images.delete_many({"image_id": {"$in": ids}}, session=session)
+            await record_tombstones("image", ids, session=session)
+
+        await _in_transaction(delete)
+        await bump_image_stats(batch, sign=-1)
+        # Blob storage is not transactional: release only after the rows are gone
+        for d in batch:
+            await _release_blob(d.get("sha256"), d.get("blob_id"))
+        purged += len(batch)
+        if job_id:
+            await _job_progress(job_id, images=len(batch))
+
+
+async def _purge_exams(exam_ids: List[str], job_id: str) -> None:
+    await _purge_images({"exam_id": {"$in": exam_ids}}, job_id)
+
+    async def delete(session):
+        await db().dicom_series.delete_many({"exam_id": {"$in": exam_ids}}, session=session)
+        await db().exam_images.delete_many({"exam_id": {"$in": exam_ids}}, session=session)
+        await db().exams.delete_many({"exam_id": {"$in": exam_ids}}, session=session)
+        await record_tombstones("exam", exam_ids, session=session)
+
+    await _in_transaction(delete)
+    await _job_progress(job_id, exams=len(exam_ids))
+
+
+async def _hide_patient_exams(patient_id: str, job_id: str) -> None:
+    """Tombstone a deleted patient's live exams batch by batch, out of the rollups.
+
+    Each batch is stamped with ``job_id`` so the stats decrement covers exactly
+    the rows this job tombstoned (not exams deleted or changed concurrently),
+    read back as they were when hidden.
+    """
+    while True:
+        cursor = db().exams.find({"patient_id": patient_id, "deleted_at": None}, {"_id": 0, "exam_id": 1})
+        batch = await cursor.limit(CASCADE_EXAM_BATCH).to_list(length=CASCADE_EXAM_BATCH)
+        if not batch:
+            return
+        exam_ids = [e["exam_id"] for e in batch]
+        await db().exams.update_many(
+            {"exam_id": {"$in": exam_ids}, "deleted_at": None}, {"$set": {"deleted_at": utc_now(), "job_id": job_id}}
+        )
+        cursor = db().exams.find(
+            {"exam_id": {"$in": exam_ids}, "job_id": job_id}, {"_id": 0, "exam_id": 1, "date": 1, "exam_type": 1, "status": 1}
+        )
+        hidden = [doc async for doc in cursor]
+        for doc in hidden:
+            forget_ref(exam_id=doc["exam_id"])
+            forget_report(doc["exam_id"])
+        await bump_exam_stats(_count_exams(hidden, sign=-1))
+        await _job_progress(job_id, exams_hidden=len(hidden))
+
+
+async def _purge_patient(patient_id: str, job_id: str) -> None:
+    await _hide_patient_exams(patient_id, job_id)
+    while True:
+        cursor = db().exams.find({"patient_id": patient_id}, {"_id": 0, "exam_id": 1})
+        batch = await cursor.limit(CASCADE_EXAM_BATCH).to_list(length=CASCADE_EXAM_BATCH)
+        if not batch:
+            break
+        await _purge_exams([e["exam_id"] for e in batch], job_id)
+    # Images and series not attached to any exam
+    await _purge_images({"patient_id": patient_id}, job_id)
+    await db().dicom_series.delete_many({"patient_id": patient_id})
+    await db().patients.delete_one({"patient_id": patient_id})
+    await db().stats_patients.delete_one({"_id": patient_id})
+    await _job_progress(job_id, patients=1)
+
+
+async def run_job(job_id: str) -> None:
+    job = await db().jobs.find_one_and_update(
+        {"job_id": job_id, "status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "running", "updated_at": utc_now()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not job:
+        return
+    try:
+        if job["kind"] == "delete_patient":
+            await _purge_patient(job["target_id"], job_id)
+        elif job["kind"] == "delete_exam":
+            await _purge_exams([job["target_id"]], job_id)
+        elif job["kind"] == "backup":
+            await _write_backup(job["target_id"], job_id)
+        elif job["kind"] == "restore":
+            await _restore_backup(job["target_id"], job_id)
+        else:
+            raise RuntimeError(f"Unknown job kind: {job['kind']!r}")
+    except Exception as exc:
+        now = utc_now()
+        await db().jobs.update_one(
+            {"job_id": job_id},
+            {"$set": {"status": "failed", "error": str(exc), "updated_at": now, "finished_at": now}},
+        )
+        return
+    now = utc_now()
+    await db().jobs.update_one(
+        {"job_id": job_id}, {"$set": {"status": "done", "updated_at": now, "finished_at": now}}
+    )
+
+
+@app.get("/api/jobs/{job_id}", response_model=Job, responses={404: {"model": ApiError}})
+async def get_job(job_id: str):
+    doc = await db().jobs.find_one({"job_id": job_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**doc)
+
+
+# -----------------------------
+# Template search
+# -----------------------------
+
+# Title/organ hits outweigh body hits
+TEMPLATE_TITLE_WEIGHT = 3.0
+# Expansions considered for the last (still being typed) query token
+TEMPLATE_MAX_EXPANSIONS = 64
+# Shorter trailing tokens are matched as whole words only
+TEMPLATE_MIN_PREFIX = 1
+# Prefix matches rank below whole-word matches
+TEMPLATE_PREFIX_WEIGHT = 0.7
+
+_STOPWORDS = frozenset(
+    "a ao aos as com da das de do dos e em na nas no nos o os ou para por sem um uma "
+    "an and are at be by for in is it of on or the to with without".split()
+)
+
+# Light pt/en stemmer applied to accent-folded tokens: plural, then derivational
+# suffix, then gender vowel ("preservadas"/"preservado" -> "preservad")
+_PLURAL_RULES = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ies", "y"), ("ns", "m"))
+_SUFFIX_RULES = ("mente", "ing", "ed", "ly")
+
+
+@functools.lru_cache(maxsize=65536)
+def stem_token(token: str) -> str:
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, repl in _PLURAL_RULES:
+        if token.endswith(suffix):
+            token = token[: -len(suffix)] + repl
+            break
+    else:
+        if token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+    for suffix in _SUFFIX_RULES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            token = token[: -len(suffix)]
+            break
+    if len(token) > 4 and token[-1] in "aoe":
+        token = token[:-1]
+    return token
+
+
+def _term_counts(value: Optional[str]) -> Tuple[Dict[str, int], Set[str]]:
+    """Stem frequencies and the surface words they came from."""
+    counts: Dict[str, int] = {}
+    words: Set[str] = set()
+    for token in text_tokens(value):
+        if token in _STOPWORDS:
+            continue
+        words.add(token)
+        stem = stem_token(token)
+        counts[stem] = counts.get(stem, 0) + 1
+    return counts, words
+
+
+class _TemplateEntry:
+    __slots__ = ("lang", "exam_type", "organ", "title", "terms", "words")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.lang = doc.get("lang")
+        self.exam_type = doc.get("exam_type")
+        self.organ = doc.get("organ") or ""
+        self.title = doc.get("title") or ""
+        title_counts, title_words = _term_counts(f"{self.organ} {self.title}")
+        text_counts, text_words = _term_counts(doc.get("text"))
+        # stem -> saturated, field-weighted term frequency
+        self.terms: Dict[str, float] = {}
+        for stem in title_counts.keys() | text_counts.keys():
+            title_tf, text_tf = title_counts.get(stem, 0), text_counts.get(stem, 0)
+            self.terms[stem] = TEMPLATE_TITLE_WEIGHT * title_tf / (title_tf + 0.5) + text_tf / (text_tf + 1.2)
+        self.words = title_words | text_words
+
+
+class TemplateSearchIndex:
+    """In-process inverted index over template organ, title and text.
+
+    Accent-folded and lightly stemmed, so "figado preservada" finds
+    "Fígado ... preservado"; the last query token is matched as a prefix for
+    autocomplete. Kept current by the template endpoints; queries never touch
+    Mongo.
+    """
+
+    def __init__(self, database=None):
+        self._db = database
+        self._entries: Dict[str, _TemplateEntry] = {}
+        # stem -> {template_id: weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # surface word -> number of templates using it (for prefix expansion)
+        self._words: Dict[str, int] = {}
+        self._sorted_words: Optional[List[str]] = None
+        # add/remove calls made while load() reads Mongo, replayed onto the new index
+        self._changes: Optional[List[Tuple[str, Any]]] = None
+
+    async def load(self) -> None:
+        """Rebuild from Mongo; queries keep using the current index until the swap."""
+        fresh = TemplateSearchIndex()
+        if self._db is not None:
+            self._changes = []
+            try:
+                projection = {"_id": 0, "template_id": 1, "lang": 1, "exam_type": 1, "organ": 1, "title": 1, "text": 1}
+                async for doc in self._db.templates.find({}, projection):
+                    fresh.add(doc)
+                for op, arg in self._changes:
+                    getattr(fresh, op)(arg)
+            finally:
+                self._changes = None
+        self._entries, self._postings, self._words, self._sorted_words = (
+            fresh._entries,
+            fresh._postings,
+            fresh._words,
+            fresh._sorted_words,
+        )
+
+    def add(self, template: Dict[str, Any]) -> None:
+        template_id = template["template_id"]
+        if self._changes is not None:
+            self._changes.append(("add", template))
+        self._discard(template_id)
+        entry = _TemplateEntry(template)
+        self._entries[template_id] = entry
+        for stem, tf in entry.terms.items():
+            self._postings.setdefault(stem, {})[template_id] = tf
+        for word in entry.words:
+            if word not in self._words:
+                self._words[word] = 0
+                self._sorted_words = None
+            self._words[word] += 1
+
+    def remove(self, template_id: str) -> None:
+        if self._changes is not None:
+            self._changes.append(("remove", template_id))
+        self._discard(template_id)
+
+    def _discard(self, template_id: str) -> None:
+        entry = self._entries.pop(template_id, None)
+        if entry is None:
+            return
+        for stem in entry.terms:
+            ids = self._postings.get(stem)
+            if ids is not None:
+                ids.pop(template_id, None)
+                if not ids:
+                    del self._postings[stem]
+        for word in entry.words:
+            self._words[word] -= 1
+            if not self._words[word]:
+                del self._words[word]
+                self._sorted_words = None
+
+    def _expand(self, prefix: str) -> Set[str]:
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._words)
+        words = self._sorted_words
+        stems: Set[str] = set()
+        i = bisect.bisect_left(words, prefix)
+        while i < len(words) and words[i].startswith(prefix) and len(stems) < TEMPLATE_MAX_EXPANSIONS:
+            stems.add(stem_token(words[i]))
+            i += 1
+        return stems
+
+    def _idf(self, stem: str) -> float:
+        df = len(self._postings.get(stem, ()))
+        return math.log(1.0 + (len(self._entries) - df + 0.5) / (df + 0.5))
+
+    def _group_size(self, stems: Dict[str, float]) -> int:
+        return sum(len(self._postings.get(stem, ())) for stem in stems)
+
+    def search(
+        self,
+        q: str,
+        limit: int,
+        offset: int = 0,
+        *,
+        lang: Optional[str] = None,
+        exam_type: Optional[str] = None,
+        organ: Optional[str] = None,
+    ) -> List[str]:
+        """Return ranked template ids matching every query token."""
+        tokens = text_tokens(q)
+        if not tokens:
+            return []
+        prefix = tokens.pop() if not q[-1:].isspace() else None
+
+        # One group of candidate stems per query token; a template must hit every group
+        groups: List[Dict[str, float]] = [
+            {stem_token(t): 1.0} for t in tokens if t not in _STOPWORDS
         ]
+        if prefix is not None:
+            stems: Dict[str, float] = {}
+            if len(prefix) >= TEMPLATE_MIN_PREFIX:
+                stems = {stem: TEMPLATE_PREFIX_WEIGHT for stem in self._expand(prefix)}
+            exact = stem_token(prefix)
+            if exact in self._postings:
+                stems[exact] = 1.0
+            groups.append(stems)
+        if not groups:
+            return []
+
+        # Walk postings from the most selective token; later tokens only score survivors
+        scores: Optional[Dict[str, float]] = None
+        for stems in sorted(groups, key=self._group_size):
+            best: Dict[str, float] = {}
+            for stem, weight in stems.items():
+                weight *= self._idf(stem)
+                for template_id, tf in self._postings.get(stem, {}).items():
+                    if scores is not None and template_id not in scores:
+                        continue
+                    if weight * tf > best.get(template_id, 0.0):
+                        best[template_id] = weight * tf
+            scores = best if scores is None else {tid: scores[tid] + v for tid, v in best.items()}
+            if not scores:
+                return []
+
+        ranked = []
+        for template_id, score in scores.items():
+            entry = self._entries[template_id]
+            if lang and entry.lang != lang:
+                continue
+            if exam_type and entry.exam_type != exam_type:
+                continue
+            if organ and entry.organ != organ:
+                continue
+            ranked.append((-score, entry.organ, entry.title, template_id))
+        ranked = heapq.nsmallest(offset + limit, ranked)
+        return [template_id for *_, template_id in ranked[offset:]]
 
-    cursor = (
-        db()
-        .templates.find(selector, {"_id": 0})
-        .sort([("organ", ASCENDING), ("title", ASCENDING)])
-        .skip(offset)
-        .limit(limit)
+
+# -----------------------------
+# Template catalog cache
+# -----------------------------
+
+# Catalog version document in the ``meta`` collection; bumped by every template write
+TEMPLATE_VERSION_KEY = "templates_version"
+# How long a process trusts its copy of the version before re-reading it
+# (bounds staleness when several server processes share the database)
+TEMPLATE_VERSION_TTL = 2.0
+TEMPLATE_CACHE_TTL = 300.0
+TEMPLATE_CACHE_MAX_ENTRIES = 256
+
+# (version, filters...) -> cached list page or serialized catalog
+_template_cache = LRUCache(TEMPLATE_CACHE_MAX_ENTRIES, ttl=TEMPLATE_CACHE_TTL)
+_template_version: Optional[int] = None
+_template_version_checked = 0.0
+# Pending reload of the search index after another process changed templates
+_template_reload: Optional["asyncio.Task"] = None
+
+
+def _reload_template_search() -> "asyncio.Task":
+    """Rebuild the template search index in the background, after any reload in flight.
+
+    Every reload goes through here so they run one at a time and the latest
+    catalog always wins; awaiting the task (shielded) waits for the swap.
+    """
+    global _template_reload
+    previous = _template_reload
+
+    async def reload() -> None:
+        if previous is not None and not previous.done():
+            await asyncio.gather(previous, return_exceptions=True)
+        await template_search().load()
+
+    _template_reload = spawn_background(reload())
+    return _template_reload
+
+
+def _set_template_version(version: int) -> None:
+    global _template_version, _template_version_checked
+    if version != _template_version:
+        _template_cache.clear()
+    _template_version = version
+    _template_version_checked = time.monotonic()
+
+
+async def template_version() -> int:
+    """Current catalog version (cached for TEMPLATE_VERSION_TTL seconds)."""
+    if _template_version is not None and time.monotonic() - _template_version_checked < TEMPLATE_VERSION_TTL:
+        return _template_version
+    doc = await db().meta.find_one({"_id": TEMPLATE_VERSION_KEY})
+    version = int(doc["value"]) if doc else 0
+    if _template_version is not None and version != _template_version:
+        # Another process changed templates: our search index is stale too
+        _reload_template_search()
+    _set_template_version(version)
+    return version
+
+
+async def bump_template_version() -> int:
+    doc = await db().meta.find_one_and_update(
+        {"_id": TEMPLATE_VERSION_KEY},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    version = int(doc["value"])
+    if _template_version is not None and version != _template_version + 1:
+        _reload_template_search()
+    _set_template_version(version)
+    return version
+
+
+def build_template_catalog(docs: Iterable[Dict[str, Any]], version: int, lang: Optional[str]) -> TemplateCatalog:
+    """Group templates by exam type, then organ (``docs`` sorted by organ, title)."""
+    groups: Dict[Optional[str], Dict[str, List[Template]]] = {}
+    total = 0
+    for doc in docs:
+        groups.setdefault(doc.get("exam_type"), {}).setdefault(doc.get("organ") or "", []).append(Template(**doc))
+        total += 1
+    return TemplateCatalog(
+        version=version,
+        lang=lang,
+        total=total,
+        groups=[
+            TemplateCatalogGroup(
+                exam_type=exam_type,
+                organs=[TemplateCatalogOrgan(organ=organ, templates=tpls) for organ, tpls in organs.items()],
+            )
+            # Generic (no exam type) templates first
+            for exam_type, organs in sorted(groups.items(), key=lambda item: (item[0] is not None, item[0] or ""))
+        ],
+    )
+
+
+# -----------------------------
+# Templates (Textos padrão)
+# -----------------------------
+
+@app.post("/api/templates", response_model=Template)
+async def create_template(payload: TemplateCreate = Body(...)):
+    now = utc_now()
+    tpl = {
+        "template_id": new_uuid("tpl"),
+        **payload.model_dump(),
+        "created_at": now,
+        "updated_at": now,
+    }
+    try:
+        await db().templates.insert_one(tpl)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Duplicate template_id")
+    template_search().add(tpl)
+    await bump_template_version()
+    return Template(**clean(tpl))
+
+
+@app.get("/api/templates", response_model=Union[List[Template], TemplatePage])
+async def list_templates(
+    response: Response,
+    lang: Optional[Literal["pt", "en"]] = Query(default=None),
+    exam_type: Optional[str] = Query(default=None),
+    organ: Optional[str] = Query(default=None),
+    q: Optional[str] = Query(default=None, description="Search in title/text"),
+    limit: int = Query(default=200, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    page_cursor: Optional[str] = Query(
+        default=None, alias="cursor", description="Opaque keyset cursor; pass it empty to start"
+    ),
+):
+    if q and q.strip():
+        # Ranked full-text search from the in-process index; last token is a prefix.
+        # The version check is what notices writes by other processes
+        await template_version()
+        if _template_reload is not None and not _template_reload.done():
+            await asyncio.shield(_template_reload)
+        start = decode_cursor(page_cursor, "templates:q", 1)[0] if page_cursor else offset
+        ids = template_search().search(
+            q, limit=limit + 1, offset=start, lang=lang, exam_type=exam_type, organ=organ
+        )
+        next_cursor = encode_cursor("templates:q", [start + limit]) if len(ids) > limit else None
+        ids = ids[:limit]
+        found = {}
+        if ids:
+            found = {
+                d["template_id"]: d
+                async for d in db().templates.find({"template_id": {"$in": ids}}, {"_id": 0})
+            }
+        docs = [found[tid] for tid in ids if tid in found]
+        return paged_response(docs, Template, next_cursor, page_cursor, response, TemplatePage)
+
+    key = ("list", await template_version(), lang, exam_type, organ, limit, offset, page_cursor)
+    cached = _template_cache.get(key)
+    if cached is None:
+        selector: Dict[str, Any] = {}
+        if lang:
+            selector["lang"] = lang
+        if exam_type:
+            selector["exam_type"] = exam_type
+        if organ:
+            selector["organ"] = organ
+
+        docs, next_cursor = await fetch_page(
+            db().templates, selector, {"_id": 0}, TEMPLATE_SORT, "templates", limit, offset, page_cursor
+        )
+        cached = (docs, next_cursor)
+        _template_cache.set(key, cached)
+    docs, next_cursor = cached
+    return paged_response(docs, Template, next_cursor, page_cursor, response, TemplatePage)
+
+
+@app.get("/api/templates/catalog", response_model=TemplateCatalog)
+async def get_template_catalog(request: Request, lang: Optional[Literal["pt", "en"]] = Query(default=None)):
+    """Every template grouped by exam type and organ; fetch once, then revalidate."""
+    version = await template_version()
+    etag = f'"templates-{version}-{lang or "all"}"'
+    headers = {"Cache-Control": "private, no-cache", "ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    key = ("catalog", version, lang)
+    body = _template_cache.get(key)
+    if body is None:
+        cursor = db().templates.find({"lang": lang} if lang else {}, {"_id": 0}).sort(TEMPLATE_SORT)
+        catalog = build_template_catalog([d async for d in cursor], version, lang)
+        body = catalog.model_dump_json().encode()
+        _template_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Upserts sent per bulk_write when importing
+TEMPLATE_BULK_BATCH = 500
+# Per-line errors echoed back by an import (the rest are only counted)
+TEMPLATE_IMPORT_MAX_ERRORS = 100
+
+
+TEMPLATE_KEY_FIELDS = ("lang", "exam_type", "organ", "title")
+# Identity of a row: taken from the import for new rows only, never overwritten
+TEMPLATE_INSERT_ONLY_FIELDS = ("template_id", "created_at")
+
+
+def _template_upsert(tpl: Dict[str, Any], now: datetime) -> UpdateOne:
+    """Match on the natural key; every other content field is overwritten."""
+    key = {field: tpl.get(field) for field in TEMPLATE_KEY_FIELDS}
+    content = {
+        k: v for k, v in tpl.items() if k not in TEMPLATE_KEY_FIELDS and k not in TEMPLATE_INSERT_ONLY_FIELDS
+    }
+    return UpdateOne(
+        key,
+        {
+            "$setOnInsert": {
+                "template_id": tpl.get("template_id") or new_uuid("tpl"),
+                "created_at": tpl.get("created_at") or now,
+            },
+            "$set": {**content, "updated_at": now},
+        },
+        upsert=True,
+    )
+
+
+async def upsert_templates(
+    templates: List[Dict[str, Any]], now: datetime
+) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """Upsert by natural key in one unordered bulk_write.
+
+    Returns inserted and updated counts plus ``(index, message)`` for rows
+    that failed (e.g. an imported template_id already used by another row).
+    """
+    if not templates:
+        return 0, 0, []
+    try:
+        res = await db().templates.bulk_write([_template_upsert(t, now) for t in templates], ordered=False)
+        return res.upserted_count, res.modified_count, []
+    except BulkWriteError as exc:
+        details = exc.details
+        errors = [(e["index"], e.get("errmsg", "write error")) for e in details.get("writeErrors", [])]
+        return details.get("nUpserted", 0), details.get("nModified", 0), errors
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Yield request body lines without buffering the whole upload."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def _flush_import(batch: List[Tuple[int, Dict[str, Any]]], result: TemplateImportResult) -> None:
+    inserted, updated, errors = await upsert_templates([tpl for _, tpl in batch], utc_now())
+    result.inserted += inserted
+    result.updated += updated
+    result.failed += len(errors)
+    for index, detail in errors:
+        if len(result.errors) < TEMPLATE_IMPORT_MAX_ERRORS:
+            result.errors.append(TemplateImportError(line=batch[index][0], detail=detail))
+    batch.clear()
+
+
+@app.post("/api/templates/bulk", response_model=TemplateImportResult)
+async def import_templates(request: Request):
+    """Import NDJSON templates (one TemplateCreate per line), upserting by natural key.
+
+    ``template_id``/``created_at`` from an export are kept for new rows, so an
+    export from one clinic can be replayed into another. Existing rows keep
+    their id and creation time; all other fields are replaced.
+    """
+    result = TemplateImportResult()
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    line_no = 0
+    async for raw in _ndjson_lines(request):
+        line_no += 1
+        if not raw.strip():
+            continue
+        result.received += 1
+        try:
+            tpl = TemplateImportRow.model_validate_json(raw).model_dump()
+        except ValueError as exc:
+            result.failed += 1
+            if len(result.errors) < TEMPLATE_IMPORT_MAX_ERRORS:
+                result.errors.append(TemplateImportError(line=line_no, detail=_batch_error(exc)))
+            continue
+        batch.append((line_no, tpl))
+        if len(batch) >= TEMPLATE_BULK_BATCH:
+            await _flush_import(batch, result)
+    if batch:
+        await _flush_import(batch, result)
+
+    if result.inserted or result.updated:
+        await asyncio.shield(_reload_template_search())
+        await bump_template_version()
+    return result
+
+
+@app.get("/api/templates/bulk")
+async def export_templates(
+    lang: Optional[Literal["pt", "en"]] = Query(default=None),
+    exam_type: Optional[str] = Query(default=None),
+):
+    """Stream templates as NDJSON (re-importable with POST /api/templates/bulk)."""
+    selector: Dict[str, Any] = {}
+    if lang:
+        selector["lang"] = lang
+    if exam_type:
+        selector["exam_type"] = exam_type
+    cursor = db().templates.find(selector, {"_id": 0}, batch_size=TEMPLATE_BULK_BATCH).sort(TEMPLATE_SORT)
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for doc in cursor:
+            yield Template(**doc).model_dump_json().encode() + b"\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="templates.ndjson"'},
     )
-    return [Template(**d) async for d in cursor]
 
 
 @app.get("/api/templates/{template_id}", response_model=Template)
@@ -492,7 +2687,7 @@ async def get_template(template_id: str):
     doc = await db().templates.find_one({"template_id": template_id}, {"_id": 0})
     if not doc:
         raise HTTPException(status_code=404, detail="Template not found")
-    return Template(**doc)
+    return model_response(Template, doc)
 
 
 @app.patch("/api/templates/{template_id}", response_model=Template)
@@ -509,12 +2704,18 @@ async def update_template(template_id: str, payload: TemplateUpdate = Body(...))
     if not result:
         raise HTTPException(status_code=404, detail="Template not found")
 
+    template_search().add(result)
+    await bump_template_version()
     return Template(**result)
 
 
 @app.delete("/api/templates/{template_id}")
 async def delete_template(template_id: str):
-    await db().templates.delete_one({"template_id": template_id})
+    res = await db().templates.delete_one({"template_id": template_id})
+    if res.deleted_count:
+        template_search().remove(template_id)
+        await record_tombstones("template", [template_id])
+        await bump_template_version()
     return {"deleted": True, "template_id": template_id}
 
 
@@ -803,46 +3004,27 @@ async def seed_default_templates():
     )
 
 
-    # Inserção idempotente: usa upsert por chave natural (lang + exam_type + organ + title)
-    inserted = 0
-    updated = 0
-    for tpl in defaults:
-        key = {
-            "lang": tpl["lang"],
-            "exam_type": tpl.get("exam_type"),
-            "organ": tpl["organ"],
-            "title": tpl["title"],
-        }
-        res = await db().templates.update_one(
-            key,
-            {
-                "$setOnInsert": {
-                    "template_id": tpl["template_id"],
-                    "created_at": tpl["created_at"],
-                },
-                "$set": {
-                    "text": tpl["text"],
-                    "updated_at": now,
-                },
-            },
-            upsert=True,
-        )
-        if res.upserted_id is not None:
-            inserted += 1
-        elif res.modified_count:
-            updated += 1
+    # Inserção idempotente: upsert por chave natural (lang + exam_type + organ + title),
+    # tudo num único bulk_write
+    inserted, updated, _ = await upsert_templates(defaults, now)
+    if inserted or updated:
+        await asyncio.shield(_reload_template_search())
+        await bump_template_version()
 
-    total = await db().templates.count_documents({})
+    total = await db().templates.estimated_document_count()
     return {"seeded": True, "inserted": inserted, "updated": updated, "total_templates": total}
 
 # -----------------------------
 # Images (PNG/JPG/DICOM)
 # -----------------------------
 
-def _detect_kind(filename: str, mime: str) -> str:
+def _detect_kind(filename: str, mime: str, head: bytes = b"") -> str:
     low = (filename or "").lower()
     if "dicom" in (mime or "").lower() or low.endswith(".dcm"):
         return "dicom"
+    # Extension-less DICOM (e.g. "IM0001" from a study export): preamble + magic
+    if head[128:132] == b"DICM":
+        return "dicom"
     if low.endswith(".png") or mime == "image/png":
         return "png"
     if low.endswith(".jpg") or low.endswith(".jpeg") or mime in ("image/jpg", "image/jpeg"):
@@ -850,68 +3032,250 @@ def _detect_kind(filename: str, mime: str) -> str:
     return "other"
 
 
-@app.post("/api/images", response_model=ImageMeta)
-async def upload_image(
-    file: UploadFile = File(...),
-    patient_id: Optional[str] = Query(default=None),
-    exam_id: Optional[str] = Query(default=None),
-    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
-):
-    # Validate relation
+async def _acquire_blob(sha: str, size_bytes: int, candidate_blob_id: Optional[str]) -> str:
+    """Take a reference on the blob holding ``sha``.
+
+    ``candidate_blob_id`` is a freshly written copy of the bytes; it becomes the
+    canonical blob when ``sha`` is new and is discarded on a dedup hit. With no
+    candidate the blob must already exist.
+    """
+    now = utc_now()
+    update: Dict[str, Any] = {"$inc": {"refcount": 1}, "$set": {"updated_at": now}}
+    if candidate_blob_id:
+        update["$setOnInsert"] = {
+            "blob_id": candidate_blob_id,
+            "size_bytes": size_bytes,
+            "created_at": now,
+        }
+    try:
+        before = await db().blob_refs.find_one_and_update(
+            {"sha256": sha},
+            update,
+            projection={"_id": 0, "blob_id": 1},
+            upsert=bool(candidate_blob_id),
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        # Lost an upsert race for the same content: the other copy wins
+        update.pop("$setOnInsert", None)
+        before = await db().blob_refs.find_one_and_update(
+            {"sha256": sha}, update, projection={"_id": 0, "blob_id": 1}
+        )
+
+    if before is None:
+        if not candidate_blob_id:
+            raise HTTPException(
+                status_code=409,
+                detail="Content no longer stored; retry the upload without X-Content-SHA256",
+            )
+        return candidate_blob_id
+
+    if candidate_blob_id and candidate_blob_id != before["blob_id"]:
+        await blob_store().delete(candidate_blob_id)
+    return before["blob_id"]
+
+
+async def _release_blob(sha: Optional[str], blob_id: Optional[str]) -> None:
+    """Drop one reference; the bytes are freed when the last one goes."""
+    if not blob_id:
+        return
+    after = await db().blob_refs.find_one_and_update(
+        {"sha256": sha, "blob_id": blob_id},
+        {"$inc": {"refcount": -1}, "$set": {"updated_at": utc_now()}},
+        projection={"_id": 0, "refcount": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if after is None:
+        # Blob written before content addressing: owned by a single image
+        await blob_store().delete(blob_id)
+        await _drop_derivatives(sha)
+        return
+    if after["refcount"] <= 0:
+        # Conditional delete so a concurrent upload that re-acquired the blob keeps it
+        res = await db().blob_refs.delete_one({"sha256": sha, "blob_id": blob_id, "refcount": {"$lte": 0}})
+        if res.deleted_count:
+            await blob_store().delete(blob_id)
+            await _drop_derivatives(sha)
+
+
+async def _drop_derivatives(sha: Optional[str]) -> None:
+    """Forget thumbnails/previews of content no image refers to any more."""
+    if not sha or await db().images.find_one({"sha256": sha}, {"_id": 1}):
+        return
+    await db().image_derivatives.delete_many({"sha256": sha})
+    for size in DERIVATIVE_SIZES:
+        _derivative_cache.pop((sha, size))
+
+
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+# Leading bytes kept in memory for DICOM header parsing (pixel data is skipped)
+DICOM_HEADER_BYTES = 1024 * 1024
+
+
+async def _stream_upload(file, blob_id: Optional[str], keep_head: int = 0):
+    """Copy ``file`` (anything with an async ``read``) into the blob store chunk by chunk.
+
+    SHA-256 is updated incrementally and the size guard is enforced as soon as
+    it is crossed, so memory stays bounded by the chunk size. With
+    ``blob_id=None`` the bytes are only hashed, not stored. Returns
+    ``(size_bytes, sha256, head)`` where ``head`` holds up to ``keep_head``
+    leading bytes.
+    """
+    declared_size = getattr(file, "size", None)
+    if declared_size is not None and declared_size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="File too large (max 50MB)")
+
+    hasher = hashlib.sha256()
+    size = 0
+    head = bytearray()
+    writer = await blob_store().open_writer(blob_id) if blob_id else None
+    try:
+        while True:
+            chunk = await file.read(BLOB_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=400, detail="File too large (max 50MB)")
+            hasher.update(chunk)
+            if len(head) < keep_head:
+                head.extend(chunk[: keep_head - len(head)])
+            if writer is not None:
+                await writer.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        if writer is not None:
+            await writer.abort()
+        raise
+    if writer is not None:
+        await writer.close()
+    return size, hasher.hexdigest(), bytes(head)
+
+
+# Compact header fields kept in ``images.dicom_meta`` (tag keyword -> max length)
+DICOM_META_TAGS: Dict[str, int] = {
+    "PatientName": 200,
+    "PatientID": 64,
+    "StudyDate": 32,
+    "StudyTime": 32,
+    "StudyDescription": 200,
+    "Modality": 32,
+    "Manufacturer": 120,
+    "SOPClassUID": 80,
+    "SOPInstanceUID": 80,
+    "StudyInstanceUID": 80,
+    "SeriesInstanceUID": 80,
+    "SeriesNumber": 16,
+    "SeriesDescription": 200,
+    "InstanceNumber": 16,
+    "PhotometricInterpretation": 32,
+}
+DICOM_META_INTS = ("Rows", "Columns", "NumberOfFrames", "BitsAllocated", "SamplesPerPixel")
+
+
+def parse_dicom_header(head: bytes) -> Dict[str, Any]:
+    """Worker: extract a compact header summary without touching pixel data.
+
+    Only the listed tags are parsed and large values are deferred, so even a
+    multi-frame study costs a few KB of work.
+    """
+    try:
+        import pydicom  # lazy import
+
+        ds = pydicom.dcmread(
+            io.BytesIO(head),
+            force=True,
+            stop_before_pixels=True,
+            defer_size="4 KB",
+            specific_tags=[*DICOM_META_TAGS, *DICOM_META_INTS],
+        )
+        # Keep only safe/compact tags
+        meta: Dict[str, Any] = {
+            keyword: str(getattr(ds, keyword, ""))[:limit] for keyword, limit in DICOM_META_TAGS.items()
+        }
+        for keyword in DICOM_META_INTS:
+            value = getattr(ds, keyword, None)
+            try:
+                meta[keyword] = int(value) if value not in (None, "") else None
+            except (TypeError, ValueError):
+                meta[keyword] = None
+        file_meta = getattr(ds, "file_meta", None)
+        meta["TransferSyntaxUID"] = str(getattr(file_meta, "TransferSyntaxUID", ""))[:80]
+        return meta
+    except Exception:
+        return {"parse_error": True}
+
+
+async def _resolve_image_relation(patient_id: Optional[str], exam_id: Optional[str]) -> Optional[str]:
+    """Validate the optional exam/patient link of an upload; returns the effective patient_id."""
     if exam_id:
-        exam = await db().exams.find_one({"exam_id": exam_id}, {"_id": 0})
-        if not exam:
-            raise HTTPException(status_code=400, detail="Invalid exam_id")
-        if patient_id and exam.get("patient_id") != patient_id:
+        owner = await require_exam(exam_id)
+        if patient_id and owner != patient_id:
             raise HTTPException(status_code=400, detail="patient_id does not match exam.patient_id")
-        patient_id = exam.get("patient_id")
+        return owner
 
     if patient_id:
-        patient = await db().patients.find_one({"patient_id": patient_id}, {"_id": 0})
-        if not patient:
-            raise HTTPException(status_code=400, detail="Invalid patient_id")
+        await require_patient(patient_id)
 
-    # Read bytes
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file")
+    return patient_id
 
-    # Basic size guard (50MB)
-    if len(content) > 50 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large (max 50MB)")
 
-    sha = hashlib.sha256(content).hexdigest()
-    now = utc_now()
+def _parse_tags(tags: Optional[str]) -> List[str]:
+    if not tags:
+        return []
+    return [t.strip() for t in tags.split(",") if t.strip()]
 
-    mime_type = file.content_type or "application/octet-stream"
-    kind = _detect_kind(file.filename or "", mime_type)
 
-    tag_list: List[str] = []
-    if tags:
-        tag_list = [t.strip() for t in tags.split(",") if t.strip()]
+def _guess_mime(filename: str) -> str:
+    if (filename or "").lower().endswith(".dcm"):
+        return "application/dicom"
+    return mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
 
-    dicom_meta: Optional[Dict[str, Any]] = None
-    if kind == "dicom":
-        try:
-            import pydicom  # lazy import
-
-            ds = pydicom.dcmread(content, force=True)
-            # Keep only safe/compact tags
-            dicom_meta = {
-                "PatientName": str(getattr(ds, "PatientName", ""))[:200],
-                "StudyDate": str(getattr(ds, "StudyDate", ""))[:32],
-                "Modality": str(getattr(ds, "Modality", ""))[:32],
-                "SOPClassUID": str(getattr(ds, "SOPClassUID", ""))[:80],
-            }
-        except Exception:
-            dicom_meta = {"parse_error": True}
 
+async def _store_image(
+    source,
+    filename: str,
+    content_type: Optional[str],
+    *,
+    patient_id: Optional[str],
+    exam_id: Optional[str],
+    tag_list: List[str],
+    now: datetime,
+    expected_sha: Optional[str] = None,
+) -> Tuple[Dict[str, Any], bytes]:
+    """Stream one file into the blob store and build its ``images`` document.
+
+    The document is not inserted yet. Returns it with the DICOM header slice
+    (empty for other kinds) so callers can parse headers in the worker pool.
+    """
+    mime_type = content_type or "application/octet-stream"
+    kind = _detect_kind(filename, mime_type)
     image_id = new_uuid("img")
+
+    # Content-addressed storage: bytes already stored under the announced hash
+    # are hashed for verification only, everything else lands in a candidate blob
+    known = expected_sha and await db().blob_refs.find_one({"sha256": expected_sha}, {"_id": 1})
+    candidate_blob_id = None if known else new_uuid("blob")
+    size_bytes, sha, head = await _stream_upload(
+        source, candidate_blob_id, keep_head=DICOM_HEADER_BYTES if kind in ("dicom", "other") else 0
+    )
+    if expected_sha and sha != expected_sha:
+        if candidate_blob_id:
+            await blob_store().delete(candidate_blob_id)
+        raise HTTPException(status_code=400, detail="X-Content-SHA256 does not match uploaded content")
+    blob_id = await _acquire_blob(sha, size_bytes, candidate_blob_id)
+
+    if kind == "other" and _detect_kind(filename, mime_type, head) == "dicom":
+        kind = "dicom"
+        if mime_type == "application/octet-stream":
+            mime_type = "application/dicom"
+
     image_doc = {
         "image_id": image_id,
-        "filename": file.filename or image_id,
+        "filename": filename or image_id,
         "mime_type": mime_type,
-        "size_bytes": len(content),
+        "size_bytes": size_bytes,
         "sha256": sha,
         "created_at": now,
         "updated_at": now,
@@ -919,68 +3283,2504 @@ async def upload_image(
         "patient_id": patient_id,
         "exam_id": exam_id,
         "kind": kind,
-        "dicom_meta": dicom_meta,
-        "content": Binary(content),
+        "dicom_meta": None,
+        "blob_id": blob_id,
     }
+    return image_doc, head if kind == "dicom" else b""
 
-    await db().images.insert_one(image_doc)
 
-    # If exam provided, attach reference
-    if exam_id:
-        ref = {
-            "image_id": image_id,
-            "filename": image_doc["filename"],
-            "mime_type": image_doc["mime_type"],
-            "size_bytes": image_doc["size_bytes"],
-            "created_at": now,
-            "tags": tag_list,
-        }
+def _image_ref(image_doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "image_id": image_doc["image_id"],
+        "filename": image_doc["filename"],
+        "mime_type": image_doc["mime_type"],
+        "size_bytes": image_doc["size_bytes"],
+        "created_at": image_doc["created_at"],
+        "tags": image_doc["tags"],
+    }
+
+
+# Refs embedded in the exam document (newest last); the rest live in exam_images
+EXAM_RECENT_IMAGES = 12
+EXAM_IMAGE_SORT: SortSpec = [("created_at", ASCENDING), ("image_id", ASCENDING)]
+
+
+def _cover_candidate(docs: List[Dict[str, Any]]) -> Optional[str]:
+    """First image that can be rendered as a thumbnail."""
+    for doc in docs:
+        if doc.get("kind") in DERIVATIVE_KINDS:
+            return doc["image_id"]
+    return None
+
+
+async def _link_exam_images(exam_id: str, image_docs: List[Dict[str, Any]]) -> None:
+    forget_report(exam_id)
+    refs = [_image_ref(d) for d in image_docs]
+    await db().exam_images.insert_many(
+        [{"exam_id": exam_id, "kind": d["kind"], **ref} for d, ref in zip(image_docs, refs)], ordered=False
+    )
+    await db().exams.update_one(
+        {"exam_id": exam_id},
+        {
+            "$push": {"images": {"$each": refs, "$slice": -EXAM_RECENT_IMAGES}},
+            "$inc": {"image_count": len(refs)},
+            "$set": {"updated_at": utc_now()},
+        },
+    )
+    cover = _cover_candidate(image_docs)
+    if cover:
+        await db().exams.update_one({"exam_id": exam_id, "cover_image_id": None}, {"$set": {"cover_image_id": cover}})
+
+
+async def _unlink_exam_image(exam_id: str, image_id: str) -> None:
+    forget_report(exam_id)
+    res = await db().exam_images.delete_one({"image_id": image_id})
+    exam = await db().exams.find_one_and_update(
+        {"exam_id": exam_id},
+        {
+            "$pull": {"images": {"image_id": image_id}},
+            "$inc": {"image_count": -res.deleted_count},
+            "$set": {"updated_at": utc_now()},
+        },
+        projection={"_id": 0, "cover_image_id": 1, "images": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not exam:
+        return
+    if exam.get("cover_image_id") == image_id:
+        nxt = await db().exam_images.find_one(
+            {"exam_id": exam_id, "kind": {"$in": sorted(DERIVATIVE_KINDS)}}, {"_id": 0, "image_id": 1}, sort=EXAM_IMAGE_SORT
+        )
         await db().exams.update_one(
-            {"exam_id": exam_id},
-            {"$push": {"images": ref}, "$set": {"updated_at": now}},
+            {"exam_id": exam_id}, {"$set": {"cover_image_id": nxt["image_id"] if nxt else None}}
         )
+    if len(exam.get("images") or []) < EXAM_RECENT_IMAGES:
+        # Refill the embedded window from the link collection
+        recent = db().exam_images.find({"exam_id": exam_id}, {"_id": 0, "exam_id": 0, "kind": 0}).sort(
+            [("created_at", DESCENDING), ("image_id", DESCENDING)]
+        )
+        refs = list(reversed(await recent.limit(EXAM_RECENT_IMAGES).to_list(length=EXAM_RECENT_IMAGES)))
+        await db().exams.update_one({"exam_id": exam_id}, {"$set": {"images": refs}})
 
-    return ImageMeta(**clean({k: v for k, v in image_doc.items() if k != "content"}))
 
+async def _backfill_exam_images(database, batch_size: int = 200) -> None:
+    """Move embedded image refs of exams created before exam_images existed."""
+    cursor = database.exams.find(
+        {"image_count": {"$exists": False}}, {"_id": 0, "exam_id": 1, "images": 1}
+    )
+    links: List[UpdateOne] = []
+    exams: List[UpdateOne] = []
+
+    async def flush() -> None:
+        if links:
+            await database.exam_images.bulk_write(links, ordered=False)
+        if exams:
+            await database.exams.bulk_write(exams, ordered=False)
+        links.clear()
+        exams.clear()
+
+    async for doc in cursor:
+        refs = doc.get("images") or []
+        kinds = [_detect_kind(ref.get("filename"), ref.get("mime_type")) for ref in refs]
+        for ref, kind in zip(refs, kinds):
+            link = {"exam_id": doc["exam_id"], "kind": kind, **ref}
+            links.append(UpdateOne({"image_id": ref["image_id"]}, {"$setOnInsert": link}, upsert=True))
+        cover = next((ref["image_id"] for ref, kind in zip(refs, kinds) if kind in DERIVATIVE_KINDS), None)
+        exams.append(
+            UpdateOne(
+                {"exam_id": doc["exam_id"]},
+                {
+                    "$set": {
+                        "images": refs[-EXAM_RECENT_IMAGES:],
+                        "image_count": len(refs),
+                        "cover_image_id": cover,
+                    }
+                },
+            )
+        )
+        if len(exams) >= batch_size:
+            await flush()
+    await flush()
 
-@app.get("/api/images/{image_id}", response_model=ImageMeta)
-async def get_image_meta(image_id: str):
-    doc = await db().images.find_one({"image_id": image_id}, {"_id": 0, "content": 0})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Image not found")
-    return ImageMeta(**doc)
+
+@app.get("/api/exams/{exam_id}/images", response_model=Union[List[ImageRef], ImageRefPage])
+async def list_exam_images(
+    exam_id: str,
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    page_cursor: Optional[str] = Query(
+        default=None, alias="cursor", description="Opaque keyset cursor; pass it empty to start"
+    ),
+):
+    """All image refs of an exam in upload order."""
+    try:
+        await require_exam(exam_id)
+    except HTTPException:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    docs, next_cursor = await fetch_page(
+        db().exam_images,
+        {"exam_id": exam_id},
+        {"_id": 0, "exam_id": 0, "kind": 0},
+        EXAM_IMAGE_SORT,
+        "exam_images",
+        limit,
+        offset,
+        page_cursor,
+    )
+    return paged_response(docs, ImageRef, next_cursor, page_cursor, response, ImageRefPage)
 
 
-@app.get("/api/images/{image_id}/content")
-async def get_image_content(image_id: str):
-    doc = await db().images.find_one({"image_id": image_id}, {"_id": 0})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Image not found")
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
 
-    content: bytes = bytes(doc.get("content") or b"")
-    mime_type = doc.get("mime_type") or "application/octet-stream"
 
-    return Response(
-        content=content,
-        media_type=mime_type,
-        headers={"Cache-Control": "private, max-age=3600"},
+async def _attach_series(image_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group DICOM images by series and upsert one ``dicom_series`` entity per group.
+
+    Sets ``series_id`` on the given documents (and in Mongo); returns the
+    updated series documents.
+    """
+    groups: Dict[Tuple[str, Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+    for doc in image_docs:
+        meta = doc.get("dicom_meta") or {}
+        series_uid = meta.get("SeriesInstanceUID")
+        if doc.get("kind") != "dicom" or not series_uid:
+            continue
+        groups.setdefault((series_uid, doc.get("exam_id"), doc.get("patient_id")), []).append(doc)
+
+    series_docs: List[Dict[str, Any]] = []
+    for (series_uid, exam_id, patient_id), docs in groups.items():
+        first = docs[0]["dicom_meta"]
+        instances = [
+            {
+                "image_id": d["image_id"],
+                "instance_number": _int_or_none(d["dicom_meta"].get("InstanceNumber")),
+                "sop_instance_uid": d["dicom_meta"].get("SOPInstanceUID") or None,
+                "frames": d["dicom_meta"].get("NumberOfFrames"),
+            }
+            for d in docs
+        ]
+        now = utc_now()
+        series = await db().dicom_series.find_one_and_update(
+            {"series_instance_uid": series_uid, "exam_id": exam_id, "patient_id": patient_id},
+            {
+                "$setOnInsert": {
+                    "series_id": new_uuid("ser"),
+                    "study_instance_uid": first.get("StudyInstanceUID") or None,
+                    "modality": first.get("Modality") or None,
+                    "series_number": _int_or_none(first.get("SeriesNumber")),
+                    "description": first.get("SeriesDescription") or None,
+                    "created_at": now,
+                },
+                "$push": {"instances": {"$each": instances, "$sort": {"instance_number": 1}}},
+                "$inc": {"instance_count": len(instances)},
+                "$set": {"updated_at": now},
+            },
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        await db().images.update_many(
+            {"image_id": {"$in": [d["image_id"] for d in docs]}},
+            {"$set": {"series_id": series["series_id"], "updated_at": now}},
+        )
+        for d in docs:
+            d["series_id"] = series["series_id"]
+            d["updated_at"] = now
+        series_docs.append(series)
+    return series_docs
+
+
+@app.post("/api/images", response_model=ImageMeta)
+async def upload_image(
+    file: UploadFile = File(...),
+    patient_id: Optional[str] = Query(default=None),
+    exam_id: Optional[str] = Query(default=None),
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+    content_sha256: Optional[str] = Header(
+        default=None,
+        alias="X-Content-SHA256",
+        description="Optional client-side hash; known content is verified but not written again",
+    ),
+):
+    patient_id = await _resolve_image_relation(patient_id, exam_id)
+    now = utc_now()
+
+    image_doc, head = await _store_image(
+        file,
+        file.filename or "",
+        file.content_type,
+        patient_id=patient_id,
+        exam_id=exam_id,
+        tag_list=_parse_tags(tags),
+        now=now,
+        expected_sha=(content_sha256 or "").strip().lower() or None,
     )
+    if image_doc["kind"] == "dicom":
+        # Off the event loop: a slow header must not stall other requests
+        image_doc["dicom_meta"] = await run_in_worker(parse_dicom_header, head)
 
+    # Stamped at insert, not at request start: the upload may have taken longer
+    # than the sync settle window, and a client syncing meanwhile must still see it
+    image_doc["updated_at"] = utc_now()
+    try:
+        await db().images.insert_one(image_doc)
+    except BaseException:
+        await _release_blob(image_doc["sha256"], image_doc["blob_id"])
+        raise
+    await bump_image_stats([image_doc])
 
-@app.delete("/api/images/{image_id}")
-async def delete_image(image_id: str):
-    doc = await db().images.find_one({"image_id": image_id}, {"_id": 0})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Image not found")
+    if image_doc["kind"] == "dicom":
+        await _attach_series([image_doc])
 
-    exam_id = doc.get("exam_id")
-    await db().images.delete_one({"image_id": image_id})
+    if settings.derivatives_on_upload and image_doc["kind"] in DERIVATIVE_KINDS:
+        spawn_background(_warm_derivatives(image_doc))
 
-    # Detach from exam images list
+    # If exam provided, attach reference
     if exam_id:
-        await db().exams.update_one(
-            {"exam_id": exam_id},
-            {"$pull": {"images": {"image_id": image_id}}, "$set": {"updated_at": utc_now()}},
-        )
+        await _link_exam_images(exam_id, [image_doc])
 
-    return {"deleted": True, "image_id": image_id}
+    return ImageMeta(**clean(image_doc))
+
+
+# Upper bound on files per batch (zip members included)
+MAX_BATCH_FILES = 2000
+
+
+class _ZipMemberReader:
+    """Async ``read`` over one zip member, so it can feed ``_stream_upload``."""
+
+    def __init__(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+        self.size = info.file_size
+        self._fh = archive.open(info)
+
+    async def read(self, size: int) -> bytes:
+        return await asyncio.to_thread(self._fh.read, size)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _is_zip_upload(upload: UploadFile) -> bool:
+    return (upload.filename or "").lower().endswith(".zip") or upload.content_type in (
+        "application/zip",
+        "application/x-zip-compressed",
+    )
+
+
+@app.post("/api/images/batch", response_model=BatchIngestResult)
+async def upload_image_batch(
+    files: List[UploadFile] = File(..., description="Image/DICOM files and/or zip archives of a study"),
+    patient_id: Optional[str] = Query(default=None),
+    exam_id: Optional[str] = Query(default=None),
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+):
+    """Ingest a whole study in one request.
+
+    Files are streamed into the blob store one after another while their
+    DICOM headers are parsed in parallel in the worker pool. DICOM files are
+    grouped into series (ordered by InstanceNumber) and the exam is updated
+    once for the whole batch. Per-file failures are reported in ``errors``.
+    """
+    patient_id = await _resolve_image_relation(patient_id, exam_id)
+    now = utc_now()
+    tag_list = _parse_tags(tags)
+
+    docs: List[Dict[str, Any]] = []
+    errors: List[BatchIngestError] = []
+    pending: List["asyncio.Task"] = []
+    max_pending = max(1, settings.worker_processes) * 4
+
+    async def parse_into(doc: Dict[str, Any], head: bytes) -> None:
+        doc["dicom_meta"] = await run_in_worker(parse_dicom_header, head)
+
+    async def ingest(source, filename: str, content_type: Optional[str]) -> None:
+        if len(docs) + len(errors) >= MAX_BATCH_FILES:
+            errors.append(BatchIngestError(filename=filename, detail=f"Batch limit reached (max {MAX_BATCH_FILES} files)"))
+            return
+        try:
+            doc, head = await _store_image(
+                source,
+                filename,
+                content_type,
+                patient_id=patient_id,
+                exam_id=exam_id,
+                tag_list=tag_list,
+                now=now,
+            )
+        except HTTPException as exc:
+            errors.append(BatchIngestError(filename=filename, detail=str(exc.detail)))
+            return
+        docs.append(doc)
+        if doc["kind"] == "dicom":
+            pending.append(asyncio.create_task(parse_into(doc, head)))
+            # Bound the header slices held in memory while parsing catches up
+            if len(pending) >= max_pending:
+                await pending.pop(0)
+
+    try:
+        for upload in files:
+            if not _is_zip_upload(upload):
+                await ingest(upload, upload.filename or "", upload.content_type)
+                continue
+            try:
+                archive = await asyncio.to_thread(zipfile.ZipFile, upload.file)
+            except zipfile.BadZipFile:
+                errors.append(BatchIngestError(filename=upload.filename or "", detail="Invalid zip archive"))
+                continue
+            with archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    base = os.path.basename(name)
+                    if info.is_dir() or not base or base.startswith(".") or name.startswith("__MACOSX/"):
+                        continue
+                    reader = _ZipMemberReader(archive, info)
+                    try:
+                        await ingest(reader, base, _guess_mime(base))
+                    finally:
+                        reader.close()
+        await asyncio.gather(*pending)
+
+        if not docs:
+            raise HTTPException(status_code=400, detail=errors[0].detail if errors else "No files")
+
+        # Stamped at insert (see upload_image); ingesting a study can take minutes
+        stored_at = utc_now()
+        for doc in docs:
+            doc["updated_at"] = stored_at
+        await db().images.insert_many(docs, ordered=False)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        for doc in docs:
+            await _release_blob(doc["sha256"], doc["blob_id"])
+        raise
+    await bump_image_stats(docs)
+
+    series_docs = await _attach_series(docs)
+
+    if exam_id:
+        await _link_exam_images(exam_id, docs)
+
+    if settings.derivatives_on_upload:
+        # Plain images get their thumbnails; a series only its middle slice as cover
+        by_id = {d["image_id"]: d for d in docs}
+        warm = [d for d in docs if d["kind"] in DERIVATIVE_KINDS and not d.get("series_id")]
+        for series in series_docs:
+            cover = series["instances"][len(series["instances"]) // 2]["image_id"]
+            if cover in by_id:
+                warm.append(by_id[cover])
+        for doc in warm:
+            spawn_background(_warm_derivatives(doc))
+
+    return BatchIngestResult(
+        images=[ImageMeta(**clean(d)) for d in docs],
+        series=[DicomSeries(**sr) for sr in series_docs],
+        errors=errors,
+    )
+
+
+@app.get("/api/series/{series_id}", response_model=DicomSeries)
+async def get_series(series_id: str):
+    doc = await db().dicom_series.find_one({"series_id": series_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return DicomSeries(**doc)
+
+
+@app.get("/api/exams/{exam_id}/series", response_model=List[DicomSeries])
+async def list_exam_series(exam_id: str):
+    cursor = db().dicom_series.find({"exam_id": exam_id}, {"_id": 0}).sort("series_number", ASCENDING)
+    return [DicomSeries(**d) async for d in cursor]
+
+
+@app.get("/api/images/storage")
+async def get_image_storage_stats():
+    """Logical vs. physically stored bytes (space saved by deduplication)."""
+    logical = await db().images.aggregate(
+        [{"$group": {"_id": None, "images": {"$sum": 1}, "bytes": {"$sum": "$size_bytes"}}}]
+    ).to_list(length=1)
+    stored = await db().blob_refs.aggregate(
+        [
+            {
+                "$group": {
+                    "_id": None,
+                    "blobs": {"$sum": 1},
+                    "bytes": {"$sum": "$size_bytes"},
+                    # Every reference past the first is a copy we did not store
+                    "saved": {"$sum": {"$multiply": [{"$subtract": ["$refcount", 1]}, "$size_bytes"]}},
+                }
+            }
+        ]
+    ).to_list(length=1)
+    logical_doc = logical[0] if logical else {"images": 0, "bytes": 0}
+    stored_doc = stored[0] if stored else {"blobs": 0, "bytes": 0, "saved": 0}
+    return {
+        "images": logical_doc["images"],
+        "unique_blobs": stored_doc["blobs"],
+        "logical_bytes": logical_doc["bytes"],
+        "stored_bytes": stored_doc["bytes"],
+        "saved_bytes": max(0, stored_doc["saved"]),
+    }
+
+
+@app.get("/api/images/{image_id}", response_model=ImageMeta)
+async def get_image_meta(image_id: str):
+    doc = await db().images.find_one({"image_id": image_id}, {"_id": 0, "content": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return ImageMeta(**doc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Mongo hands back naive datetimes that are already UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison as required for If-None-Match."""
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    # HTTP dates have second resolution
+    return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into an inclusive ``(start, end)``.
+
+    Returns ``None`` when the header should be ignored (other units, several
+    ranges, malformed) and raises 416 when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(0, size - suffix), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+@app.api_route("/api/images/{image_id}/content", methods=["GET", "HEAD"])
+async def get_image_content(image_id: str, request: Request):
+    doc = await db().images.find_one({"image_id": image_id}, {"_id": 0, "content": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    mime_type = doc.get("mime_type") or "application/octet-stream"
+    size = int(doc.get("size_bytes") or 0)
+    headers = {"Cache-Control": "private, max-age=3600", "Accept-Ranges": "bytes"}
+    etag = f'"{doc["sha256"]}"' if doc.get("sha256") else None
+    last_modified = doc.get("created_at")
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+
+    # Conditional GET: If-None-Match wins over If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (if_none_match and etag and _etag_matches(if_none_match, etag)) or (
+        not if_none_match and if_modified_since and last_modified
+        and _not_modified_since(if_modified_since, last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    # Range is only honoured when If-Range (if any) still names this representation
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and size and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+
+    status_code = 200
+    start, length = 0, size
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, media_type=mime_type, headers=headers)
+
+    if not doc.get("blob_id"):
+        # Legacy documents still carry the bytes inline
+        legacy = await db().images.find_one({"image_id": image_id}, {"_id": 0, "content": 1})
+        content: bytes = bytes((legacy or {}).get("content") or b"")
+        return Response(
+            content=content[start : start + length],
+            status_code=status_code,
+            media_type=mime_type,
+            headers=headers,
+        )
+
+    return StreamingResponse(
+        blob_store().stream(doc["blob_id"], start=start, length=length),
+        status_code=status_code,
+        media_type=mime_type,
+        headers=headers,
+    )
+
+
+@app.delete("/api/images/{image_id}")
+async def delete_image(image_id: str):
+    doc = await db().images.find_one({"image_id": image_id}, {"_id": 0, "content": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    exam_id = doc.get("exam_id")
+    await db().images.delete_one({"image_id": image_id})
+    await record_tombstones("image", [image_id])
+    await bump_image_stats([doc], sign=-1)
+    await _release_blob(doc.get("sha256"), doc.get("blob_id"))
+
+    series_id = doc.get("series_id")
+    if series_id:
+        await db().dicom_series.update_one(
+            {"series_id": series_id},
+            {
+                "$pull": {"instances": {"image_id": image_id}},
+                "$inc": {"instance_count": -1},
+                "$set": {"updated_at": utc_now()},
+            },
+        )
+        await db().dicom_series.delete_one({"series_id": series_id, "instance_count": {"$lte": 0}})
+
+    # Detach from exam images list
+    if exam_id:
+        await _unlink_exam_image(exam_id, image_id)
+
+    return {"deleted": True, "image_id": image_id}
+
+
+# -----------------------------
+# Image derivatives (thumbnails / previews)
+# -----------------------------
+
+# Longest side in pixels for each derivative
+DERIVATIVE_SIZES: Dict[str, int] = {"thumb": 256, "preview": 1024}
+DERIVATIVE_KINDS = ("png", "jpg", "jpeg", "dicom")
+DERIVATIVE_MIME = "image/jpeg"
+# Persistent store bound; least recently used derivatives are evicted past it
+DERIVATIVE_STORE_MAX_ENTRIES = int(os.environ.get("DERIVATIVE_STORE_MAX_ENTRIES") or 20000)
+
+_derivative_cache = LRUCache(max_entries=2000, max_bytes=64 * 1024 * 1024)
+_derivative_inflight: Dict[Tuple[str, str], "asyncio.Future"] = {}
+_derivative_inserts = 0
+
+
+def _window_to_uint8(arr, center: Optional[float] = None, width: Optional[float] = None):
+    """Map pixel values to 0..255 through a linear window (min/max when unset)."""
+    import numpy as np
+
+    arr = arr.astype(np.float32, copy=False)
+    if center is None or width is None or width <= 0:
+        low, high = float(arr.min()), float(arr.max())
+    else:
+        low, high = center - width / 2.0, center + width / 2.0
+    if high <= low:
+        high = low + 1.0
+    out = (arr - low) * (255.0 / (high - low))
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def _first_value(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value[0] if hasattr(value, "__len__") and not isinstance(value, str) else value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _display_params(ds) -> Dict[str, Any]:
+    """Pixel-to-display parameters of a dataset (rescale, default window, photometric)."""
+    return {
+        "samples": int(getattr(ds, "SamplesPerPixel", 1) or 1),
+        "slope": _first_value(getattr(ds, "RescaleSlope", None)) or 1.0,
+        "intercept": _first_value(getattr(ds, "RescaleIntercept", None)) or 0.0,
+        "window_center": _first_value(getattr(ds, "WindowCenter", None)),
+        "window_width": _first_value(getattr(ds, "WindowWidth", None)),
+        "photometric": str(getattr(ds, "PhotometricInterpretation", "")).upper(),
+    }
+
+
+def _to_display_uint8(arr, params: Dict[str, Any], center: Optional[float] = None, width: Optional[float] = None):
+    """Rescale and window a decoded frame to 8 bits (gray or RGB)."""
+    import numpy as np
+
+    if params["samples"] > 1:
+        return arr if arr.dtype == np.uint8 else _window_to_uint8(arr)
+
+    arr = arr.astype(np.float32) * params["slope"] + params["intercept"]
+    if center is None or width is None:
+        center, width = params["window_center"], params["window_width"]
+    out = _window_to_uint8(arr, center, width)
+    if params["photometric"] == "MONOCHROME1":
+        out = 255 - out
+    return out
+
+
+def _dicom_frame_uint8(
+    source: Union[str, bytes], frame: int = 0, center: Optional[float] = None, width: Optional[float] = None
+):
+    """Decode a single frame and return it windowed to 8 bits (gray or RGB)."""
+    import pydicom
+    from pydicom.pixels import pixel_array
+
+    ds = pydicom.dcmread(source if isinstance(source, str) else io.BytesIO(source), force=True, stop_before_pixels=True)
+    arr = pixel_array(source if isinstance(source, str) else io.BytesIO(source), index=frame)
+    return _to_display_uint8(arr, _display_params(ds), center, width)
+
+
+def render_derivative(source: Union[str, bytes], kind: str, max_side: int) -> bytes:
+    """Worker: build a JPEG no larger than ``max_side`` from a PNG/JPEG/DICOM file path or bytes."""
+    from PIL import Image
+
+    if kind == "dicom":
+        img = Image.fromarray(_dicom_frame_uint8(source))
+    else:
+        img = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+        img.draft("RGB", (max_side, max_side))  # JPEG: decode at reduced scale
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGBA") if "A" in img.mode or img.mode == "P" else img.convert("RGB")
+        if img.mode == "RGBA":
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=82, optimize=True)
+    return out.getvalue()
+
+
+async def _read_image_bytes(doc: Dict[str, Any]) -> bytes:
+    if doc.get("blob_id"):
+        return b"".join([chunk async for chunk in blob_store().stream(doc["blob_id"])])
+    legacy = await db().images.find_one({"image_id": doc["image_id"]}, {"_id": 0, "content": 1})
+    return bytes((legacy or {}).get("content") or b"")
+
+
+@contextlib.asynccontextmanager
+async def _worker_source(doc: Dict[str, Any]) -> AsyncIterator[Union[str, bytes]]:
+    """What to hand a worker for an image's bytes, preferably a file path.
+
+    Local blobs are passed by path and GridFS blobs are spooled to a temp file,
+    so the API process never holds (or pickles) the whole image; only legacy
+    inline images are passed as bytes.
+    """
+    if not doc.get("blob_id"):
+        yield await _read_image_bytes(doc)
+        return
+    path = blob_store().local_path(doc["blob_id"])
+    if path is not None:
+        yield path
+        return
+    fd, spool_path = tempfile.mkstemp(suffix=".blob")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            async for chunk in blob_store().stream(doc["blob_id"]):
+                await asyncio.to_thread(fh.write, chunk)
+        yield spool_path
+    finally:
+        os.remove(spool_path)
+
+
+async def _evict_derivatives() -> None:
+    excess = await db().image_derivatives.estimated_document_count() - DERIVATIVE_STORE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    cursor = db().image_derivatives.find({}, {"_id": 1}).sort("last_access", ASCENDING).limit(excess)
+    ids = [d["_id"] async for d in cursor]
+    if ids:
+        await db().image_derivatives.delete_many({"_id": {"$in": ids}})
+
+
+async def _build_derivative(doc: Dict[str, Any], size: str) -> bytes:
+    global _derivative_inserts
+    async with _worker_source(doc) as source:
+        content = await run_in_worker(render_derivative, source, doc.get("kind"), DERIVATIVE_SIZES[size])
+    now = utc_now()
+    await db().image_derivatives.update_one(
+        {"sha256": doc["sha256"], "size": size},
+        {
+            "$set": {
+                "content": Binary(content),
+                "mime_type": DERIVATIVE_MIME,
+                "size_bytes": len(content),
+                "last_access": now,
+            },
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+    )
+    _derivative_inserts += 1
+    if _derivative_inserts % 100 == 0:
+        await _evict_derivatives()
+    return content
+
+
+async def get_derivative(doc: Dict[str, Any], size: str) -> bytes:
+    """Return the ``size`` derivative of an image, building it at most once."""
+    key = (doc["sha256"], size)
+    cached = _derivative_cache.get(key)
+    if cached is not None:
+        return cached
+
+    stored = await db().image_derivatives.find_one_and_update(
+        {"sha256": key[0], "size": size},
+        {"$set": {"last_access": utc_now()}},
+        projection={"_id": 0, "content": 1},
+    )
+    if stored:
+        content = bytes(stored["content"])
+        _derivative_cache.set(key, content)
+        return content
+
+    # Coalesce concurrent requests for the same derivative
+    pending = _derivative_inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _derivative_inflight[key] = future
+    try:
+        content = await _build_derivative(doc, size)
+        _derivative_cache.set(key, content)
+        future.set_result(content)
+        return content
+    except BaseException as exc:
+        future.set_exception(exc)
+        future.exception()  # mark retrieved when nobody else is waiting
+        raise
+    finally:
+        _derivative_inflight.pop(key, None)
+
+
+async def _warm_derivatives(doc: Dict[str, Any]) -> None:
+    for size in DERIVATIVE_SIZES:
+        try:
+            await get_derivative(doc, size)
+        except Exception:
+            # Lazy generation on first request will surface the error
+            return
+
+
+@app.get("/api/images/{image_id}/thumbnail")
+async def get_image_thumbnail(
+    image_id: str,
+    request: Request,
+    size: Literal["thumb", "preview"] = Query(default="thumb"),
+):
+    doc = await db().images.find_one(
+        {"image_id": image_id},
+        {"_id": 0, "image_id": 1, "sha256": 1, "kind": 1, "blob_id": 1},
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if doc.get("kind") not in DERIVATIVE_KINDS or not doc.get("sha256"):
+        raise HTTPException(status_code=415, detail="No preview available for this file type")
+
+    etag = f'"{doc["sha256"]}-{size}"'
+    headers = {"Cache-Control": "private, max-age=86400", "ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        content = await get_derivative(doc, size)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Thumbnail support is not installed (Pillow)")
+    except Exception:
+        raise HTTPException(status_code=422, detail="Could not decode image")
+
+    return Response(content=content, media_type=DERIVATIVE_MIME, headers=headers)
+
+
+# -----------------------------
+# DICOM frames (cine loops / volumes)
+# -----------------------------
+
+FRAME_MEDIA_TYPES: Dict[str, str] = {
+    "png": "image/png",
+    "png16": "image/png",
+    "raw8": "application/octet-stream",
+    "raw16": "application/octet-stream",
+}
+MAX_FRAMES_PER_REQUEST = 64
+# Compressed (encapsulated) pixel data is decoded from the whole file, so each
+# worker call decodes this many frames ahead to keep scrolling on the cache
+FRAME_PREFETCH = 8
+
+_frame_cache = LRUCache(max_entries=4096, max_bytes=128 * 1024 * 1024)
+_frame_layouts = LRUCache(max_entries=1024)
+
+
+def dicom_frame_layout(head: bytes) -> Dict[str, Any]:
+    """Worker: geometry, display parameters and (for native data) the pixel offset.
+
+    Pixel data is never read: the element is deferred and only its file
+    position is kept, so uncompressed frames can be fetched by byte range.
+    """
+    import pydicom
+
+    ds = pydicom.dcmread(io.BytesIO(head), force=True, defer_size=256)
+    rows = int(getattr(ds, "Rows", 0) or 0)
+    cols = int(getattr(ds, "Columns", 0) or 0)
+    bits = int(getattr(ds, "BitsAllocated", 8) or 8)
+    layout: Dict[str, Any] = {
+        **_display_params(ds),
+        "rows": rows,
+        "columns": cols,
+        "frames": _int_or_none(getattr(ds, "NumberOfFrames", None)) or 1,
+        "bits": bits,
+        "bits_stored": min(int(getattr(ds, "BitsStored", bits) or bits), bits),
+        "signed": int(getattr(ds, "PixelRepresentation", 0) or 0) == 1,
+        "planar": int(getattr(ds, "PlanarConfiguration", 0) or 0),
+        "pixel_offset": None,
+    }
+    layout["frame_bytes"] = rows * cols * layout["samples"] * bits // 8
+
+    transfer_syntax = getattr(getattr(ds, "file_meta", None), "TransferSyntaxUID", None)
+    elem = ds.get_item(0x7FE00010, keep_deferred=True)
+    if (
+        elem is not None
+        and transfer_syntax is not None
+        and not transfer_syntax.is_encapsulated
+        and transfer_syntax.is_little_endian
+        and bits in (8, 16, 32)
+        and elem.length not in (None, 0xFFFFFFFF)
+        and elem.length >= layout["frame_bytes"] * layout["frames"]
+    ):
+        layout["pixel_offset"] = getattr(elem, "value_tell", None)
+    return layout
+
+
+def _native_frame_array(raw: bytes, layout: Dict[str, Any]):
+    import numpy as np
+
+    dtype = np.dtype(f"<{'i' if layout['signed'] else 'u'}{layout['bits'] // 8}")
+    arr = np.frombuffer(raw, dtype=dtype)
+    # Bits above BitsStored may hold overlays or garbage: drop them (sign-extending
+    # signed data), as pydicom does for the compressed path
+    unused = layout["bits"] - (layout.get("bits_stored") or layout["bits"])
+    if unused > 0:
+        if layout["signed"]:
+            arr = (arr << unused) >> unused
+        else:
+            arr = arr & dtype.type((1 << (layout["bits"] - unused)) - 1)
+    rows, cols, samples = layout["rows"], layout["columns"], layout["samples"]
+    if samples == 1:
+        return arr.reshape(rows, cols)
+    if layout["planar"]:
+        return arr.reshape(samples, rows, cols).transpose(1, 2, 0)
+    return arr.reshape(rows, cols, samples)
+
+
+def _encode_frame(arr, layout: Dict[str, Any], fmt: str, center: Optional[float], width: Optional[float]) -> bytes:
+    import numpy as np
+
+    if fmt == "raw16":
+        return np.ascontiguousarray(arr.astype("<i2" if layout["signed"] else "<u2")).tobytes()
+    if fmt == "png16":
+        from PIL import Image
+
+        if layout["samples"] > 1:
+            raise ValueError("16-bit PNG is only available for grayscale images")
+        # Signed data is biased by 32768 (see X-Pixel-Bias)
+        values = arr.astype(np.int32) + (32768 if layout["signed"] else 0)
+        out = io.BytesIO()
+        Image.fromarray(np.clip(values, 0, 65535).astype(np.uint16)).save(out, format="PNG")
+        return out.getvalue()
+
+    display = _to_display_uint8(arr, layout, center, width)
+    if fmt == "raw8":
+        return np.ascontiguousarray(display).tobytes()
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.fromarray(display).save(out, format="PNG", compress_level=3)
+    return out.getvalue()
+
+
+def encode_native_frames(
+    raws: List[bytes], layout: Dict[str, Any], fmt: str, center: Optional[float], width: Optional[float]
+) -> List[bytes]:
+    """Worker: encode uncompressed frames that were read by byte range."""
+    return [_encode_frame(_native_frame_array(raw, layout), layout, fmt, center, width) for raw in raws]
+
+
+def decode_dicom_frames(
+    source: Union[str, bytes],
+    indices: List[int],
+    layout: Dict[str, Any],
+    fmt: str,
+    center: Optional[float],
+    width: Optional[float],
+) -> List[bytes]:
+    """Worker: decode only the requested frames of a (compressed) DICOM file.
+
+    ``source`` is preferably a file path so the worker reads the file itself
+    instead of receiving the whole blob pickled over the pool's pipe.
+    """
+    from pydicom.pixels import pixel_array
+
+    return [
+        _encode_frame(
+            pixel_array(source if isinstance(source, str) else io.BytesIO(source), index=index),
+            layout,
+            fmt,
+            center,
+            width,
+        )
+        for index in indices
+    ]
+
+
+async def _read_blob_range(blob_id: str, start: int, length: int) -> bytes:
+    return b"".join([chunk async for chunk in blob_store().stream(blob_id, start=start, length=length)])
+
+
+async def _frame_layout(doc: Dict[str, Any]) -> Dict[str, Any]:
+    layout = _frame_layouts.get(doc["sha256"])
+    if layout is None:
+        head_size = min(int(doc.get("size_bytes") or 0), DICOM_HEADER_BYTES)
+        if doc.get("blob_id"):
+            head = await _read_blob_range(doc["blob_id"], 0, head_size)
+        else:
+            head = (await _read_image_bytes(doc))[:head_size]
+        layout = await run_in_worker(dicom_frame_layout, head)
+        if not doc.get("blob_id"):
+            layout["pixel_offset"] = None  # legacy inline bytes: no range reads
+        _frame_layouts.set(doc["sha256"], layout)
+    return layout
+
+
+async def _decode_compressed_frames(
+    doc: Dict[str, Any], indices: List[int], layout: Dict[str, Any], fmt: str, center, width
+) -> List[bytes]:
+    async with _worker_source(doc) as source:
+        return await run_in_worker(decode_dicom_frames, source, indices, layout, fmt, center, width)
+
+
+async def get_frames(
+    doc: Dict[str, Any],
+    indices: List[int],
+    fmt: str,
+    center: Optional[float] = None,
+    width: Optional[float] = None,
+) -> List[bytes]:
+    """Encoded frames for ``indices``, served from the frame cache when possible."""
+    layout = await _frame_layout(doc)
+
+    def key(index: int):
+        return (doc["sha256"], index, fmt, center, width)
+
+    # Hits are copied out now: entries may be evicted during the awaits below
+    frames: Dict[int, bytes] = {}
+    for index in indices:
+        content = _frame_cache.get(key(index))
+        if content is not None:
+            frames[index] = content
+    missing = [i for i in indices if i not in frames]
+    if missing:
+        if layout["pixel_offset"] is not None:
+            # Uncompressed: read just the frame bytes, one range per contiguous run
+            raws: List[bytes] = []
+            frame_bytes = layout["frame_bytes"]
+            run_start = prev = missing[0]
+            for index in missing[1:] + [None]:
+                if index is not None and index == prev + 1:
+                    prev = index
+                    continue
+                span = await _read_blob_range(
+                    doc["blob_id"], layout["pixel_offset"] + run_start * frame_bytes, (prev - run_start + 1) * frame_bytes
+                )
+                raws.extend(span[pos : pos + frame_bytes] for pos in range(0, len(span), frame_bytes))
+                if index is not None:
+                    run_start = prev = index
+            wanted = missing
+            encoded = await run_in_worker(encode_native_frames, raws, layout, fmt, center, width)
+        else:
+            wanted = list(missing)
+            if len(missing) == 1:
+                ahead = range(missing[0] + 1, min(layout["frames"], missing[0] + FRAME_PREFETCH))
+                wanted += [i for i in ahead if _frame_cache.get(key(i)) is None]
+            encoded = await _decode_compressed_frames(doc, wanted, layout, fmt, center, width)
+        for index, content in zip(wanted, encoded):
+            _frame_cache.set(key(index), content)
+            frames[index] = content
+
+    return [frames[i] for i in indices]
+
+
+def _frame_headers(layout: Dict[str, Any], fmt: str) -> Dict[str, str]:
+    headers = {
+        "Cache-Control": "private, max-age=86400",
+        "X-Frame-Count": str(layout["frames"]),
+        "X-Frame-Rows": str(layout["rows"]),
+        "X-Frame-Columns": str(layout["columns"]),
+        "X-Frame-Samples": str(layout["samples"]),
+        "X-Frame-Bits": "16" if fmt in ("raw16", "png16") else "8",
+    }
+    if fmt in ("raw16", "png16") and layout["signed"]:
+        headers["X-Pixel-Signed"] = "1"
+        if fmt == "png16":
+            headers["X-Pixel-Bias"] = "32768"
+    return headers
+
+
+async def _load_frame_source(image_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    doc = await db().images.find_one(
+        {"image_id": image_id},
+        {"_id": 0, "image_id": 1, "sha256": 1, "kind": 1, "blob_id": 1, "size_bytes": 1},
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if doc.get("kind") != "dicom" or not doc.get("sha256"):
+        raise HTTPException(status_code=415, detail="Frame access is only available for DICOM images")
+    try:
+        layout = await _frame_layout(doc)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="DICOM support is not installed")
+    except Exception:
+        raise HTTPException(status_code=422, detail="Could not read DICOM header")
+    return doc, layout
+
+
+async def _encoded_frames(doc, indices, fmt, center, width) -> List[bytes]:
+    try:
+        return await get_frames(doc, indices, fmt, center, width)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Image codec support is not installed")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception:
+        raise HTTPException(status_code=422, detail="Could not decode frame")
+
+
+@app.get("/api/images/{image_id}/frames/{frame}")
+async def get_image_frame(
+    image_id: str,
+    frame: int,
+    request: Request,
+    format: Literal["png", "png16", "raw8", "raw16"] = Query(default="png"),
+    window_center: Optional[float] = Query(default=None),
+    window_width: Optional[float] = Query(default=None, gt=0),
+):
+    """One decoded frame; 8-bit output is windowed (header window by default)."""
+    doc, layout = await _load_frame_source(image_id)
+    if frame < 0 or frame >= layout["frames"]:
+        raise HTTPException(status_code=404, detail="Frame out of range")
+
+    headers = _frame_headers(layout, format)
+    etag = f'"{doc["sha256"]}-{frame}-{format}-{window_center}-{window_width}"'
+    headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    (content,) = await _encoded_frames(doc, [frame], format, window_center, window_width)
+    return Response(content=content, media_type=FRAME_MEDIA_TYPES[format], headers=headers)
+
+
+@app.get("/api/images/{image_id}/frames")
+async def get_image_frame_range(
+    image_id: str,
+    start: int = Query(default=0, ge=0),
+    count: int = Query(default=16, ge=1, le=MAX_FRAMES_PER_REQUEST),
+    format: Literal["raw8", "raw16"] = Query(default="raw8"),
+    window_center: Optional[float] = Query(default=None),
+    window_width: Optional[float] = Query(default=None, gt=0),
+):
+    """A run of raw frames concatenated in order (each ``X-Frame-Bytes`` long)."""
+    doc, layout = await _load_frame_source(image_id)
+    if start >= layout["frames"]:
+        raise HTTPException(status_code=404, detail="Frame out of range")
+
+    indices = list(range(start, min(layout["frames"], start + count)))
+    frames = await _encoded_frames(doc, indices, format, window_center, window_width)
+
+    headers = _frame_headers(layout, format)
+    headers["X-Frame-Start"] = str(start)
+    headers["X-Frame-Returned"] = str(len(indices))
+    headers["X-Frame-Bytes"] = str(len(frames[0]))
+    return Response(content=b"".join(frames), media_type=FRAME_MEDIA_TYPES[format], headers=headers)
+
+
+# -----------------------------
+# Sync (changes feed)
+# -----------------------------
+
+# Writes younger than this are left for the next call, so a write whose
+# timestamp was taken before a concurrent, faster write cannot be skipped
+SYNC_SETTLE_SECONDS = 2.0
+SYNC_MAX_LIMIT = 2000
+
+# type -> (collection, id field, model); order is the tiebreak between equal timestamps
+SYNC_SOURCES: Dict[str, Tuple[str, str, Any]] = {
+    "patient": ("patients", "patient_id", Patient),
+    "exam": ("exams", "exam_id", Exam),
+    "template": ("templates", "template_id", Template),
+    "image": ("images", "image_id", ImageMeta),
+}
+SYNC_RANK = {name: rank for rank, name in enumerate([*SYNC_SOURCES, "deleted"])}
+
+
+class SyncChange(BaseModel):
+    type: Literal["patient", "exam", "template", "image"]
+    op: Literal["upsert", "delete"]
+    id: str
+    updated_at: datetime
+    data: Optional[Dict[str, Any]] = None
+
+
+class SyncPage(BaseModel):
+    changes: List[SyncChange]
+    next_token: str
+    has_more: bool
+
+
+async def record_tombstones(entity: str, ids: List[str], session=None) -> None:
+    """Remember deletions for the sync feed (one row per entity, latest wins)."""
+    if not ids:
+        return
+    now = utc_now()
+    await db().tombstones.bulk_write(
+        [
+            UpdateOne({"entity": entity, "entity_id": entity_id}, {"$set": {"updated_at": now}}, upsert=True)
+            for entity_id in ids
+        ],
+        ordered=False,
+        session=session,
+    )
+
+
+def _sync_after(position: Optional[List[Any]], rank: int, id_field: str) -> Dict[str, Any]:
+    """Rows of source ``rank`` ordered after ``position`` = (updated_at, rank, id)."""
+    if position is None:
+        return {}
+    ts, pos_rank, pos_id = position
+    if rank > pos_rank:
+        return {"updated_at": {"$gte": ts}}
+    if rank < pos_rank:
+        return {"updated_at": {"$gt": ts}}
+    return {"$or": [{"updated_at": {"$gt": ts}}, {"updated_at": ts, id_field: {"$gt": pos_id}}]}
+
+
+@app.get("/api/sync/changes", response_model=SyncPage)
+async def sync_changes(
+    since: Optional[str] = Query(default=None, description="next_token of the previous call; omit for a full sync"),
+    limit: int = Query(default=500, ge=1, le=SYNC_MAX_LIMIT),
+    types: Optional[str] = Query(default=None, description="Comma-separated subset of patient,exam,template,image"),
+):
+    """Upserts and deletions since ``since``, oldest first.
+
+    Keep calling with ``next_token`` while ``has_more``; store the last
+    token for the next reconnect.
+    """
+    wanted = list(SYNC_SOURCES) if not types else [t.strip() for t in types.split(",") if t.strip()]
+    unknown = sorted(set(wanted) - set(SYNC_SOURCES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    position = decode_cursor(since, "sync", 3) if since else None
+    until = utc_now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+    # Each source is read in (updated_at, id) order; merged by (updated_at, rank, id)
+    rows: List[Tuple[datetime, int, str, str, Optional[Dict[str, Any]]]] = []
+    for name in wanted:
+        collection, id_field, model = SYNC_SOURCES[name]
+        rank = SYNC_RANK[name]
+        selector = {"$and": [{"updated_at": {"$lt": until}, "deleted_at": None}, _sync_after(position, rank, id_field)]}
+        projection = {"_id": 0, **{f: 1 for f in model.model_fields}}
+        cursor = db()[collection].find(selector, projection).sort([("updated_at", ASCENDING), (id_field, ASCENDING)])
+        async for doc in cursor.limit(limit + 1):
+            rows.append((doc["updated_at"], rank, doc[id_field], name, trusted_doc(model, doc)))
+
+    rank = SYNC_RANK["deleted"]
+    selector = {
+        "$and": [
+            {"updated_at": {"$lt": until}, "entity": {"$in": wanted}},
+            _sync_after(position, rank, "entity_id"),
+        ]
+    }
+    cursor = db().tombstones.find(selector, {"_id": 0}).sort([("updated_at", ASCENDING), ("entity_id", ASCENDING)])
+    async for doc in cursor.limit(limit + 1):
+        rows.append((doc["updated_at"], rank, doc["entity_id"], doc["entity"], None))
+
+    rows.sort(key=lambda row: row[:3])
+    page = rows[:limit]
+    changes = [
+        SyncChange(type=kind, op="delete" if data is None else "upsert", id=entity_id, updated_at=ts, data=data)
+        for ts, _, entity_id, kind, data in page
+    ]
+    if page:
+        next_token = encode_cursor("sync", list(page[-1][:3]))
+    else:
+        next_token = since or encode_cursor("sync", [datetime(1970, 1, 1), -1, ""])
+    return SyncPage(changes=changes, next_token=next_token, has_more=len(rows) > limit)
+
+
+# -----------------------------
+# Export (NDJSON / CSV streams)
+# -----------------------------
+
+# Documents fetched per cursor round trip
+EXPORT_BATCH_SIZE = 500
+# Output is flushed to the client in chunks of about this size
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":"))
+    return value
+
+
+def _ndjson_record(kind: str, model, doc: Dict[str, Any]) -> bytes:
+    if fast_json_enabled():
+        import orjson
+
+        return orjson.dumps(
+            {"type": kind, "data": trusted_doc(model, doc)}, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return b'{"type":"' + kind.encode() + b'","data":' + model(**doc).model_dump_json().encode() + b"}"
+
+
+async def _export_chunks(
+    wanted: List[str], fmt: str, updated_since: Optional[datetime]
+) -> AsyncIterator[bytes]:
+    """Encoded export, one entity type after another in (updated_at, id) order."""
+    buffer = io.StringIO() if fmt == "csv" else None
+    writer = csv.writer(buffer) if buffer is not None else None
+    chunk: List[bytes] = []
+    size = 0
+    for kind in wanted:
+        collection, id_field, model = SYNC_SOURCES[kind]
+        fields = list(model.model_fields)
+        selector: Dict[str, Any] = {"deleted_at": None}
+        if updated_since is not None:
+            selector["updated_at"] = {"$gte": updated_since}
+        cursor = (
+            db()[collection]
+            .find(selector, {"_id": 0, **{f: 1 for f in fields}}, batch_size=EXPORT_BATCH_SIZE)
+            .sort([("updated_at", ASCENDING), (id_field, ASCENDING)])
+        )
+        if writer is not None:
+            writer.writerow(fields)
+        async for doc in cursor:
+            if writer is not None:
+                row = trusted_doc(model, doc)
+                writer.writerow([_csv_value(row[f]) for f in fields])
+                if buffer.tell() < EXPORT_CHUNK_BYTES:
+                    continue
+                chunk.append(buffer.getvalue().encode())
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                line = _ndjson_record(kind, model, doc) + b"\n"
+                chunk.append(line)
+                size += len(line)
+                if size < EXPORT_CHUNK_BYTES:
+                    continue
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+    if buffer is not None and buffer.tell():
+        chunk.append(buffer.getvalue().encode())
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.get("/api/export")
+async def export_data(
+    types: Optional[str] = Query(default=None, description="Comma-separated subset of patient,exam,template,image"),
+    format: Literal["ndjson", "csv"] = Query(default="ndjson"),
+    updated_since: Optional[datetime] = Query(default=None, description="Only rows updated at or after this instant"),
+    compress: Literal["none", "gzip"] = Query(default="none", description="gzip: download a .gz file"),
+):
+    """Stream live patients, exams, templates and image metadata in one request.
+
+    NDJSON lines are ``{"type": ..., "data": {...}}``; CSV exports a single
+    type (nested fields as JSON). ``X-Export-Watermark`` is the
+    ``updated_since`` to pass next time for an incremental export. Deletions
+    are not exported; use /api/sync/changes for those.
+    """
+    wanted = list(SYNC_SOURCES) if not types else [t.strip() for t in types.split(",") if t.strip()]
+    unknown = sorted(set(wanted) - set(SYNC_SOURCES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    if format == "csv" and len(wanted) != 1:
+        raise HTTPException(status_code=400, detail="CSV export needs exactly one type")
+
+    watermark = utc_now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    chunks = _export_chunks(wanted, format, updated_since)
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"export-{wanted[0] if format == 'csv' else 'tvusvet'}-{watermark:%Y%m%dT%H%M%S}.{format}"
+    if compress == "gzip":
+        chunks = _gzip_stream(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Watermark": watermark.isoformat(),
+        },
+    )
+
+
+# -----------------------------
+# Backup / restore (tar archives)
+# -----------------------------
+
+# Archived (and restored) in this order so references land on existing rows
+BACKUP_COLLECTIONS: List[Tuple[str, str]] = [
+    ("templates", "template_id"),
+    ("patients", "patient_id"),
+    ("exams", "exam_id"),
+    ("dicom_series", "series_id"),
+    ("images", "image_id"),
+    ("exam_images", "image_id"),
+]
+BACKUP_FORMAT = "tvusvet-backup"
+BACKUP_VERSION = 1
+BACKUP_MANIFEST = "manifest.json"
+# Blobs archived/restored between two job progress updates
+BACKUP_PROGRESS_EVERY = 100
+
+
+class BackupStarted(BaseModel):
+    backup_id: str
+    job_id: str
+
+
+def _backup_path(backup_id: str) -> str:
+    safe = "".join(c for c in backup_id if c.isalnum() or c in "_-")
+    if not safe:
+        raise HTTPException(status_code=400, detail="Invalid backup_id")
+    return os.path.join(settings.backup_dir, f"{safe}.tar")
+
+
+def _tar_header(name: str, size: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = int(time.time())
+    return info.tobuf(tarfile.PAX_FORMAT)
+
+
+def _tar_padding(size: int) -> bytes:
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+async def _spool_records(collection: str):
+    """Live documents of ``collection`` as extended-JSON NDJSON in a temp file.
+
+    Returns ``(file, count, size, sha256)``; tar needs the size up front.
+    """
+    spool = tempfile.TemporaryFile()
+    hasher = hashlib.sha256()
+    count = size = 0
+    chunk: List[bytes] = []
+    pending = 0
+    cursor = db()[collection].find({"deleted_at": None}, {"_id": 0}, batch_size=EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        line = json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS).encode() + b"\n"
+        chunk.append(line)
+        pending += len(line)
+        count += 1
+        if pending >= EXPORT_CHUNK_BYTES:
+            data = b"".join(chunk)
+            hasher.update(data)
+            await asyncio.to_thread(spool.write, data)
+            size += len(data)
+            chunk = []
+            pending = 0
+    data = b"".join(chunk)
+    hasher.update(data)
+    spool.write(data)
+    size += len(data)
+    spool.seek(0)
+    return spool, count, size, hasher.hexdigest()
+
+
+async def backup_archive(job_id: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Tar stream of ``records/<collection>.ndjson``, ``blobs/<sha256>`` and ``manifest.json``.
+
+    Each stored content is written once however many images share it. The
+    manifest comes last and holds record counts and checksums; blob members
+    are verified by their name. Rows written while a backup runs may or may
+    not be included.
+
+    Headers are already sent when a blob turns out not to match its recorded
+    size, so the archive cannot fail then. The member is cut or zero-padded
+    to the size in its tar header so the tar stays readable. It is followed
+    by a ``blobs/<sha256>.error`` member holding the reason, and the sha is
+    listed under ``corrupt_blobs`` in the manifest. Restore skips such blobs.
+    """
+    manifest: Dict[str, Any] = {
+        "format": BACKUP_FORMAT,
+        "version": BACKUP_VERSION,
+        "created_at": utc_now().isoformat(),
+        "records": {},
+        "blobs": {"count": 0, "bytes": 0},
+        "missing_blobs": [],
+        "corrupt_blobs": [],
+    }
+    for collection, _ in BACKUP_COLLECTIONS:
+        spool, count, size, sha = await _spool_records(collection)
+        with spool:
+            yield _tar_header(f"records/{collection}.ndjson", size)
+            while True:
+                chunk = await asyncio.to_thread(spool.read, BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            yield _tar_padding(size)
+        manifest["records"][collection] = {"count": count, "bytes": size, "sha256": sha}
+        if job_id:
+            await _job_progress(job_id, **{collection: count})
+
+    # Images walked in hash order: duplicates are adjacent, so dedup needs no memory
+    last_sha = None
+    unreported = 0
+    cursor = db().images.find(
+        {"deleted_at": None, "sha256": {"$ne": None}, "blob_id": {"$ne": None}},
+        {"_id": 0, "sha256": 1, "blob_id": 1, "size_bytes": 1},
+        batch_size=EXPORT_BATCH_SIZE,
+    ).sort("sha256", ASCENDING)
+    async for doc in cursor:
+        sha = doc["sha256"]
+        if sha == last_sha:
+            continue
+        last_sha = sha
+        chunks = blob_store().stream(doc["blob_id"])
+        try:
+            first = await chunks.__anext__()
+        except (StopAsyncIteration, FileNotFoundError, NoFile):
+            manifest["missing_blobs"].append(sha)
+            continue
+        size = doc["size_bytes"]
+        yield _tar_header(f"blobs/{sha}", size)
+        # Never write past the size promised in the member header
+        yield first[:size]
+        written = len(first)
+        async for chunk in chunks:
+            if written < size:
+                yield chunk[: size - written]
+            written += len(chunk)
+        if written < size:
+            yield b"\0" * (size - written)
+        yield _tar_padding(size)
+        if written != size:
+            error = f"stored blob has {written} bytes, expected {size}".encode()
+            yield _tar_header(f"blobs/{sha}.error", len(error)) + error + _tar_padding(len(error))
+            manifest["corrupt_blobs"].append(sha)
+            continue
+        manifest["blobs"]["count"] += 1
+        manifest["blobs"]["bytes"] += written
+        unreported += 1
+        if job_id and unreported >= BACKUP_PROGRESS_EVERY:
+            await _job_progress(job_id, blobs=unreported)
+            unreported = 0
+    if job_id and unreported:
+        await _job_progress(job_id, blobs=unreported)
+
+    body = json.dumps(manifest, indent=2).encode()
+    yield _tar_header(BACKUP_MANIFEST, len(body)) + body + _tar_padding(len(body))
+    # End-of-archive marker
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+async def _write_backup(backup_id: str, job_id: str) -> None:
+    # A resumed job starts over, so its counters do too
+    await db().jobs.update_one({"job_id": job_id}, {"$set": {"progress": {}}})
+    os.makedirs(settings.backup_dir, exist_ok=True)
+    path = _backup_path(backup_id)
+    tmp_path = f"{path}.part"
+    try:
+        with open(tmp_path, "wb") as fh:
+            async for chunk in backup_archive(job_id):
+                await asyncio.to_thread(fh.write, chunk)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    os.replace(tmp_path, path)
+
+
+class _TarMemberReader:
+    """Async ``read`` over one tar member, so it can feed ``_stream_upload``."""
+
+    def __init__(self, archive: tarfile.TarFile, info: tarfile.TarInfo):
+        self.size = info.size
+        self._fh = archive.extractfile(info)
+
+    async def read(self, size: int) -> bytes:
+        return await asyncio.to_thread(self._fh.read, size)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _hash_member(archive: tarfile.TarFile, info: tarfile.TarInfo) -> str:
+    hasher = hashlib.sha256()
+    with archive.extractfile(info) as fh:
+        for chunk in iter(lambda: fh.read(BLOB_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def _restore_blob(archive: tarfile.TarFile, info: tarfile.TarInfo) -> bool:
+    """Store one archived blob unless its content is already here."""
+    sha = info.name[len("blobs/") :]
+    if await db().blob_refs.find_one({"sha256": sha}, {"_id": 1}):
+        return False
+    blob_id = new_uuid("blob")
+    reader = _TarMemberReader(archive, info)
+    try:
+        size, digest, _ = await _stream_upload(reader, blob_id)
+    finally:
+        reader.close()
+    if digest != sha:
+        await blob_store().delete(blob_id)
+        raise RuntimeError(f"Checksum mismatch for {info.name}")
+    # Unreferenced until restored image rows count it; whatever no row
+    # claims is freed by _sweep_restored_blobs
+    now = utc_now()
+    try:
+        await db().blob_refs.insert_one(
+            {"sha256": sha, "blob_id": blob_id, "size_bytes": size, "refcount": 0, "created_at": now, "updated_at": now}
+        )
+    except DuplicateKeyError:
+        await blob_store().delete(blob_id)  # an upload stored the same content meanwhile
+        return False
+    return True
+
+
+async def _sweep_restored_blobs(shas: List[str]) -> int:
+    """Free archived blobs that no image row references after the restore."""
+    freed = 0
+    for pos in range(0, len(shas), BATCH_WRITE_SIZE):
+        cursor = db().blob_refs.find(
+            {"sha256": {"$in": shas[pos : pos + BATCH_WRITE_SIZE]}, "refcount": {"$lte": 0}},
+            {"_id": 0, "sha256": 1, "blob_id": 1},
+        )
+        async for ref in cursor:
+            # Same conditional delete as _release_blob, in case an upload took a reference
+            res = await db().blob_refs.delete_one({**ref, "refcount": {"$lte": 0}})
+            if res.deleted_count:
+                await blob_store().delete(ref["blob_id"])
+                await _drop_derivatives(ref["sha256"])
+                freed += 1
+    return freed
+
+
+# Restored collection -> sync entity name
+SYNC_ENTITY_OF = {collection: name for name, (collection, _, _) in SYNC_SOURCES.items()}
+
+
+async def _restore_records(collection: str, id_field: str, docs: List[Dict[str, Any]], job_id: str) -> None:
+    lines = len(docs)
+    missing = 0
+    if collection == "images":
+        # Blob ids belong to the source store; point rows at the local copies
+        shas = list({d.get("sha256") for d in docs})
+        cursor = db().blob_refs.find({"sha256": {"$in": shas}}, {"_id": 0, "sha256": 1, "blob_id": 1})
+        blob_ids = {r["sha256"]: r["blob_id"] async for r in cursor}
+        kept = []
+        dropped = []
+        for doc in docs:
+            doc["blob_id"] = blob_ids.get(doc.get("sha256"))
+            if doc["blob_id"]:
+                kept.append(doc)
+            elif doc.get("exam_id"):
+                dropped.append({"image_id": doc["image_id"], "exam_id": doc["exam_id"]})
+        missing = len(docs) - len(kept)
+        docs = kept
+        if dropped:
+            # Unlinked from their exams once exam_images is restored (_unlink_dropped_images)
+            await db().jobs.update_one({"job_id": job_id}, {"$addToSet": {"dropped_images": {"$each": dropped}}})
+
+    entity = SYNC_ENTITY_OF.get(collection)
+    if entity:
+        # Restored rows are new to every sync client, whatever their token
+        now = utc_now()
+        for doc in docs:
+            doc["updated_at"] = now
+    failed = await _insert_batch(db()[collection], docs, id_field)
+    skipped = sum(1 for detail in failed.values() if detail.startswith("Duplicate"))
+    if entity:
+        restored = [doc[id_field] for pos, doc in enumerate(docs) if pos not in failed and doc.get("deleted_at") is None]
+        if restored:
+            await db().tombstones.delete_many({"entity": entity, "entity_id": {"$in": restored}})
+    if collection == "patients":
+        for pos, doc in enumerate(docs):
+            if pos not in failed:
+                patient_search().add(doc)
+    if collection == "images" and docs:
+        # Absolute counts, so replaying a batch after a crash cannot skew them
+        counts = db().images.aggregate(
+            [{"$match": {"sha256": {"$in": shas}}}, {"$group": {"_id": "$sha256", "n": {"$sum": 1}}}]
+        )
+        updates = [UpdateOne({"sha256": row["_id"]}, {"$set": {"refcount": row["n"]}}) async for row in counts]
+        if updates:
+            await db().blob_refs.bulk_write(updates, ordered=False)
+
+    await _job_progress(
+        job_id,
+        **{
+            collection: len(docs) - len(failed),
+            f"{collection}_skipped": skipped,
+            f"{collection}_failed": len(failed) - skipped + missing,
+            f"{collection}_lines": lines,
+        },
+    )
+
+
+async def _unlink_dropped_images(job_id: str) -> None:
+    """Remove exam references to images a restore left out (blob missing or corrupt).
+
+    Idempotent, so a resumed job can run it again.
+    """
+    job = await db().jobs.find_one({"job_id": job_id}, {"_id": 0, "dropped_images": 1})
+    dropped = (job or {}).get("dropped_images") or []
+    # Rows already in this database with the same id are live: keep their links
+    cursor = db().images.find({"image_id": {"$in": [ref["image_id"] for ref in dropped]}}, {"_id": 0, "image_id": 1})
+    present = {d["image_id"] async for d in cursor}
+    dropped = [ref for ref in dropped if ref["image_id"] not in present]
+    for ref in dropped:
+        await _unlink_exam_image(ref["exam_id"], ref["image_id"])
+    if dropped:
+        await db().jobs.update_one({"job_id": job_id}, {"$set": {"progress.images_unlinked": len(dropped)}})
+
+
+async def _restore_backup(backup_id: str, job_id: str) -> None:
+    """Verify the archive, then restore blobs and records batch by batch.
+
+    Inserts skip rows that already exist, and ``<collection>_lines`` in the
+    job progress lets a resumed job continue where it stopped.
+    """
+    try:
+        archive = await asyncio.to_thread(tarfile.open, _backup_path(backup_id), "r:")
+    except tarfile.ReadError:
+        raise RuntimeError("Not a backup archive (unreadable tar)")
+    with archive:
+        members = {m.name: m for m in await asyncio.to_thread(archive.getmembers) if m.isfile()}
+        if BACKUP_MANIFEST not in members:
+            raise RuntimeError("Not a backup archive (no manifest.json)")
+        with archive.extractfile(members[BACKUP_MANIFEST]) as fh:
+            manifest = json.loads(fh.read())
+        if manifest.get("format") != BACKUP_FORMAT or manifest.get("version") != BACKUP_VERSION:
+            raise RuntimeError("Unsupported backup format")
+
+        for collection, _ in BACKUP_COLLECTIONS:
+            name = f"records/{collection}.ndjson"
+            expected = manifest["records"].get(collection)
+            if expected is None or name not in members:
+                raise RuntimeError(f"Backup is missing {name}")
+            if await asyncio.to_thread(_hash_member, archive, members[name]) != expected["sha256"]:
+                raise RuntimeError(f"Checksum mismatch for {name}")
+
+        # Blobs first, so restored images point at stored content; blobs the
+        # backup could not read intact are skipped (their images are dropped)
+        corrupt = set(manifest.get("corrupt_blobs") or [])
+        blobs = {
+            name: info
+            for name, info in members.items()
+            if name.startswith("blobs/") and not name.endswith(".error") and name[len("blobs/") :] not in corrupt
+        }
+        restored = 0
+        for name, info in blobs.items():
+            if await _restore_blob(archive, info):
+                restored += 1
+                if restored % BACKUP_PROGRESS_EVERY == 0:
+                    await _job_progress(job_id, blobs=BACKUP_PROGRESS_EVERY)
+        if restored % BACKUP_PROGRESS_EVERY:
+            await _job_progress(job_id, blobs=restored % BACKUP_PROGRESS_EVERY)
+
+        job = await db().jobs.find_one({"job_id": job_id}, {"_id": 0, "progress": 1})
+        progress = (job or {}).get("progress") or {}
+        for collection, id_field in BACKUP_COLLECTIONS:
+            fh = archive.extractfile(members[f"records/{collection}.ndjson"])
+            with fh:
+                # Lines restored by an earlier run of this job
+                done = progress.get(f"{collection}_lines", 0)
+                if done:
+                    await asyncio.to_thread(lambda: next(itertools.islice(fh, done - 1, done), None))
+                while True:
+                    lines = await asyncio.to_thread(lambda: list(itertools.islice(fh, BATCH_WRITE_SIZE)))
+                    if not lines:
+                        break
+                    await _restore_records(collection, id_field, [json_util.loads(line) for line in lines], job_id)
+
+    await _unlink_dropped_images(job_id)
+    freed = await _sweep_restored_blobs([name[len("blobs/") :] for name in blobs])
+    if freed:
+        await _job_progress(job_id, blobs_unreferenced=freed)
+    await asyncio.shield(_reload_template_search())
+    await bump_template_version()
+    await rebuild_stats()
+
+
+@app.post("/api/backups", response_model=BackupStarted)
+async def start_backup():
+    """Write a full backup archive to BACKUP_DIR in a background job."""
+    backup_id = new_uuid("bak")
+    job_id = await create_job("backup", backup_id)
+    spawn_background(run_job(job_id))
+    return BackupStarted(backup_id=backup_id, job_id=job_id)
+
+
+@app.get("/api/backups:stream")
+async def stream_backup():
+    """Stream a full backup archive straight into the response."""
+    filename = f"tvusvet-backup-{utc_now():%Y%m%dT%H%M%S}.tar"
+    return StreamingResponse(
+        backup_archive(),
+        media_type="application/x-tar",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/backups/{backup_id}", responses={404: {"model": ApiError}})
+async def download_backup(backup_id: str):
+    path = _backup_path(backup_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return FileResponse(path, media_type="application/x-tar", filename=f"{backup_id}.tar")
+
+
+@app.post("/api/backups/restore", response_model=BackupStarted, responses={404: {"model": ApiError}})
+async def restore_backup(
+    request: Request,
+    backup_id: Optional[str] = Query(default=None, description="Restore a stored backup instead of the request body"),
+):
+    """Restore an archive uploaded as the request body (or a stored one) in a background job.
+
+    Restoring again (e.g. after a failure) skips whatever is already there.
+    """
+    if backup_id is None:
+        backup_id = new_uuid("bak")
+        os.makedirs(settings.backup_dir, exist_ok=True)
+        path = _backup_path(backup_id)
+        tmp_path = f"{path}.part"
+        try:
+            size = 0
+            with open(tmp_path, "wb") as fh:
+                async for chunk in request.stream():
+                    size += len(chunk)
+                    await asyncio.to_thread(fh.write, chunk)
+            if not size:
+                raise HTTPException(status_code=400, detail="Empty archive")
+            if not await asyncio.to_thread(tarfile.is_tarfile, tmp_path):
+                raise HTTPException(status_code=400, detail="Not a tar archive")
+            os.replace(tmp_path, path)
+        finally:
+            # Client gone mid-upload or archive rejected: nothing staged stays behind
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    elif not os.path.exists(_backup_path(backup_id)):
+        raise HTTPException(status_code=404, detail="Backup not found")
+    job_id = await create_job("restore", backup_id)
+    spawn_background(run_job(job_id))
+    return BackupStarted(backup_id=backup_id, job_id=job_id)
+
+
+# -----------------------------
+# Statistics (daily rollups)
+# -----------------------------
+
+# stats_daily rows (one per bucket, ``_id`` = bucket key):
+#   exams:  day (exam date, UTC) x exam_type x status -> count
+#   images: day (upload, UTC) x kind -> count, bytes
+# stats_patients rows (``_id`` = patient_id): images, bytes, deleted
+#   (set when the patient is tombstoned; the row goes with the purge)
+# Kept current with $inc on every exam/image write; POST /api/stats/rebuild
+# recomputes them from the collections.
+
+
+class ExamStatsRow(BaseModel):
+    period: str
+    exam_type: str
+    status: str
+    count: int
+
+
+class ImageStatsRow(BaseModel):
+    period: str
+    kind: str
+    count: int
+    bytes: int
+
+
+class PatientImageStats(BaseModel):
+    patient_id: str
+    name: Optional[str] = None
+    images: int
+    bytes: int
+
+
+class DraftStats(BaseModel):
+    older_than_days: int
+    count: int
+    oldest: List[ExamSummary]
+
+
+class StatsSummary(BaseModel):
+    exams: int
+    exams_by_status: Dict[str, int]
+    exams_by_type: Dict[str, int]
+    images: int
+    image_bytes: int
+
+
+def _stats_day(value: Optional[datetime]) -> str:
+    if value is None:
+        return "unknown"
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d")
+
+
+def exam_bucket(doc: Dict[str, Any]) -> Tuple[str, str, str]:
+    return _stats_day(doc.get("date")), doc.get("exam_type") or "", doc.get("status") or "draft"
+
+
+async def bump_exam_stats(deltas: Dict[Tuple[str, str, str], int]) -> None:
+    """Apply ``{(day, exam_type, status): +/-count}`` to the exam rollups."""
+    updates = [
+        UpdateOne(
+            {"_id": f"exams|{day}|{exam_type}|{status}"},
+            {
+                "$inc": {"count": n},
+                "$setOnInsert": {"metric": "exams", "day": day, "exam_type": exam_type, "status": status},
+            },
+            upsert=True,
+        )
+        for (day, exam_type, status), n in deltas.items()
+        if n
+    ]
+    # Upserts on _id are retried by the server when two writers race
+    if updates:
+        await db().stats_daily.bulk_write(updates, ordered=False)
+
+
+async def bump_image_stats(docs: Iterable[Dict[str, Any]], sign: int = 1) -> None:
+    """Count image rows in (``sign=1``) or out (``sign=-1``) of the image rollups."""
+    deltas: Dict[Tuple[str, str], List[int]] = {}
+    per_patient: Dict[str, List[int]] = {}
+    for doc in docs:
+        size = sign * (doc.get("size_bytes") or 0)
+        totals = deltas.setdefault((_stats_day(doc.get("created_at")), doc.get("kind") or "other"), [0, 0])
+        totals[0] += sign
+        totals[1] += size
+        if doc.get("patient_id"):
+            totals = per_patient.setdefault(doc["patient_id"], [0, 0])
+            totals[0] += sign
+            totals[1] += size
+    updates = [
+        UpdateOne(
+            {"_id": f"images|{day}|{kind}"},
+            {"$inc": {"count": count, "bytes": size}, "$setOnInsert": {"metric": "images", "day": day, "kind": kind}},
+            upsert=True,
+        )
+        for (day, kind), (count, size) in deltas.items()
+    ]
+    if updates:
+        await db().stats_daily.bulk_write(updates, ordered=False)
+    updates = [
+        UpdateOne(
+            {"_id": patient_id},
+            {"$inc": {"images": count, "bytes": size}, "$setOnInsert": {"deleted": False}},
+            upsert=True,
+        )
+        for patient_id, (count, size) in per_patient.items()
+    ]
+    if updates:
+        await db().stats_patients.bulk_write(updates, ordered=False)
+
+
+def _count_exams(docs: Iterable[Dict[str, Any]], sign: int = 1) -> Dict[Tuple[str, str, str], int]:
+    deltas: Dict[Tuple[str, str, str], int] = {}
+    for doc in docs:
+        key = exam_bucket(doc)
+        deltas[key] = deltas.get(key, 0) + sign
+    return deltas
+
+
+async def _ensure_stats_indexes(stats_daily, stats_patients) -> None:
+    await stats_daily.create_index([("metric", ASCENDING), ("day", ASCENDING)])
+    await stats_patients.create_index([("deleted", ASCENDING), ("bytes", DESCENDING), ("_id", ASCENDING)])
+
+
+_stats_rebuild_lock = asyncio.Lock()
+
+
+async def rebuild_stats() -> None:
+    """Recompute every rollup with aggregation pipelines over exams and images.
+
+    Rows are built in staging collections that are swapped in with a rename,
+    so readers never see empty or half-built rollups. A $inc that lands on the
+    old collection while its replacement is being built is lost with it (or
+    counted twice if the aggregation already saw the write); rebuild again
+    once writes are quiet if exact numbers matter.
+    """
+    async with _stats_rebuild_lock:
+        await _rebuild_stats()
+
+
+async def _rebuild_stats() -> None:
+    rows: List[Dict[str, Any]] = []
+    pipeline = [
+        {"$match": {"deleted_at": None}},
+        {
+            "$group": {
+                "_id": {
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+                    "exam_type": "$exam_type",
+                    "status": "$status",
+                },
+                "count": {"$sum": 1},
+            }
+        },
+    ]
+    async for row in db().exams.aggregate(pipeline):
+        day, exam_type, status = row["_id"]["day"] or "unknown", row["_id"]["exam_type"] or "", row["_id"]["status"] or "draft"
+        rows.append(
+            {
+                "_id": f"exams|{day}|{exam_type}|{status}",
+                "metric": "exams",
+                "day": day,
+                "exam_type": exam_type,
+                "status": status,
+                "count": row["count"],
+            }
+        )
+    pipeline = [
+        {
+            "$group": {
+                "_id": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "kind": "$kind"},
+                "count": {"$sum": 1},
+                "bytes": {"$sum": "$size_bytes"},
+            }
+        },
+    ]
+    async for row in db().images.aggregate(pipeline):
+        day, kind = row["_id"]["day"] or "unknown", row["_id"]["kind"] or "other"
+        rows.append(
+            {
+                "_id": f"images|{day}|{kind}",
+                "metric": "images",
+                "day": day,
+                "kind": kind,
+                "count": row["count"],
+                "bytes": row["bytes"],
+            }
+        )
+    deleted = {
+        doc["patient_id"]
+        async for doc in db().patients.find({"deleted_at": {"$ne": None}}, {"_id": 0, "patient_id": 1})
+    }
+    patient_rows: List[Dict[str, Any]] = []
+    pipeline = [
+        {"$match": {"patient_id": {"$ne": None}}},
+        {"$group": {"_id": "$patient_id", "images": {"$sum": 1}, "bytes": {"$sum": "$size_bytes"}}},
+    ]
+    async for row in db().images.aggregate(pipeline):
+        patient_rows.append({**row, "deleted": row["_id"] in deleted})
+
+    staging_daily, staging_patients = db().stats_daily_rebuild, db().stats_patients_rebuild
+    for staging, docs in ((staging_daily, rows), (staging_patients, patient_rows)):
+        await staging.drop()
+        if docs:
+            await staging.insert_many(docs, ordered=False)
+    # A rename keeps the source's indexes, not the target's
+    await _ensure_stats_indexes(staging_daily, staging_patients)
+    await staging_daily.rename("stats_daily", dropTarget=True)
+    await staging_patients.rename("stats_patients", dropTarget=True)
+
+
+async def _backfill_stats(database) -> None:
+    """Build the rollups once for data written before they existed."""
+    if not await database.stats_daily.estimated_document_count():
+        stale = bool(
+            await database.exams.estimated_document_count() or await database.images.estimated_document_count()
+        )
+    else:
+        stale = not await database.stats_patients.estimated_document_count() and bool(
+            await database.images.find_one({"patient_id": {"$ne": None}}, {"_id": 1})
+        )
+    if stale:
+        await rebuild_stats()
+
+
+def _stats_period(day: str, group: str) -> str:
+    return day[:7] if group == "month" and day != "unknown" else day
+
+
+def _stats_selector(metric: str, date_from: Optional[date_type], date_to: Optional[date_type]) -> Dict[str, Any]:
+    selector: Dict[str, Any] = {"metric": metric}
+    days: Dict[str, str] = {}
+    if date_from:
+        days["$gte"] = date_from.isoformat()
+    if date_to:
+        days["$lte"] = date_to.isoformat()
+    if days:
+        selector["day"] = days
+    return selector
+
+
+@app.get("/api/stats/summary", response_model=StatsSummary)
+async def stats_summary():
+    """Dashboard totals, read from the rollups only."""
+    summary = StatsSummary(exams=0, exams_by_status={}, exams_by_type={}, images=0, image_bytes=0)
+    async for row in db().stats_daily.find({}, {"_id": 0}):
+        if row["metric"] == "exams":
+            summary.exams += row["count"]
+            summary.exams_by_status[row["status"]] = summary.exams_by_status.get(row["status"], 0) + row["count"]
+            summary.exams_by_type[row["exam_type"]] = summary.exams_by_type.get(row["exam_type"], 0) + row["count"]
+        elif row["metric"] == "images":
+            summary.images += row["count"]
+            summary.image_bytes += row["bytes"]
+    return summary
+
+
+@app.get("/api/stats/exams", response_model=List[ExamStatsRow])
+async def stats_exams(
+    group: Literal["day", "month"] = Query(default="month"),
+    date_from: Optional[date_type] = Query(default=None, alias="from", description="First exam day (inclusive)"),
+    date_to: Optional[date_type] = Query(default=None, alias="to", description="Last exam day (inclusive)"),
+    exam_type: Optional[str] = Query(default=None),
+    status: Optional[Literal["draft", "final"]] = Query(default=None),
+):
+    """Exam counts per period x exam_type x status (by exam date)."""
+    selector = _stats_selector("exams", date_from, date_to)
+    if exam_type:
+        selector["exam_type"] = exam_type
+    if status:
+        selector["status"] = status
+    totals: Dict[Tuple[str, str, str], int] = {}
+    async for row in db().stats_daily.find(selector, {"_id": 0}):
+        key = (_stats_period(row["day"], group), row["exam_type"], row["status"])
+        totals[key] = totals.get(key, 0) + row["count"]
+    return [
+        ExamStatsRow(period=period, exam_type=kind, status=state, count=count)
+        for (period, kind, state), count in sorted(totals.items())
+        if count
+    ]
+
+
+@app.get("/api/stats/images", response_model=List[ImageStatsRow])
+async def stats_images(
+    group: Literal["day", "month"] = Query(default="month"),
+    date_from: Optional[date_type] = Query(default=None, alias="from", description="First upload day (inclusive)"),
+    date_to: Optional[date_type] = Query(default=None, alias="to", description="Last upload day (inclusive)"),
+):
+    """Images stored (count and bytes) per period x kind (by upload date)."""
+    totals: Dict[Tuple[str, str], List[int]] = {}
+    async for row in db().stats_daily.find(_stats_selector("images", date_from, date_to), {"_id": 0}):
+        key = (_stats_period(row["day"], group), row["kind"])
+        acc = totals.setdefault(key, [0, 0])
+        acc[0] += row["count"]
+        acc[1] += row["bytes"]
+    return [
+        ImageStatsRow(period=period, kind=kind, count=count, bytes=size)
+        for (period, kind), (count, size) in sorted(totals.items())
+        if count
+    ]
+
+
+@app.get("/api/stats/images/patients", response_model=List[PatientImageStats])
+async def stats_images_by_patient(limit: int = Query(default=20, ge=1, le=200)):
+    """Patients storing the most image bytes (per-patient rollups, deleted patients excluded)."""
+    cursor = (
+        db()
+        .stats_patients.find({"deleted": False, "images": {"$gt": 0}})
+        .sort([("bytes", DESCENDING), ("_id", ASCENDING)])
+        .limit(limit)
+    )
+    rows = [row async for row in cursor]
+    names = {
+        doc["patient_id"]: doc.get("name")
+        async for doc in db().patients.find(
+            {"patient_id": {"$in": [r["_id"] for r in rows]}}, {"_id": 0, "patient_id": 1, "name": 1}
+        )
+    }
+    return [
+        PatientImageStats(patient_id=r["_id"], name=names.get(r["_id"]), images=r["images"], bytes=r["bytes"])
+        for r in rows
+    ]
+
+
+@app.get("/api/stats/drafts", response_model=DraftStats)
+async def stats_drafts(
+    older_than_days: int = Query(default=7, ge=0, le=3650),
+    limit: int = Query(default=20, ge=0, le=200),
+):
+    """Drafts whose exam date is more than ``older_than_days`` days ago.
+
+    The count comes from the rollups (whole days before the cutoff day); the
+    oldest drafts are read through the (status, date) index.
+    """
+    cutoff = utc_now() - timedelta(days=older_than_days)
+    count = 0
+    selector = {"metric": "exams", "status": "draft", "day": {"$lt": _stats_day(cutoff)}}
+    async for row in db().stats_daily.find(selector, {"_id": 0, "count": 1}):
+        count += row["count"]
+    oldest: List[ExamSummary] = []
+    if limit:
+        cursor = (
+            db()
+            .exams.find(
+                {"status": "draft", "date": {"$lt": cutoff}, "deleted_at": None},
+                {"_id": 0, **{name: 1 for name in ExamSummary.model_fields}},
+            )
+            .sort([("date", ASCENDING), ("exam_id", ASCENDING)])
+            .limit(limit)
+        )
+        oldest = [ExamSummary(**doc) async for doc in cursor]
+    return DraftStats(older_than_days=older_than_days, count=count, oldest=oldest)
+
+
+@app.post("/api/stats/rebuild", response_model=StatsSummary)
+async def stats_rebuild():
+    """Recompute the rollups from exams and images (e.g. after a manual data fix)."""
+    await rebuild_stats()
+    return await stats_summary()
+
+
+# -----------------------------
+# Reports (PDF / DOCX)
+# -----------------------------
+
+# Bumped whenever the layout changes, so cached renders are not reused
+REPORT_LAYOUT_VERSION = 2
+# Image previews placed at the end of a report (renderable kinds, upload order)
+REPORT_MAX_IMAGES = 6
+REPORT_BATCH_MAX = 200
+REPORT_MIME = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+REPORT_LABELS: Dict[str, Dict[str, str]] = {
+    "pt": {
+        "title": "Laudo",
+        "patient": "Paciente",
+        "species": "Espécie",
+        "owner": "Tutor",
+        "exam": "Exame",
+        "date": "Data",
+        "status": "Situação",
+        "draft": "Rascunho",
+        "final": "Finalizado",
+        "notes": "Observações",
+        "images": "Imagens",
+        "page": "Página",
+    },
+    "en": {
+        "title": "Report",
+        "patient": "Patient",
+        "species": "Species",
+        "owner": "Owner",
+        "exam": "Exam",
+        "date": "Date",
+        "status": "Status",
+        "draft": "Draft",
+        "final": "Final",
+        "notes": "Notes",
+        "images": "Images",
+        "page": "Page",
+    },
+}
+
+# (exam_id, format) -> (content key, rendered bytes); only the latest variant is kept
+_report_cache = LRUCache(max_entries=256, max_bytes=128 * 1024 * 1024, sizeof=lambda v: len(v[1]))
+
+
+class ReportBatchRequest(BaseModel):
+    exam_ids: List[str] = Field(min_length=1, max_length=REPORT_BATCH_MAX)
+    format: Literal["pdf", "docx"] = "pdf"
+    lang: Literal["pt", "en"] = "pt"
+    images: bool = True
+
+
+def forget_report(exam_id: str) -> None:
+    for fmt in REPORT_MIME:
+        _report_cache.pop((exam_id, fmt))
+
+
+def _measures_text(measures: Any) -> str:
+    if isinstance(measures, dict):
+        return "; ".join(f"{k}: {v}" for k, v in measures.items() if v not in (None, ""))
+    return str(measures) if measures else ""
+
+
+async def _report_content(
+    exam: Dict[str, Any], fmt: str, lang: str, include_images: bool
+) -> Tuple[str, Callable[[], Any]]:
+    """Content key of an exam's report plus a coroutine factory building its worker input.
+
+    The key hashes everything printed (exam, patient, templates, image
+    contents) with ``updated_at``, so any change yields a new key; previews
+    are only loaded when the report is actually rendered.
+    """
+    labels = REPORT_LABELS[lang]
+    patient = await db().patients.find_one({"patient_id": exam["patient_id"]}, {"_id": 0, "search": 0}) or {}
+    organs = [item for item in exam.get("organs_data") or [] if isinstance(item, dict)]
+    template_ids = [item["template_id"] for item in organs if isinstance(item.get("template_id"), str)]
+    templates: Dict[str, Dict[str, Any]] = {}
+    if template_ids:
+        cursor = db().templates.find(
+            {"template_id": {"$in": template_ids}}, {"_id": 0, "template_id": 1, "organ": 1, "text": 1, "updated_at": 1}
+        )
+        templates = {t["template_id"]: t async for t in cursor}
+
+    images: List[Dict[str, Any]] = []
+    if include_images and exam.get("image_count"):
+        cursor = (
+            db()
+            .exam_images.find({"exam_id": exam["exam_id"], "kind": {"$in": list(DERIVATIVE_KINDS)}}, {"_id": 0, "image_id": 1})
+            .sort(EXAM_IMAGE_SORT)
+            .limit(REPORT_MAX_IMAGES)
+        )
+        ids = [d["image_id"] async for d in cursor]
+        by_id = {
+            d["image_id"]: d
+            async for d in db().images.find(
+                {"image_id": {"$in": ids}}, {"_id": 0, "image_id": 1, "sha256": 1, "blob_id": 1, "kind": 1}
+            )
+        }
+        images = [by_id[i] for i in ids if i in by_id]
+
+    sections = []
+    for item in organs:
+        template = templates.get(item.get("template_id")) or {}
+        sections.append(
+            {
+                "heading": str(item.get("organ") or item.get("name") or template.get("organ") or ""),
+                "text": str(item.get("text") or template.get("text") or ""),
+                "measures": _measures_text(item.get("measures")),
+            }
+        )
+    exam_date = exam.get("date")
+    meta = [
+        (labels["patient"], patient.get("name") or exam["patient_id"]),
+        (labels["species"], patient.get("species") or "-"),
+        (labels["owner"], patient.get("owner_name") or "-"),
+        (labels["exam"], (exam.get("exam_type") or "").replace("_", " ")),
+        (labels["date"], exam_date.strftime("%d/%m/%Y" if lang == "pt" else "%Y-%m-%d") if exam_date else "-"),
+        (labels["status"], labels.get(exam.get("status") or "draft", exam.get("status"))),
+    ]
+    report = {
+        "title": f"{labels['title']} - {(exam.get('exam_type') or '').replace('_', ' ')}",
+        "labels": labels,
+        "meta": meta,
+        "sections": sections,
+        "notes": exam.get("notes") or "",
+        "footer": f"TVUSVET - {exam['exam_id']}",
+    }
+    fingerprint = {
+        "layout": REPORT_LAYOUT_VERSION,
+        "format": fmt,
+        "report": report,
+        "exam_updated_at": exam.get("updated_at"),
+        "patient_updated_at": patient.get("updated_at"),
+        "templates": sorted((t["template_id"], t.get("updated_at")) for t in templates.values()),
+        "images": [d.get("sha256") for d in images],
+    }
+    key = hashlib.sha256(json.dumps(jsonable_encoder(fingerprint), sort_keys=True).encode()).hexdigest()
+
+    async def build() -> Dict[str, Any]:
+        previews = []
+        for doc in images:
+            try:
+                previews.append(await get_derivative(doc, "preview"))
+            except Exception:
+                # A broken image is left out rather than failing the report
+                continue
+        return {**report, "images": previews}
+
+    return key, build
+
+
+async def _render_report_bytes(exam_id: str, fmt: str, key: str, build: Callable[[], Any]) -> bytes:
+    """Rendered report for a content key, from the cache or the worker pool."""
+    cached = _report_cache.get((exam_id, fmt))
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    content = await run_in_worker(render_report, await build(), fmt)
+    _report_cache.set((exam_id, fmt), (key, content))
+    return content
+
+
+async def render_exam_report(exam: Dict[str, Any], fmt: str, lang: str, include_images: bool) -> Tuple[str, bytes]:
+    """``(content key, bytes)``, rendered in the worker pool unless cached."""
+    key, build = await _report_content(exam, fmt, lang, include_images)
+    return key, await _render_report_bytes(exam["exam_id"], fmt, key, build)
+
+
+@app.get("/api/exams/{exam_id}/report", responses={404: {"model": ApiError}})
+async def get_exam_report(
+    request: Request,
+    exam_id: str,
+    format: Literal["pdf", "docx"] = Query(default="pdf"),
+    lang: Literal["pt", "en"] = Query(default="pt"),
+    images: bool = Query(default=True, description="Append image previews"),
+):
+    """Render the exam report (organs, notes, templates, image previews) as PDF or DOCX."""
+    exam = await db().exams.find_one({"exam_id": exam_id, "deleted_at": None}, {"_id": 0})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    # The key is known before anything is rendered, so revalidation never renders
+    key, build = await _report_content(exam, format, lang, images)
+    etag = f'"report-{key[:32]}"'
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="report-{exam_id}.{format}"',
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    content = await _render_report_bytes(exam_id, format, key, build)
+    return Response(content=content, media_type=REPORT_MIME[format], headers=headers)
+
+
+class _ZipStream:
+    """Write-only sink for ``zipfile`` whose bytes are drained after each member."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+@app.post("/api/reports:batch")
+async def render_reports_batch(payload: ReportBatchRequest = Body(...)):
+    """Zip of reports for many finalized exams, streamed as they are rendered.
+
+    Renders run in the worker pool a few at a time. Exams that are missing,
+    deleted or still drafts are listed in ``errors.json`` inside the zip.
+    """
+    exam_ids = list(dict.fromkeys(payload.exam_ids))
+    cursor = db().exams.find({"exam_id": {"$in": exam_ids}, "deleted_at": None}, {"_id": 0})
+    found = {doc["exam_id"]: doc async for doc in cursor}
+    errors = {}
+    exams = []
+    for exam_id in exam_ids:
+        doc = found.get(exam_id)
+        if doc is None:
+            errors[exam_id] = "Exam not found"
+        elif doc.get("status") != "final":
+            errors[exam_id] = "Exam is not final"
+        else:
+            exams.append(doc)
+    if not exams:
+        raise HTTPException(status_code=400, detail="No finalized exams to render")
+
+    window = max(1, settings.worker_processes) * 2
+
+    async def archive() -> AsyncIterator[bytes]:
+        sink = _ZipStream()
+        queue = iter(exams)
+        pending: List[Tuple[Dict[str, Any], "asyncio.Task"]] = []
+
+        def submit() -> None:
+            exam = next(queue, None)
+            if exam is not None:
+                task = asyncio.create_task(render_exam_report(exam, payload.format, payload.lang, payload.images))
+                pending.append((exam, task))
+
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+            try:
+                for _ in range(window):
+                    submit()
+                while pending:
+                    exam, task = pending.pop(0)
+                    try:
+                        _, content = await task
+                    except Exception as exc:
+                        errors[exam["exam_id"]] = f"Render failed: {exc}"
+                        continue
+                    finally:
+                        submit()
+                    zf.writestr(f"report-{exam['exam_id']}.{payload.format}", content)
+                    yield sink.drain()
+            finally:
+                for _, task in pending:
+                    task.cancel()
+            if errors:
+                zf.writestr("errors.json", json.dumps(errors, indent=2, ensure_ascii=False))
+        yield sink.drain()
+
+    return StreamingResponse(
+        archive(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="reports-{utc_now():%Y%m%dT%H%M%S}.zip"'},
+    )
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for TVUSVET list endpoints.
+
+Creates one patient with N full exams (organs_data + notes), then hammers
+GET /api/exams?patient_id=...&limit=N and reports requests/sec and latency.
+Run it once against a server started with FAST_JSON=0 and once with
+FAST_JSON=1 to compare the default and the orjson response paths:
+
+    FAST_JSON=0 uvicorn server:app --port 8001   # then: python backend_bench.py --label default
+    FAST_JSON=1 uvicorn server:app --port 8001   # then: python backend_bench.py --label fast
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import requests
+
+
+def make_organs(count: int) -> List[Dict[str, Any]]:
+    text = "Fígado com dimensões preservadas, contornos regulares e ecotextura homogênea. " * 4
+    return [
+        {"organ": f"Órgão {i}", "template_id": None, "text": text, "measures": {"length_cm": 4.2, "width_cm": 2.1}}
+        for i in range(count)
+    ]
+
+
+def seed(base_url: str, exams: int) -> str:
+    patient = requests.post(f"{base_url}/api/patients", json={"name": "Benchmark Patient"}, timeout=30)
+    patient.raise_for_status()
+    patient_id = patient.json()["patient_id"]
+    organs = make_organs(12)
+    for i in range(exams):
+        res = requests.post(
+            f"{base_url}/api/exams",
+            json={
+                "patient_id": patient_id,
+                "exam_type": "ultrasound_abd",
+                "status": "final" if i % 2 else "draft",
+                "organs_data": organs,
+                "notes": "Paciente colaborativo. " * 20,
+            },
+            timeout=30,
+        )
+        res.raise_for_status()
+    return patient_id
+
+
+def run(base_url: str, patient_id: str, limit: int, total: int, concurrency: int) -> Dict[str, float]:
+    url = f"{base_url}/api/exams"
+    params = {"patient_id": patient_id, "limit": limit}
+    session = requests.Session()
+
+    def one(_: int) -> float:
+        started = time.perf_counter()
+        res = session.get(url, params=params, timeout=60)
+        res.raise_for_status()
+        return time.perf_counter() - started
+
+    # Warm-up (connection pool, caches)
+    for i in range(min(5, total)):
+        one(i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--exams", type=int, default=200, help="Exams created and listed per request (max 200)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--label", default="", help="Printed with the results (e.g. default / fast)")
+    parser.add_argument("--keep", action="store_true", help="Do not delete the benchmark patient afterwards")
+    args = parser.parse_args()
+
+    print(f"Seeding 1 patient with {args.exams} exams...")
+    patient_id = seed(args.base_url, args.exams)
+    try:
+        size = len(requests.get(f"{args.base_url}/api/exams", params={"patient_id": patient_id, "limit": args.exams}).content)
+        result = run(args.base_url, patient_id, args.exams, args.requests, args.concurrency)
+    finally:
+        if not args.keep:
+            requests.delete(f"{args.base_url}/api/patients/{patient_id}", timeout=30)
+
+    label = f"[{args.label}] " if args.label else ""
+    print(
+        f"{label}GET /api/exams (limit={args.exams}, {size / 1024:.0f} KiB): "
+        f"{result['rps']:.1f} req/s, p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
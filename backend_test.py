@@ -8,8 +8,65 @@ import requests
 import json
 import io
 import sys
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+
+def dicom_test_pixels(frame: int, rows: int = 32, columns: int = 32) -> bytes:
+    """Little-endian 16-bit pixels of ``frame`` in a make_test_dicom() file"""
+    size = rows * columns
+    return b"".join((v % 4096).to_bytes(2, "little") for v in range(frame * size, (frame + 1) * size))
+
+
+def make_test_dicom(
+    frames: int = 1, rows: int = 32, columns: int = 32, rle: bool = False, bits_stored: int = 16
+) -> bytes:
+    """Small 16-bit MONOCHROME2 DICOM, uncompressed or RLE (needs pydicom + numpy)
+
+    With ``bits_stored`` < 16 the unused high bits are filled with overlay-like
+    noise that readers must ignore.
+    """
+    import numpy as np
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.3.1"
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.PatientName = "Test^Dog"
+    ds.Modality = "US"
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    ds.SeriesNumber = 1
+    ds.InstanceNumber = 1
+    ds.Rows = rows
+    ds.Columns = columns
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = bits_stored
+    ds.HighBit = bits_stored - 1
+    ds.PixelRepresentation = 0
+    if frames > 1:
+        ds.NumberOfFrames = frames
+    shape = (frames, rows, columns) if frames > 1 else (rows, columns)
+    pixels = (np.arange(frames * rows * columns) % 4096).astype(np.uint16).reshape(shape)
+    if bits_stored < 16:
+        pixels |= (np.arange(pixels.size) % 2).astype(np.uint16).reshape(shape) << 15
+    ds.PixelData = pixels.tobytes()
+    if rle:
+        from pydicom.uid import RLELossless
+
+        ds.compress(RLELossless, pixels)
+    out = io.BytesIO()
+    ds.save_as(out, enforce_file_format=True)
+    return out.getvalue()
 
 
 class TVUSVETAPITester:
@@ -132,6 +189,29 @@ class TVUSVETAPITester:
         else:
             return self.log_test("List Patients", False, f"Status: {status}, Data: {data}")
 
+    def test_search_patients(self) -> bool:
+        """Test accent-insensitive prefix search on patient/owner names"""
+        suffix = datetime.now().strftime('%H%M%S')
+        success, data, status = self.run_request(
+            "POST", "/api/patients",
+            json={"name": f"Petúnia Search{suffix}", "owner_name": "João Tester"},
+            headers={"Content-Type": "application/json"}
+        )
+        if not success:
+            return self.log_test("Search Patients", False, f"Create failed: {status}, Data: {data}")
+        self.created_resources["patients"].append(data["patient_id"])
+
+        success, data, status = self.run_request("GET", f"/api/patients?q=petunia search{suffix}")
+        found = success and isinstance(data, list) and any(p.get("name") == f"Petúnia Search{suffix}" for p in data)
+
+        success2, data2, status2 = self.run_request("GET", f"/api/patients?q=joao&limit=200")
+        found_owner = success2 and isinstance(data2, list) and any(p.get("owner_name") == "João Tester" for p in data2)
+
+        if found and found_owner:
+            return self.log_test("Search Patients", True, "Accent-insensitive name and owner matches")
+        else:
+            return self.log_test("Search Patients", False, f"Name match: {found}, Owner match: {found_owner}")
+
     def test_update_patient(self, patient_id: str) -> bool:
         """Test patient update"""
         update_data = {
@@ -220,6 +300,46 @@ class TVUSVETAPITester:
         else:
             return self.log_test("List Exams", False, f"Status: {status}, Data: {data}")
 
+    def test_list_patients_cursor(self) -> bool:
+        """Test keyset pagination walks the same rows as offset pagination"""
+        success, expected, status = self.run_request("GET", "/api/patients", params={"limit": 200})
+        if not success:
+            return self.log_test("Patients Cursor Pagination", False, f"Status: {status}, Data: {expected}")
+
+        items: List[Dict[str, Any]] = []
+        cursor = ""
+        for _ in range(100):
+            success, data, status = self.run_request("GET", "/api/patients", params={"limit": 2, "cursor": cursor})
+            if not success or "items" not in data:
+                return self.log_test("Patients Cursor Pagination", False, f"Status: {status}, Data: {data}")
+            items.extend(data["items"])
+            cursor = data.get("next_cursor")
+            if not cursor:
+                break
+
+        ids = [p["patient_id"] for p in items]
+        if ids != [p["patient_id"] for p in expected]:
+            return self.log_test("Patients Cursor Pagination", False, f"Got {len(ids)} rows, expected {len(expected)}")
+
+        _, _, bad_status = self.run_request("GET", "/api/patients", params={"cursor": "not-a-cursor"})
+        if bad_status != 400:
+            return self.log_test("Patients Cursor Pagination", False, f"Invalid cursor returned {bad_status}")
+        return self.log_test("Patients Cursor Pagination", True, f"Walked {len(ids)} patients")
+
+    def test_list_exams_summary(self, patient_id: str) -> bool:
+        """Test summary view and fields= projection on list exams"""
+        success, data, status = self.run_request("GET", "/api/exams", params={"patient_id": patient_id, "view": "summary"})
+        if not success or not isinstance(data, list) or not data:
+            return self.log_test("List Exams Summary", False, f"Status: {status}, Data: {data}")
+        heavy = {"organs_data", "notes", "images"} & set(data[0])
+        if heavy:
+            return self.log_test("List Exams Summary", False, f"Summary still has {sorted(heavy)}")
+
+        success, data, status = self.run_request("GET", "/api/exams", params={"patient_id": patient_id, "fields": "date,status"})
+        if not success or set(data[0]) != {"exam_id", "date", "status"}:
+            return self.log_test("List Exams Summary", False, f"fields= returned {data[:1]}")
+        return self.log_test("List Exams Summary", True, f"{len(data)} exams projected")
+
     def test_update_exam(self, exam_id: str) -> bool:
         """Test exam update"""
         update_data = {
@@ -313,6 +433,163 @@ class TVUSVETAPITester:
         except Exception as e:
             return self.log_test("Get Image Content", False, f"Error: {str(e)}")
 
+    def test_image_content_caching(self, image_id: str) -> bool:
+        """Test ETag revalidation and Range requests on image content"""
+        url = f"{self.base_url}/api/images/{image_id}/content"
+
+        try:
+            full = requests.get(url, timeout=30)
+            etag = full.headers.get('etag')
+            if full.status_code != 200 or not etag:
+                return self.log_test("Image Content Caching", False, f"Status: {full.status_code}, ETag: {etag}")
+
+            revalidated = requests.get(url, headers={'If-None-Match': etag}, timeout=30)
+            partial = requests.get(url, headers={'Range': 'bytes=0-7'}, timeout=30)
+
+            if (revalidated.status_code == 304 and partial.status_code == 206
+                    and partial.content == full.content[:8]):
+                return self.log_test("Image Content Caching", True, f"Content-Range: {partial.headers.get('content-range')}")
+            else:
+                return self.log_test("Image Content Caching", False,
+                                     f"Revalidate: {revalidated.status_code}, Range: {partial.status_code}")
+
+        except Exception as e:
+            return self.log_test("Image Content Caching", False, f"Error: {str(e)}")
+
+    def test_image_thumbnail(self, image_id: str) -> bool:
+        """Test server-side thumbnail generation"""
+        url = f"{self.base_url}/api/images/{image_id}/thumbnail"
+
+        try:
+            response = requests.get(url, params={'size': 'thumb'}, timeout=30)
+
+            if response.status_code == 200 and response.headers.get('content-type') == 'image/jpeg':
+                return self.log_test("Image Thumbnail", True, f"Size: {len(response.content)} bytes")
+            else:
+                return self.log_test("Image Thumbnail", False, f"Status: {response.status_code}")
+
+        except Exception as e:
+            return self.log_test("Image Thumbnail", False, f"Error: {str(e)}")
+
+    def test_image_deduplication(self, patient_id: str, exam_id: str) -> bool:
+        """Test that re-uploading identical bytes reuses the stored blob"""
+        png_data = b'\x89PNG\r\n\x1a\n' + b'dedup-test-payload' * 64
+
+        before_ok, before, _ = self.run_request("GET", "/api/images/storage")
+        image_ids = []
+        for _ in range(2):
+            success, data, status = self.run_request(
+                "POST", "/api/images",
+                files={'file': ('dup.png', io.BytesIO(png_data), 'image/png')},
+                params={'patient_id': patient_id, 'exam_id': exam_id}
+            )
+            if not success:
+                return self.log_test("Image Deduplication", False, f"Upload failed: {status}, Data: {data}")
+            image_ids.append(data["image_id"])
+            self.created_resources["images"].append(data["image_id"])
+
+        after_ok, after, _ = self.run_request("GET", "/api/images/storage")
+        if before_ok and after_ok and after.get("saved_bytes", 0) - before.get("saved_bytes", 0) >= len(png_data):
+            return self.log_test("Image Deduplication", True, f"Saved bytes: {after.get('saved_bytes')}")
+        else:
+            return self.log_test("Image Deduplication", False, f"Before: {before}, After: {after}")
+
+    def test_dicom_upload_meta(self, patient_id: str, exam_id: str) -> Optional[str]:
+        """Test a DICOM upload exposes UIDs, geometry, frames and transfer syntax in dicom_meta"""
+        try:
+            dicom = make_test_dicom(frames=4, rows=32, columns=24)
+        except ImportError as e:
+            self.log_test("DICOM Upload Meta", False, f"pydicom/numpy needed to build the test file: {e}")
+            return None
+        files = {"file": ("study.dcm", io.BytesIO(dicom), "application/dicom")}
+        success, data, status = self.run_request(
+            "POST", "/api/images", files=files, params={"patient_id": patient_id, "exam_id": exam_id}
+        )
+        if not success:
+            self.log_test("DICOM Upload Meta", False, f"Status: {status}, Data: {data}")
+            return None
+        self.created_resources["images"].append(data["image_id"])
+        meta = data.get("dicom_meta") or {}
+        expected = {"Rows": 32, "Columns": 24, "NumberOfFrames": 4, "TransferSyntaxUID": "1.2.840.10008.1.2.1"}
+        wrong = {k: meta.get(k) for k, v in expected.items() if meta.get(k) != v}
+        uids = [k for k in ("SOPInstanceUID", "StudyInstanceUID", "SeriesInstanceUID") if not meta.get(k)]
+        if data.get("kind") != "dicom" or wrong or uids:
+            self.log_test("DICOM Upload Meta", False, f"kind={data.get('kind')}, wrong={wrong}, missing UIDs={uids}")
+            return None
+        self.log_test("DICOM Upload Meta", True, f"{meta['Rows']}x{meta['Columns']}, {meta['NumberOfFrames']} frames")
+        return data["image_id"]
+
+    def test_dicom_frames(self, image_id: str) -> bool:
+        """Test single-frame PNG/raw output and start/count runs for native and RLE DICOM"""
+        frame_url = f"{self.base_url}/api/images/{image_id}/frames"
+        png = requests.get(f"{frame_url}/1", timeout=30)
+        if png.status_code != 200 or not png.content.startswith(b"\x89PNG") or png.headers.get("X-Frame-Count") != "4":
+            return self.log_test("DICOM Frames", False, f"PNG frame: {png.status_code} {dict(png.headers)}")
+        raw8 = requests.get(f"{frame_url}/1", params={"format": "raw8"}, timeout=30)
+        raw16 = requests.get(f"{frame_url}/1", params={"format": "raw16"}, timeout=30)
+        if len(raw8.content) != 32 * 24 or raw16.content != dicom_test_pixels(1, 32, 24):
+            return self.log_test("DICOM Frames", False, f"raw8 {len(raw8.content)} bytes, raw16 mismatch")
+        out_of_range = requests.get(f"{frame_url}/4", timeout=30)
+        if out_of_range.status_code != 404:
+            return self.log_test("DICOM Frames", False, f"Frame 4 of 4 returned {out_of_range.status_code}")
+
+        sources = {"native": image_id}
+        rle = make_test_dicom(frames=4, rows=32, columns=24, rle=True)
+        files = {"file": ("rle.dcm", io.BytesIO(rle), "application/dicom")}
+        success, data, status = self.run_request("POST", "/api/images", files=files)
+        if not success:
+            return self.log_test("DICOM Frames", False, f"RLE upload status: {status}")
+        self.created_resources["images"].append(data["image_id"])
+        sources["rle"] = data["image_id"]
+        overlay = make_test_dicom(frames=4, rows=32, columns=24, bits_stored=12)
+        files = {"file": ("overlay.dcm", io.BytesIO(overlay), "application/dicom")}
+        success, data, status = self.run_request("POST", "/api/images", files=files)
+        if not success:
+            return self.log_test("DICOM Frames", False, f"12-bit upload status: {status}")
+        self.created_resources["images"].append(data["image_id"])
+        sources["12-bit"] = data["image_id"]
+
+        expected = dicom_test_pixels(1, 32, 24) + dicom_test_pixels(2, 32, 24) + dicom_test_pixels(3, 32, 24)
+        for label, source_id in sources.items():
+            url = f"{self.base_url}/api/images/{source_id}/frames"
+            run = requests.get(url, params={"start": 1, "count": 8, "format": "raw16"}, timeout=30)
+            if (
+                run.status_code != 200
+                or run.headers.get("X-Frame-Returned") != "3"
+                or run.headers.get("X-Frame-Bytes") != str(32 * 24 * 2)
+                or run.content != expected
+            ):
+                return self.log_test("DICOM Frames", False, f"{label} run: {run.status_code} {dict(run.headers)}")
+            # Cached frames must come back identical
+            again = requests.get(url, params={"start": 1, "count": 3, "format": "raw16"}, timeout=30)
+            if again.content != expected:
+                return self.log_test("DICOM Frames", False, f"{label} cached run differs")
+            past_end = requests.get(url, params={"start": 4}, timeout=30)
+            if past_end.status_code != 404:
+                return self.log_test("DICOM Frames", False, f"{label} start past end returned {past_end.status_code}")
+        return self.log_test("DICOM Frames", True, "PNG/raw frames and native/RLE/12-bit runs match the source pixels")
+
+    def test_batch_image_upload(self, patient_id: str, exam_id: str) -> bool:
+        """Test multi-file batch ingest in a single request"""
+        png_data = b'\x89PNG\r\n\x1a\n' + b'batch-test-payload'
+        files = [
+            ('files', (f'batch_{i}.png', io.BytesIO(png_data + bytes([i])), 'image/png'))
+            for i in range(3)
+        ]
+
+        success, data, status = self.run_request(
+            "POST", "/api/images/batch",
+            files=files,
+            params={'patient_id': patient_id, 'exam_id': exam_id}
+        )
+
+        if success and len(data.get("images", [])) == 3 and not data.get("errors"):
+            for image in data["images"]:
+                self.created_resources["images"].append(image["image_id"])
+            return self.log_test("Batch Image Upload", True, f"Stored {len(data['images'])} images")
+        else:
+            return self.log_test("Batch Image Upload", False, f"Status: {status}, Data: {data}")
+
     def test_exam_image_linking(self, exam_id: str) -> bool:
         """Test that image was properly linked to exam"""
         success, data, status = self.run_request("GET", f"/api/exams/{exam_id}")
@@ -322,6 +599,24 @@ class TVUSVETAPITester:
         else:
             return self.log_test("Exam Image Linking", False, f"No images linked to exam")
 
+    def test_exam_images_page(self, exam_id: str) -> bool:
+        """Test paged exam image links agree with the exam summary"""
+        success, exam, status = self.run_request("GET", f"/api/exams/{exam_id}")
+        if not success:
+            return self.log_test("Exam Images Page", False, f"Status: {status}, Data: {exam}")
+
+        success, data, status = self.run_request("GET", f"/api/exams/{exam_id}/images", params={"cursor": "", "limit": 500})
+        if not success or "items" not in data:
+            return self.log_test("Exam Images Page", False, f"Status: {status}, Data: {data}")
+
+        if len(data["items"]) != exam.get("image_count"):
+            return self.log_test(
+                "Exam Images Page", False, f"{len(data['items'])} links vs image_count={exam.get('image_count')}"
+            )
+        if not exam.get("cover_image_id"):
+            return self.log_test("Exam Images Page", False, "Exam has images but no cover_image_id")
+        return self.log_test("Exam Images Page", True, f"{len(data['items'])} images, cover {exam['cover_image_id']}")
+
     def test_delete_image(self, image_id: str, exam_id: str) -> bool:
         """Test image deletion and exam unlinking"""
         success, data, status = self.run_request("DELETE", f"/api/images/{image_id}")
@@ -436,6 +731,78 @@ class TVUSVETAPITester:
         else:
             return self.log_test("Get All Templates", False, f"Status: {status}, Data: {type(data)}, Length: {len(data) if isinstance(data, list) else 'N/A'}")
 
+    def test_search_templates(self) -> bool:
+        """Test accent-insensitive, stemmed template search with prefix autocomplete"""
+        success, data, status = self.run_request("GET", "/api/templates", params={"q": "figado preservad"})
+        if not success or not isinstance(data, list):
+            return self.log_test("Search Templates", False, f"Status: {status}, Data: {data}")
+
+        if not any(t.get("organ") == "Fígado" for t in data):
+            return self.log_test("Search Templates", False, f"Fígado template not found: {[t.get('organ') for t in data]}")
+
+        success, data, status = self.run_request("GET", "/api/templates", params={"q": "rins pieloect"})
+        if not success or not data or not all(t.get("organ", "").startswith(("Rim", "Rins")) for t in data):
+            return self.log_test("Search Templates", False, f"Prefix search returned: {data}")
+        return self.log_test("Search Templates", True, f"Found {len(data)} kidney templates")
+
+    def test_template_catalog(self) -> bool:
+        """Test grouped template catalog and ETag revalidation"""
+        try:
+            response = requests.get(f"{self.base_url}/api/templates/catalog", timeout=30)
+            etag = response.headers.get("ETag")
+            data = response.json()
+            if response.status_code != 200 or not etag or not data.get("groups"):
+                return self.log_test("Template Catalog", False, f"Status: {response.status_code}, ETag: {etag}")
+
+            total = sum(len(o["templates"]) for g in data["groups"] for o in g["organs"])
+            if total != data.get("total"):
+                return self.log_test("Template Catalog", False, f"Grouped {total} templates, total says {data.get('total')}")
+
+            revalidated = requests.get(
+                f"{self.base_url}/api/templates/catalog", headers={"If-None-Match": etag}, timeout=30
+            )
+            if revalidated.status_code != 304:
+                return self.log_test("Template Catalog", False, f"Revalidation returned {revalidated.status_code}")
+            return self.log_test("Template Catalog", True, f"{total} templates, version {data.get('version')}")
+        except Exception as e:
+            return self.log_test("Template Catalog", False, f"Error: {str(e)}")
+
+    def test_template_bulk_roundtrip(self) -> bool:
+        """Test NDJSON template export re-imports as updates only"""
+        try:
+            exported = requests.get(f"{self.base_url}/api/templates/bulk", params={"lang": "pt"}, timeout=30)
+            lines = [line for line in exported.text.splitlines() if line.strip()]
+            if exported.status_code != 200 or not lines:
+                return self.log_test("Template Bulk Roundtrip", False, f"Export status: {exported.status_code}")
+
+            success, data, status = self.run_request(
+                "POST",
+                "/api/templates/bulk",
+                data="\n".join(lines).encode(),
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            if not (success and data.get("received") == len(lines) and data.get("inserted") == 0 and data.get("failed") == 0):
+                return self.log_test("Template Bulk Roundtrip", False, f"Status: {status}, Data: {data}")
+
+            # A row new to this catalog keeps the exported id and creation time
+            source = json.loads(lines[0])
+            copy = {**source, "template_id": f"tpl-roundtrip-{int(time.time() * 1000)}", "title": "Roundtrip Copy"}
+            success, data, status = self.run_request(
+                "POST",
+                "/api/templates/bulk",
+                data=json.dumps(copy).encode(),
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            if not success or data.get("inserted") != 1:
+                return self.log_test("Template Bulk Roundtrip", False, f"Copy import status: {status}, Data: {data}")
+            _, imported, status = self.run_request("GET", f"/api/templates/{copy['template_id']}")
+            self.run_request("DELETE", f"/api/templates/{copy['template_id']}")
+            if status != 200 or datetime.fromisoformat(imported["created_at"]) != datetime.fromisoformat(source["created_at"]):
+                return self.log_test("Template Bulk Roundtrip", False, f"created_at {imported.get('created_at')} != {source['created_at']}")
+            return self.log_test("Template Bulk Roundtrip", True, f"Re-imported {len(lines)} templates, created_at kept")
+        except Exception as e:
+            return self.log_test("Template Bulk Roundtrip", False, f"Error: {str(e)}")
+
     def test_template_response_format(self) -> bool:
         """Test that template responses have correct format"""
         success, data, status = self.run_request("GET", "/api/templates?limit=5")
@@ -524,6 +891,450 @@ class TVUSVETAPITester:
         else:
             return self.log_test("Delete Template", False, f"Status: {status}, Data: {data}")
 
+    def test_sync_changes(self) -> bool:
+        """Test the changes feed pages to the end and hands back a resumable token"""
+        token = None
+        total = 0
+        for _ in range(200):
+            params: Dict[str, Any] = {"limit": 500}
+            if token:
+                params["since"] = token
+            success, data, status = self.run_request("GET", "/api/sync/changes", params=params)
+            if not success or "next_token" not in data:
+                return self.log_test("Sync Changes", False, f"Status: {status}, Data: {data}")
+            total += len(data["changes"])
+            token = data["next_token"]
+            if not data["has_more"]:
+                break
+
+        success, data, status = self.run_request("GET", "/api/sync/changes", params={"since": token})
+        if not success:
+            return self.log_test("Sync Changes", False, f"Resume status: {status}, Data: {data}")
+        return self.log_test("Sync Changes", True, f"{total} changes, {len(data['changes'])} new since last token")
+
+    def _sync_to_end(self, token: Optional[str] = None) -> tuple[str, List[Dict[str, Any]]]:
+        """Page the changes feed from ``token`` to the end; returns the last token and the changes"""
+        changes: List[Dict[str, Any]] = []
+        params: Dict[str, Any] = {"limit": 1000}
+        while True:
+            if token:
+                params["since"] = token
+            _, page, _ = self.run_request("GET", "/api/sync/changes", params=params)
+            changes += page["changes"]
+            token = page["next_token"]
+            if not page["has_more"]:
+                return token, changes
+
+    def test_sync_during_upload(self, patient_id: str, exam_id: str) -> bool:
+        """Test images of an ingest that outlasts the sync settle window reach a client that synced meanwhile"""
+        import threading
+        import zipfile
+
+        # A large study: ingesting it takes longer than the settle window
+        study = io.BytesIO()
+        with zipfile.ZipFile(study, "w") as archive:
+            for number in range(300):
+                archive.writestr(f"study/{number}.dcm", make_test_dicom(rows=8, columns=8))
+        uploaded: Dict[str, Any] = {}
+
+        def upload():
+            response = requests.post(
+                f"{self.base_url}/api/images/batch",
+                params={"exam_id": exam_id},
+                files=[("files", ("study.zip", study.getvalue(), "application/zip"))],
+                timeout=300,
+            )
+            uploaded.update(response.json() if response.status_code == 200 else {"status": response.status_code})
+
+        thread = threading.Thread(target=upload)
+        thread.start()
+        # Another change lands while the study is ingested; the client syncs past it
+        time.sleep(0.5)
+        self.run_request("PATCH", f"/api/patients/{patient_id}", json={"notes": "changed during upload"})
+        time.sleep(2.5)
+        token, _ = self._sync_to_end()
+        thread.join()
+        if not uploaded.get("images"):
+            return self.log_test("Sync During Upload", False, f"Upload: {uploaded}")
+        image_ids = [image["image_id"] for image in uploaded["images"]]
+        self.created_resources["images"].extend(image_ids)
+
+        time.sleep(2.5)
+        _, changes = self._sync_to_end(token)
+        seen = {(c["type"], c["id"]) for c in changes}
+        missing = [i for i in image_ids if ("image", i) not in seen]
+        if missing or ("exam", exam_id) not in seen:
+            return self.log_test("Sync During Upload", False, f"{len(missing)} images (or the exam) never synced")
+        return self.log_test("Sync During Upload", True, f"{len(image_ids)} images and the exam synced")
+
+    def test_batch_create(self, patient_id: str) -> bool:
+        """Test batch exam creation reports one result per item (NDJSON body)"""
+        lines = [
+            json.dumps({"patient_id": patient_id, "exam_type": "ultrasound_abd"}),
+            json.dumps({"patient_id": "pat_missing", "exam_type": "ultrasound_abd"}),
+            json.dumps({"patient_id": patient_id, "status": "bogus"}),
+        ]
+        success, data, status = self.run_request(
+            "POST",
+            "/api/exams:batch",
+            data="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        if not success or [r.get("status") for r in data.get("results", [])] != ["created", "failed", "failed"]:
+            return self.log_test("Batch Create Exams", False, f"Status: {status}, Data: {data}")
+        self.created_resources["exams"].append(data["results"][0]["id"])
+        return self.log_test("Batch Create Exams", True, f"created={data['created']} failed={data['failed']}")
+
+    def test_batch_create_patients(self) -> bool:
+        """Test batch patient creation from a JSON array and NDJSON with per-item failures"""
+        own_id = f"pat_batch_{int(time.time() * 1000)}"
+        items = [
+            {"patient_id": own_id, "name": "Batch Array Patient", "species": "Feline"},
+            {"patient_id": own_id, "name": "Batch Duplicate Patient"},
+            {"species": "Canine"},
+            "not-an-object",
+        ]
+        success, data, status = self.run_request("POST", "/api/patients:batch", json=items)
+        results = data.get("results", []) if success else []
+        if [r.get("status") for r in results] != ["created", "failed", "failed", "failed"] or results[0].get("id") != own_id:
+            return self.log_test("Batch Create Patients", False, f"Array status: {status}, Data: {data}")
+        self.created_resources["patients"].append(own_id)
+        if results[1].get("detail") != "Duplicate patient_id" or not results[2].get("detail", "").startswith("name"):
+            return self.log_test("Batch Create Patients", False, f"Array failure details: {results}")
+
+        lines = [
+            json.dumps({"name": "Batch NDJSON One", "owner_name": "Batch Owner"}),
+            "{not json",
+            json.dumps({"name": "Batch NDJSON Two"}),
+        ]
+        success, data, status = self.run_request(
+            "POST",
+            "/api/patients:batch",
+            data="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        results = data.get("results", []) if success else []
+        if [r.get("status") for r in results] != ["created", "failed", "created"] or data.get("received") != 3:
+            return self.log_test("Batch Create Patients", False, f"NDJSON status: {status}, Data: {data}")
+        created = [r["id"] for r in results if r["status"] == "created"]
+        self.created_resources["patients"].extend(created)
+        for patient_id in [own_id, *created]:
+            _, _, get_status = self.run_request("GET", f"/api/patients/{patient_id}")
+            if get_status != 200:
+                return self.log_test("Batch Create Patients", False, f"Created {patient_id} not readable ({get_status})")
+
+        _, _, bad_status = self.run_request("POST", "/api/patients:batch", json={"name": "Not an array"})
+        if bad_status != 400:
+            return self.log_test("Batch Create Patients", False, f"Non-array body returned {bad_status}")
+        return self.log_test("Batch Create Patients", True, "JSON array and NDJSON results reported per item")
+
+    def test_export_stream(self, patient_id: str) -> bool:
+        """Test the NDJSON export streams typed records and CSV exports one type"""
+        try:
+            response = requests.get(f"{self.base_url}/api/export", params={"types": "patient,exam"}, timeout=60)
+            records = [json.loads(line) for line in response.text.splitlines() if line]
+        except Exception as e:
+            return self.log_test("Export Stream", False, f"Error: {e}")
+        ids = {r["data"].get("patient_id") for r in records if r.get("type") == "patient"}
+        if response.status_code != 200 or patient_id not in ids:
+            return self.log_test("Export Stream", False, f"Status: {response.status_code}, {len(records)} records")
+
+        csv_response = requests.get(f"{self.base_url}/api/export", params={"types": "exam", "format": "csv"}, timeout=60)
+        header = csv_response.text.splitlines()[0] if csv_response.text else ""
+        if csv_response.status_code != 200 or "exam_id" not in header.split(","):
+            return self.log_test("Export Stream", False, f"CSV status: {csv_response.status_code}")
+        return self.log_test("Export Stream", True, f"{len(records)} NDJSON records, watermark {response.headers.get('X-Export-Watermark')}")
+
+    def _get_encoded(self, endpoint: str, encoding: str, **kwargs) -> requests.Response:
+        """GET with Accept-Encoding, keeping the body exactly as sent (``response.raw_body``)"""
+        headers = {"Accept-Encoding": encoding, **kwargs.pop("headers", {})}
+        response = requests.get(f"{self.base_url}{endpoint}", headers=headers, stream=True, timeout=60, **kwargs)
+        response.raw_body = response.raw.read(decode_content=False)
+        return response
+
+    def test_response_compression(self, patient_id: str) -> bool:
+        """Test gzip/br negotiation, the size threshold, passthrough and streamed NDJSON compression"""
+        import gzip
+
+        try:
+            plain = requests.get(f"{self.base_url}/api/templates", timeout=30).content
+            gzipped = self._get_encoded("/api/templates", "gzip")
+            if gzipped.headers.get("Content-Encoding") != "gzip" or gzip.decompress(gzipped.raw_body) != plain:
+                return self.log_test("Response Compression", False, f"gzip: {dict(gzipped.headers)}")
+            if "Accept-Encoding" not in gzipped.headers.get("Vary", ""):
+                return self.log_test("Response Compression", False, "Compressed response lacks Vary: Accept-Encoding")
+
+            try:
+                import brotli
+            except ImportError:
+                brotli = None
+            if brotli is not None:
+                brotlied = self._get_encoded("/api/templates", "gzip;q=0.5, br")
+                if brotlied.headers.get("Content-Encoding") != "br" or brotli.decompress(brotlied.raw_body) != plain:
+                    return self.log_test("Response Compression", False, f"br: {dict(brotlied.headers)}")
+
+            # Below the threshold, refused codings and identity requests are sent as is
+            small = self._get_encoded(f"/api/patients/{patient_id}", "gzip")
+            refused = self._get_encoded("/api/templates", "gzip;q=0, br;q=0")
+            identity = self._get_encoded("/api/templates", "identity")
+            for label, response in (("small", small), ("q=0", refused), ("identity", identity)):
+                if "Content-Encoding" in response.headers:
+                    return self.log_test("Response Compression", False, f"{label} response was encoded")
+
+            # Dense media and byte ranges pass through untouched
+            png_data = b"\x89PNG\r\n\x1a\n" + b"compressible-looking-image-bytes " * 256
+            files = {"file": ("passthrough.png", io.BytesIO(png_data), "image/png")}
+            success, image, status = self.run_request("POST", "/api/images", files=files)
+            if not success:
+                return self.log_test("Response Compression", False, f"Upload status: {status}")
+            self.created_resources["images"].append(image["image_id"])
+            content_url = f"/api/images/{image['image_id']}/content"
+            full = self._get_encoded(content_url, "gzip, br")
+            ranged = self._get_encoded(content_url, "gzip, br", headers={"Range": "bytes=0-2047"})
+            if "Content-Encoding" in full.headers or full.raw_body != png_data:
+                return self.log_test("Response Compression", False, f"Image was re-encoded: {dict(full.headers)}")
+            if ranged.status_code != 206 or "Content-Encoding" in ranged.headers or ranged.raw_body != png_data[:2048]:
+                return self.log_test("Response Compression", False, f"Range: {ranged.status_code} {dict(ranged.headers)}")
+
+            # Streamed NDJSON is compressed on the fly (chunked, no Content-Length)
+            exported = requests.get(f"{self.base_url}/api/export", params={"types": "template"}, timeout=60).content
+            streamed = self._get_encoded("/api/export", "gzip", params={"types": "template"})
+            if (
+                streamed.headers.get("Content-Encoding") != "gzip"
+                or "Content-Length" in streamed.headers
+                or gzip.decompress(streamed.raw_body).splitlines() != exported.splitlines()
+            ):
+                return self.log_test("Response Compression", False, f"NDJSON stream: {dict(streamed.headers)}")
+        except Exception as e:
+            return self.log_test("Response Compression", False, f"Error: {e}")
+        return self.log_test("Response Compression", True, f"{len(plain)} -> {len(gzipped.raw_body)} bytes gzip")
+
+    def test_msgpack_responses(self) -> bool:
+        """Test Accept: application/msgpack decodes to the JSON body and revalidates via the weak ETag"""
+        try:
+            import msgpack
+        except ImportError as e:
+            return self.log_test("MessagePack Responses", False, f"msgpack needed to decode responses: {e}")
+
+        as_json = requests.get(f"{self.base_url}/api/templates", params={"limit": 50}, timeout=30)
+        packed = requests.get(
+            f"{self.base_url}/api/templates", params={"limit": 50}, headers={"Accept": "application/msgpack"}, timeout=30
+        )
+        if packed.headers.get("Content-Type") != "application/msgpack" or msgpack.unpackb(packed.content) != as_json.json():
+            return self.log_test("MessagePack Responses", False, f"Headers: {dict(packed.headers)}")
+
+        accept = {"Accept": "application/msgpack"}
+        catalog = requests.get(f"{self.base_url}/api/templates/catalog", headers=accept, timeout=30)
+        etag = catalog.headers.get("ETag", "")
+        if not etag.startswith("W/") or "Accept" not in catalog.headers.get("Vary", ""):
+            return self.log_test("MessagePack Responses", False, f"Catalog headers: {dict(catalog.headers)}")
+        revalidated = requests.get(
+            f"{self.base_url}/api/templates/catalog", headers={**accept, "If-None-Match": etag}, timeout=30
+        )
+        if revalidated.status_code != 304:
+            return self.log_test("MessagePack Responses", False, f"If-None-Match {etag} returned {revalidated.status_code}")
+        return self.log_test("MessagePack Responses", True, f"{len(packed.content)} bytes vs {len(as_json.content)} JSON")
+
+    def test_backup_archive(self) -> bool:
+        """Test the streamed backup is a tar with records and a manifest last"""
+        import tarfile
+
+        try:
+            response = requests.get(f"{self.base_url}/api/backups:stream", timeout=300)
+            archive = tarfile.open(fileobj=io.BytesIO(response.content))
+            names = archive.getnames()
+            manifest = json.loads(archive.extractfile("manifest.json").read())
+        except Exception as e:
+            return self.log_test("Backup Archive", False, f"Error: {e}")
+        if "records/patients.ndjson" not in names or names[-1] != "manifest.json":
+            return self.log_test("Backup Archive", False, f"Members: {names[:10]}")
+        if manifest.get("corrupt_blobs"):
+            return self.log_test("Backup Archive", False, f"Corrupt blobs: {manifest['corrupt_blobs']}")
+        _, _, junk_status = self.run_request("POST", "/api/backups/restore", data=b"not a tar archive" * 64)
+        if junk_status != 400:
+            return self.log_test("Backup Archive", False, f"Junk restore upload returned {junk_status}")
+        return self.log_test(
+            "Backup Archive",
+            True,
+            f"{manifest['records']['patients']['count']} patients, {manifest['blobs']['count']} blobs",
+        )
+
+    def _wait_job(self, job_id: str) -> Dict[str, Any]:
+        job: Dict[str, Any] = {}
+        for _ in range(100):
+            _, job, _ = self.run_request("GET", f"/api/jobs/{job_id}")
+            if job.get("status") in ("done", "failed"):
+                break
+            time.sleep(0.2)
+        return job
+
+    def test_restore_after_delete(self) -> bool:
+        """Test restoring a deleted patient clears its tombstone and reaches clients synced past the backup"""
+        success, patient, status = self.run_request("POST", "/api/patients", json={"name": "Restored Patient"})
+        if not success:
+            return self.log_test("Restore After Delete", False, f"Create status: {status}")
+        patient_id = patient["patient_id"]
+        archive = requests.get(f"{self.base_url}/api/backups:stream", timeout=300).content
+        _, deleted, _ = self.run_request("DELETE", f"/api/patients/{patient_id}")
+        if self._wait_job(deleted["job_id"]).get("status") != "done":
+            return self.log_test("Restore After Delete", False, "Delete job did not finish")
+
+        time.sleep(2.5)  # past the sync settle window
+        token, _ = self._sync_to_end()
+        _, started, status = self.run_request(
+            "POST", "/api/backups/restore", data=archive, headers={"Content-Type": "application/x-tar"}
+        )
+        job = self._wait_job(started.get("job_id", ""))
+        if job.get("status") != "done" or job.get("progress", {}).get("patients", 0) < 1:
+            return self.log_test("Restore After Delete", False, f"Restore job: {job}")
+        _, _, get_status = self.run_request("GET", f"/api/patients/{patient_id}")
+        if get_status != 200:
+            return self.log_test("Restore After Delete", False, f"Restored patient returned {get_status}")
+
+        time.sleep(2.5)
+        _, changes = self._sync_to_end(token)
+        ops = [c["op"] for c in changes if c["type"] == "patient" and c["id"] == patient_id]
+        self.created_resources["patients"].append(patient_id)
+        if ops != ["upsert"]:
+            return self.log_test("Restore After Delete", False, f"Sync ops for restored patient: {ops}")
+        return self.log_test("Restore After Delete", True, "Restored patient synced as an upsert")
+
+    def test_stats(self) -> bool:
+        """Test rollup statistics agree with a full rebuild"""
+        success, summary, status = self.run_request("GET", "/api/stats/summary")
+        if not success or summary.get("exams", 0) < 1:
+            return self.log_test("Statistics", False, f"Status: {status}, Data: {summary}")
+        success, monthly, status = self.run_request("GET", "/api/stats/exams", params={"group": "month"})
+        if not success or sum(row["count"] for row in monthly) != summary["exams"]:
+            return self.log_test("Statistics", False, f"Monthly rows do not add up: {monthly}")
+        _, top_patients, _ = self.run_request("GET", "/api/stats/images/patients", params={"limit": 200})
+        success, rebuilt, status = self.run_request("POST", "/api/stats/rebuild")
+        if not success or rebuilt.get("exams") != summary["exams"]:
+            return self.log_test("Statistics", False, f"Rollups {summary} != rebuilt {rebuilt}")
+        _, rebuilt_top, _ = self.run_request("GET", "/api/stats/images/patients", params={"limit": 200})
+        if rebuilt_top != top_patients:
+            return self.log_test("Statistics", False, f"Per-patient rollups {top_patients} != rebuilt {rebuilt_top}")
+        return self.log_test("Statistics", True, f"{summary['exams']} exams, {summary['images']} images")
+
+    def test_exam_report(self, exam_id: str) -> bool:
+        """Test server-side PDF/DOCX report rendering and its ETag revalidation"""
+        try:
+            pdf = requests.get(f"{self.base_url}/api/exams/{exam_id}/report", timeout=120)
+            docx = requests.get(f"{self.base_url}/api/exams/{exam_id}/report", params={"format": "docx"}, timeout=120)
+            revalidated = requests.get(
+                f"{self.base_url}/api/exams/{exam_id}/report",
+                headers={"If-None-Match": pdf.headers.get("ETag", "")},
+                timeout=120,
+            )
+        except Exception as e:
+            return self.log_test("Exam Report", False, f"Error: {e}")
+        if pdf.status_code != 200 or not pdf.content.startswith(b"%PDF-"):
+            return self.log_test("Exam Report", False, f"PDF status: {pdf.status_code}")
+        if docx.status_code != 200 or not docx.content.startswith(b"PK"):
+            return self.log_test("Exam Report", False, f"DOCX status: {docx.status_code}")
+        if revalidated.status_code != 304:
+            return self.log_test("Exam Report", False, f"Expected 304, got {revalidated.status_code}")
+        return self.log_test("Exam Report", True, f"PDF {len(pdf.content)} bytes, DOCX {len(docx.content)} bytes")
+
+    def test_report_unicode_text(self) -> bool:
+        """Test names and notes outside Latin-1 are printed as written in PDF and DOCX reports"""
+        import zipfile
+
+        name, notes = "Мурка Ωmega", "Кот спокоен, αβγ — ok"
+        success, patient, status = self.run_request("POST", "/api/patients", json={"name": name, "species": "Gato"})
+        if not success:
+            return self.log_test("Report Unicode Text", False, f"Create patient status: {status}")
+        success, exam, status = self.run_request(
+            "POST", "/api/exams", json={"patient_id": patient["patient_id"], "notes": notes, "status": "final"}
+        )
+        if not success:
+            return self.log_test("Report Unicode Text", False, f"Create exam status: {status}")
+        url = f"{self.base_url}/api/exams/{exam['exam_id']}/report"
+        try:
+            pdf = requests.get(url, timeout=120)
+            docx = requests.get(url, params={"format": "docx"}, timeout=120)
+            document = zipfile.ZipFile(io.BytesIO(docx.content)).read("word/document.xml").decode()
+        except Exception as e:
+            return self.log_test("Report Unicode Text", False, f"Error: {e}")
+        if pdf.status_code != 200 or not pdf.content.startswith(b"%PDF-"):
+            return self.log_test("Report Unicode Text", False, f"PDF status: {pdf.status_code}")
+        if name not in document or notes not in document:
+            return self.log_test("Report Unicode Text", False, "DOCX lost non-Latin-1 text")
+
+        try:
+            import pypdf
+        except ImportError:
+            pypdf = None
+        if pypdf is not None:
+            text = "".join(page.extract_text() for page in pypdf.PdfReader(io.BytesIO(pdf.content)).pages)
+            if name not in text or "Кот спокоен" not in text:
+                return self.log_test("Report Unicode Text", False, f"PDF text: {text[:200]!r}")
+        return self.log_test("Report Unicode Text", True, f"{name!r} kept in PDF and DOCX")
+
+    def test_referential_checks(self) -> bool:
+        """Test writes against unknown or just-deleted patients/exams are rejected with 400"""
+        _, _, status = self.run_request("POST", "/api/exams", json={"patient_id": "pat-does-not-exist"})
+        if status != 400:
+            return self.log_test("Referential Checks", False, f"Exam for unknown patient returned {status}")
+
+        success, patient, status = self.run_request("POST", "/api/patients", json={"name": "Referential Check Patient"})
+        if not success:
+            return self.log_test("Referential Checks", False, f"Create patient status: {status}")
+        patient_id = patient["patient_id"]
+        success, exam, status = self.run_request("POST", "/api/exams", json={"patient_id": patient_id})
+        if not success:
+            return self.log_test("Referential Checks", False, f"Create exam status: {status}")
+        exam_id = exam["exam_id"]
+        # Warm the existence cache with an upload before deleting the patient
+        png_data = b'\x89PNG\r\n\x1a\n' + b'referential-check'
+        files = {"file": ("warm.png", io.BytesIO(png_data + b"1"), "image/png")}
+        success, image, status = self.run_request("POST", "/api/images", files=files, params={"exam_id": exam_id})
+        if not success:
+            return self.log_test("Referential Checks", False, f"Upload status: {status}")
+
+        self.run_request("DELETE", f"/api/patients/{patient_id}")
+        _, _, exam_status = self.run_request("POST", "/api/exams", json={"patient_id": patient_id})
+        files = {"file": ("late.png", io.BytesIO(png_data + b"2"), "image/png")}
+        _, _, upload_status = self.run_request("POST", "/api/images", files=files, params={"exam_id": exam_id})
+        if exam_status != 400 or upload_status != 400:
+            return self.log_test(
+                "Referential Checks", False, f"After delete: exam create {exam_status}, upload {upload_status}"
+            )
+        return self.log_test("Referential Checks", True, "Unknown and tombstoned parents rejected")
+
+    def test_cascade_delete_patient(self) -> bool:
+        """Test patient deletion tombstones at once; a background job hides and purges its exams"""
+        success, patient, status = self.run_request("POST", "/api/patients", json={"name": "Cascade Delete Patient"})
+        if not success:
+            return self.log_test("Cascade Delete Patient", False, f"Create status: {status}")
+        patient_id = patient["patient_id"]
+        self.run_request("POST", "/api/exams", json={"patient_id": patient_id, "exam_type": "ultrasound_abd"})
+
+        success, data, status = self.run_request("DELETE", f"/api/patients/{patient_id}")
+        job_id = data.get("job_id")
+        if not success or not job_id:
+            return self.log_test("Cascade Delete Patient", False, f"Status: {status}, Data: {data}")
+
+        _, _, get_status = self.run_request("GET", f"/api/patients/{patient_id}")
+        if get_status != 404:
+            return self.log_test("Cascade Delete Patient", False, f"Tombstoned patient still visible ({get_status})")
+
+        job: Dict[str, Any] = {}
+        for _ in range(50):
+            _, job, _ = self.run_request("GET", f"/api/jobs/{job_id}")
+            if job.get("status") in ("done", "failed"):
+                break
+            time.sleep(0.2)
+        progress = job.get("progress", {})
+        if job.get("status") != "done" or progress.get("exams") != 1 or progress.get("exams_hidden") != 1:
+            return self.log_test("Cascade Delete Patient", False, f"Job: {job}")
+        # The job took the hidden exams out of the rollups
+        _, summary, _ = self.run_request("GET", "/api/stats/summary")
+        _, rebuilt, _ = self.run_request("POST", "/api/stats/rebuild")
+        if summary.get("exams") != rebuilt.get("exams") or summary.get("exams_by_type") != rebuilt.get("exams_by_type"):
+            return self.log_test("Cascade Delete Patient", False, f"Rollups {summary} != rebuilt {rebuilt}")
+        return self.log_test("Cascade Delete Patient", True, f"Job {job_id} purged {progress}")
+
     def cleanup_resources(self):
         """Clean up created test resources"""
         print("\n🧹 Cleaning up test resources...")
@@ -554,6 +1365,9 @@ class TVUSVETAPITester:
         self.test_seed_templates_idempotency()
         self.test_get_templates_by_exam_type()
         self.test_get_all_templates()
+        self.test_search_templates()
+        self.test_template_catalog()
+        self.test_template_bulk_roundtrip()
         self.test_template_response_format()
         
         # Custom template CRUD
@@ -570,6 +1384,7 @@ class TVUSVETAPITester:
         
         self.test_get_patient(patient_id)
         self.test_list_patients()
+        self.test_search_patients()
         self.test_update_patient(patient_id)
         
         # Exam CRUD tests
@@ -580,16 +1395,41 @@ class TVUSVETAPITester:
         
         self.test_get_exam(exam_id)
         self.test_list_exams(patient_id)
+        self.test_list_exams_summary(patient_id)
+        self.test_batch_create(patient_id)
+        self.test_batch_create_patients()
+        self.test_list_patients_cursor()
         self.test_update_exam(exam_id)
-        
+        self.test_exam_report(exam_id)
+        self.test_report_unicode_text()
+
         # Image management tests
         print("\n🖼️ Testing Image Management...")
         image_id = self.test_upload_image(patient_id, exam_id)
         if image_id:
             self.test_get_image_meta(image_id)
             self.test_get_image_content(image_id)
+            self.test_image_content_caching(image_id)
+            self.test_image_thumbnail(image_id)
+            self.test_image_deduplication(patient_id, exam_id)
+            self.test_batch_image_upload(patient_id, exam_id)
+            dicom_image_id = self.test_dicom_upload_meta(patient_id, exam_id)
+            if dicom_image_id:
+                self.test_dicom_frames(dicom_image_id)
             self.test_exam_image_linking(exam_id)
+            self.test_exam_images_page(exam_id)
             self.test_delete_image(image_id, exam_id)
+
+        self.test_sync_changes()
+        self.test_sync_during_upload(patient_id, exam_id)
+        self.test_export_stream(patient_id)
+        self.test_response_compression(patient_id)
+        self.test_msgpack_responses()
+        self.test_backup_archive()
+        self.test_restore_after_delete()
+        self.test_stats()
+        self.test_referential_checks()
+        self.test_cascade_delete_patient()
         
         # Cleanup
         self.cleanup_resources()